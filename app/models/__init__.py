@@ -4,5 +4,12 @@ from .flashcard import Flashcard
 from .review import CardReview, StudySession, ConversationState
 from .deck import Deck
 from .user_deck_sms import UserDeckSmsSettings
+from .knowledge_map import KnowledgeMapLayout
+from .platform_metrics import PlatformMetricsSnapshot
+from .sync_tombstone import SyncTombstone
+from .tag import Tag, FlashcardTag
+from .dedup import FlashcardSignature, FlashcardLshBucket
+from .import_job import ImportJob, ImportUploadChunk, ImportCacheEntry
+from . import events  # noqa: F401 - registers data_version session hooks
 
-__all__ = ["Base", "User", "Flashcard", "CardReview", "StudySession", "ConversationState", "Deck", "UserDeckSmsSettings"]
\ No newline at end of file
+__all__ = ["Base", "User", "Flashcard", "CardReview", "StudySession", "ConversationState", "Deck", "UserDeckSmsSettings", "KnowledgeMapLayout", "PlatformMetricsSnapshot", "SyncTombstone", "Tag", "FlashcardTag", "FlashcardSignature", "FlashcardLshBucket", "ImportJob", "ImportUploadChunk", "ImportCacheEntry"]
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -11,7 +11,19 @@ class Deck(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     image_url = Column(String(500), nullable=True)  # Path to uploaded preview image
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())  # Added via /admin/migrate-sync-public
+    
+    # Denormalized counters, kept up to date by the session hooks in app/models/events.py
+    # and repaired by the reconcile task in app/services/deck_counters.py
+    card_count = Column(Integer, default=0, nullable=False, server_default="0")
+    due_count_cached = Column(Integer, default=0, nullable=False, server_default="0")  # As of due_count_updated_at
+    due_count_updated_at = Column(DateTime(timezone=True), nullable=True)
+    last_reviewed_at = Column(DateTime(timezone=True), nullable=True)
 
     user = relationship("User", back_populates="decks")
     flashcards = relationship("Flashcard", back_populates="deck", cascade="all, delete-orphan")
-    user_sms_settings = relationship("UserDeckSmsSettings", back_populates="deck", cascade="all, delete-orphan") 
\ No newline at end of file
+    user_sms_settings = relationship("UserDeckSmsSettings", back_populates="deck", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        Index("ix_decks_user_updated_at", "user_id", "updated_at"),  # Delta sync range scan
+    ) 
\ No newline at end of file
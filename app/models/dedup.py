@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, SmallInteger, BigInteger, LargeBinary, ForeignKey, Index
+from app.database import Base
+
+class FlashcardSignature(Base):
+    """
+    MinHash signature of a flashcard's text (see app/utils/minhash.py).
+    Kept in step with concept/definition by the session hooks in app/models/events.py.
+    """
+    __tablename__ = "flashcard_signatures"
+
+    flashcard_id = Column(Integer, ForeignKey("flashcards.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    minhash = Column(LargeBinary, nullable=False)  # NUM_PERMUTATIONS little-endian uint32
+
+
+class FlashcardLshBucket(Base):
+    """One LSH band bucket of a flashcard's signature; cards sharing a bucket are duplicate candidates"""
+    __tablename__ = "flashcard_lsh_buckets"
+
+    flashcard_id = Column(Integer, ForeignKey("flashcards.id", ondelete="CASCADE"), primary_key=True)
+    band = Column(SmallInteger, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    bucket = Column(BigInteger, nullable=False)  # Band-specific hash of the band's rows
+
+    __table_args__ = (
+        Index("ix_flashcard_lsh_buckets_user_bucket", "user_id", "bucket"),  # Candidate lookup
+    )
@@ -0,0 +1,497 @@
+"""
+Session hooks that keep User.data_version in sync with the user's content.
+
+Any flush that inserts, updates or deletes a Flashcard, Deck or CardReview bumps
+the owning user's data_version in the same transaction. Cached responses are keyed
+on that version, so they are invalidated as soon as the change commits.
+
+Flushes that add or delete flashcards, or change a card's deck or tags, also mark the
+user's stored knowledge map layout stale; once the transaction commits, a background
+layout update is queued (see app/services/knowledge_map_store.py).
+
+Deck counters (card_count, due_count_cached, last_reviewed_at) are maintained in the
+same flush: card inserts, deletes and moves adjust card_count, review inserts advance
+last_reviewed_at, and the due count of every touched deck is recomputed. Statements that
+bypass the unit of work can call refresh_deck_counters; the reconcile task in
+app/services/deck_counters.py repairs any remaining drift.
+
+Deleting a flashcard, deck, deck SMS setting or review writes a SyncTombstone in the same
+flush so delta sync can report the deletion; bulk deletes call record_tombstones.
+
+Flashcard.tags (the comma-separated copy the API returns) is written through to the
+normalized tags / flashcard_tags tables whenever a card is inserted or retagged; bulk
+inserts call sync_flashcard_tags. Likewise each card's MinHash signature and LSH buckets
+(near-duplicate detection, app/services/dedup.py) follow its concept and definition; bulk
+inserts call sync_flashcard_signatures.
+
+Bulk flashcard inserts (imports) call flashcards_inserted, which applies all of the above
+for the new rows at once; bulk updates and deletes (Anki re-imports) call flashcards_updated
+and flashcards_deleted, and bulk review inserts (imported Anki schedules) reviews_inserted.
+"""
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Iterable, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import event, exists, func, insert, inspect, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, object_session
+from .user import User
+from .flashcard import Flashcard
+from .review import CardReview
+from .deck import Deck
+from .knowledge_map import KnowledgeMapLayout
+from .user_deck_sms import UserDeckSmsSettings
+from .sync_tombstone import SyncTombstone
+from .tag import Tag, FlashcardTag
+from .dedup import FlashcardSignature, FlashcardLshBucket
+from app.utils.minhash import lsh_buckets, minhash_signatures, signature_bytes
+
+VERSIONED_MODELS = (Flashcard, Deck, CardReview)
+
+# Entity type recorded in sync tombstones for each deletable model
+TOMBSTONE_TYPES = {
+    Flashcard: "flashcard",
+    Deck: "deck",
+    UserDeckSmsSettings: "deck_sms_settings",
+    CardReview: "review",
+}
+
+# Flashcard attributes the knowledge map layout depends on
+LAYOUT_ATTRIBUTES = ("deck_id", "tags")
+# Flashcard attributes the MinHash signature is computed from
+SIGNATURE_ATTRIBUTES = ("concept", "definition")
+
+_PENDING_KEY = "data_version_user_ids"
+_LAYOUT_PENDING_KEY = "knowledge_map_user_ids"
+_LAYOUT_COMMIT_KEY = "knowledge_map_commit_user_ids"
+_DECK_DELTAS_KEY = "deck_card_deltas"
+_DECK_REVIEWS_KEY = "deck_reviews"
+_TOMBSTONES_KEY = "sync_tombstones"
+_TAGGED_CARDS_KEY = "tagged_cards"
+_DELETED_CARD_IDS_KEY = "deleted_card_ids"
+_SIGNED_CARDS_KEY = "signed_cards"
+
+
+def bump_user_data_version(db: Session, *user_ids: int) -> None:
+    """
+    Bump data_version for the given users.
+    Use this after bulk statements (query.update/delete, bulk inserts) that bypass the ORM unit of work.
+    """
+    ids = {user_id for user_id in user_ids if user_id is not None}
+    if not ids:
+        return
+    db.connection().execute(
+        User.__table__.update()
+        .where(User.__table__.c.id.in_(ids))
+        # COALESCE covers rows created before the column existed
+        .values(data_version=func.coalesce(User.__table__.c.data_version, 0) + 1)
+    )
+
+
+def mark_knowledge_maps_stale(db: Session, *user_ids: int) -> None:
+    """Flag users' stored knowledge map layouts as out of date"""
+    ids = {user_id for user_id in user_ids if user_id is not None}
+    if not ids:
+        return
+    db.connection().execute(
+        KnowledgeMapLayout.__table__.update()
+        .where(KnowledgeMapLayout.__table__.c.user_id.in_(ids))
+        .values(is_stale=True)
+    )
+
+
+def record_tombstones(db: Session, user_id: int, entity_type: str, entity_ids: Iterable[int]) -> None:
+    """
+    Record deletions for delta sync.
+    Use this before bulk deletes (query.delete) that bypass the ORM unit of work.
+    """
+    rows = [
+        {"user_id": user_id, "entity_type": entity_type, "entity_id": entity_id}
+        for entity_id in entity_ids
+    ]
+    if rows:
+        db.connection().execute(SyncTombstone.__table__.insert(), rows)
+
+
+def _ensure_tags(connection, user_id: int, names: Iterable[str]) -> dict:
+    """Tag ids for a user's tag names, creating missing tags (concurrency-safe)"""
+    names = sorted(set(names))
+    tags = Tag.__table__
+    lookup = select(tags.c.name, tags.c.id).where(tags.c.user_id == user_id, tags.c.name.in_(names))
+    ids = dict(connection.execute(lookup).all())
+    missing = [{"user_id": user_id, "name": name} for name in names if name not in ids]
+    if missing:
+        dialect = connection.dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+            connection.execute(dialect_insert(tags).on_conflict_do_nothing(), missing)
+        else:
+            connection.execute(insert(tags), missing)
+        ids = dict(connection.execute(lookup).all())
+    return ids
+
+
+def sync_flashcard_tags(db: Session, cards: Iterable[Tuple[int, int, Optional[str]]], replace: bool = True) -> None:
+    """
+    Rewrite the flashcard_tags links of (flashcard_id, user_id, tags string) cards.
+    Use this after bulk inserts/updates of Flashcard.tags that bypass the ORM unit of work;
+    replace=False skips deleting old links (cards that were just inserted).
+    """
+    from app.services.tag_store import parse_tags  # tag_store imports this module
+
+    cards = [(card_id, user_id, parse_tags(tags)) for card_id, user_id, tags in cards]
+    if not cards:
+        return
+    connection = db.connection()
+    links = FlashcardTag.__table__
+    if replace:
+        connection.execute(links.delete().where(links.c.flashcard_id.in_([card_id for card_id, _, _ in cards])))
+
+    names_by_user = {}
+    for _, user_id, names in cards:
+        names_by_user.setdefault(user_id, set()).update(names)
+    tag_ids = {
+        user_id: _ensure_tags(connection, user_id, names)
+        for user_id, names in names_by_user.items() if names
+    }
+    rows = [
+        {"flashcard_id": card_id, "tag_id": tag_ids[user_id][name], "position": position}
+        for card_id, user_id, names in cards
+        for position, name in enumerate(names)
+    ]
+    if rows:
+        connection.execute(insert(links), rows)
+
+
+def sync_flashcard_signatures(
+    db: Session,
+    cards: Iterable[Tuple[int, int, str, str]],
+    replace: bool = True,
+    signatures: Optional[np.ndarray] = None,
+) -> None:
+    """
+    Rewrite the MinHash signature and LSH buckets of (flashcard_id, user_id, concept, definition) cards.
+    Use this after bulk inserts/updates of concept or definition that bypass the ORM unit of work;
+    replace=False skips deleting old rows (cards that were just inserted). Pass `signatures`
+    if they were already computed for these cards (e.g. by duplicate screening).
+    """
+    cards = list(cards)
+    if not cards:
+        return
+    connection = db.connection()
+    if replace:
+        card_ids = [card_id for card_id, _, _, _ in cards]
+        for model in (FlashcardSignature, FlashcardLshBucket):
+            table = model.__table__
+            connection.execute(table.delete().where(table.c.flashcard_id.in_(card_ids)))
+
+    if signatures is None:
+        signatures = minhash_signatures([(concept, definition) for _, _, concept, definition in cards])
+    buckets = lsh_buckets(signatures)
+    connection.execute(insert(FlashcardSignature.__table__), [
+        {"flashcard_id": card_id, "user_id": user_id, "minhash": signature_bytes(signature)}
+        for (card_id, user_id, _, _), signature in zip(cards, signatures)
+    ])
+    connection.execute(insert(FlashcardLshBucket.__table__), [
+        {"flashcard_id": card_id, "user_id": user_id, "band": band, "bucket": int(bucket)}
+        for (card_id, user_id, _, _), card_buckets in zip(cards, buckets)
+        for band, bucket in enumerate(card_buckets)
+    ])
+
+
+def flashcards_inserted(
+    db: Session,
+    cards: Sequence[Tuple[int, int, Optional[int], str, str, Optional[str]]],
+    signatures: Optional[np.ndarray] = None,
+) -> None:
+    """
+    Do for (id, user_id, deck_id, concept, definition, tags) flashcards inserted in bulk what the
+    session hooks do for ORM inserts: data_version, deck counters, tag links, duplicate-detection
+    signatures (precomputed ones may be passed), and a stale knowledge map (re-laid out after commit).
+    """
+    if not cards:
+        return
+    user_ids = {user_id for _, user_id, _, _, _, _ in cards}
+    bump_user_data_version(db, *user_ids)
+    _apply_deck_counter_changes(db, Counter(deck_id for _, _, deck_id, _, _, _ in cards), [])
+    sync_flashcard_tags(db, [(card_id, user_id, tags) for card_id, user_id, _, _, _, tags in cards], replace=False)
+    sync_flashcard_signatures(
+        db, [(card_id, user_id, concept, definition) for card_id, user_id, _, concept, definition, _ in cards],
+        replace=False, signatures=signatures
+    )
+    mark_knowledge_maps_stale(db, *user_ids)
+    db.info.setdefault(_LAYOUT_COMMIT_KEY, set()).update(user_ids)
+
+
+def flashcards_updated(db: Session, cards: Sequence[Tuple[int, int, str, str, Optional[str]]]) -> None:
+    """
+    Do for (id, user_id, concept, definition, tags) flashcards whose text and tags were rewritten
+    in bulk what the session hooks do for ORM updates: data_version, tag links, duplicate-detection
+    signatures, and a stale knowledge map. Deck counters are unaffected.
+    """
+    if not cards:
+        return
+    user_ids = {user_id for _, user_id, _, _, _ in cards}
+    bump_user_data_version(db, *user_ids)
+    sync_flashcard_tags(db, [(card_id, user_id, tags) for card_id, user_id, _, _, tags in cards])
+    sync_flashcard_signatures(db, [(card_id, user_id, concept, definition) for card_id, user_id, concept, definition, _ in cards])
+    mark_knowledge_maps_stale(db, *user_ids)
+    db.info.setdefault(_LAYOUT_COMMIT_KEY, set()).update(user_ids)
+
+
+def flashcards_deleted(db: Session, user_id: int, card_ids: Sequence[int], deck_ids: Iterable[int]) -> None:
+    """
+    Do for a user's flashcards deleted in bulk (from the given decks) what the session hooks do
+    for ORM deletes: data_version, deck counters, tag links and signatures, and a stale knowledge
+    map. Call record_tombstones before the delete; the cards' reviews are the caller's to remove.
+    """
+    if not card_ids:
+        return
+    bump_user_data_version(db, user_id)
+    refresh_deck_counters(db, deck_ids)
+    # Covered by ON DELETE CASCADE where foreign keys are enforced
+    for model in (FlashcardTag, FlashcardSignature, FlashcardLshBucket):
+        table = model.__table__
+        db.connection().execute(table.delete().where(table.c.flashcard_id.in_(card_ids)))
+    mark_knowledge_maps_stale(db, user_id)
+    db.info.setdefault(_LAYOUT_COMMIT_KEY, set()).add(user_id)
+
+
+def reviews_inserted(db: Session, reviews: Sequence[Tuple[int, int, datetime]]) -> None:
+    """
+    Do for (user_id, flashcard_id, review_date) reviews inserted in bulk what the session hooks
+    do for ORM inserts: data_version and the reviewed decks' last_reviewed_at and due counts.
+    """
+    if not reviews:
+        return
+    bump_user_data_version(db, *{user_id for user_id, _, _ in reviews})
+    _apply_deck_counter_changes(db, Counter(), [(card_id, reviewed_at) for _, card_id, reviewed_at in reviews])
+
+
+# Counter writes set updated_at to itself so its onupdate doesn't fire: delta sync re-sends a
+# deck when its content (name, image) changes, not on every card added or reviewed
+KEEP_DECK_UPDATED_AT = {"updated_at": Deck.__table__.c.updated_at}
+
+
+def deck_counter_expressions(now: datetime):
+    """Correlated subqueries computing each deck's counters from scratch (for UPDATE decks)"""
+    decks, cards, reviews = Deck.__table__, Flashcard.__table__, CardReview.__table__
+    # A card is due unless one of its reviews schedules it in the future (as in get_next_due_flashcard)
+    scheduled = exists().where(reviews.c.flashcard_id == cards.c.id, reviews.c.next_review_date > now)
+    return {
+        "card_count": select(func.count(cards.c.id)).where(cards.c.deck_id == decks.c.id).scalar_subquery(),
+        "due_count_cached": select(func.count(cards.c.id)).where(
+            cards.c.deck_id == decks.c.id, ~scheduled
+        ).scalar_subquery(),
+        "last_reviewed_at": select(func.max(reviews.c.review_date)).where(
+            reviews.c.flashcard_id == cards.c.id, cards.c.deck_id == decks.c.id
+        ).scalar_subquery(),
+    }
+
+
+def refresh_deck_counters(db: Session, deck_ids: Iterable[int], due_only: bool = False, now: Optional[datetime] = None) -> None:
+    """Recompute counters for the given decks (just the due count if due_only)"""
+    ids = {deck_id for deck_id in deck_ids if deck_id is not None}
+    if not ids:
+        return
+    now = now or datetime.now(timezone.utc)
+    values = deck_counter_expressions(now)
+    if due_only:
+        values = {"due_count_cached": values["due_count_cached"]}
+    db.connection().execute(
+        Deck.__table__.update()
+        .where(Deck.__table__.c.id.in_(ids))
+        .values(due_count_updated_at=now, **values, **KEEP_DECK_UPDATED_AT)
+    )
+
+
+def _deck_history(session, card: Flashcard):
+    """(deck_id before this flush, deck_id after) for a flashcard"""
+    state = inspect(card)
+    history = state.attrs.deck_id.history
+    if history.deleted or history.unchanged:
+        before = (history.deleted or history.unchanged)[0]
+    elif state.key is not None:
+        # deck_id was expired (e.g. by a commit) before it was set or the card deleted, so the
+        # history has no old value: read the one still in the database
+        cards = Flashcard.__table__
+        before = session.connection().execute(select(cards.c.deck_id).where(cards.c.id == card.id)).scalar()
+    else:
+        before = None
+    after = history.added[0] if history.added else before
+    return before, after
+
+
+def _apply_deck_counter_changes(session, deltas: Counter, reviews) -> None:
+    decks = Deck.__table__
+    for deck_id, delta in deltas.items():
+        if deck_id is not None and delta:
+            session.connection().execute(
+                decks.update().where(decks.c.id == deck_id)
+                .values(card_count=func.coalesce(decks.c.card_count, 0) + delta, **KEEP_DECK_UPDATED_AT)
+            )
+
+    touched = {deck_id for deck_id in deltas if deck_id is not None}
+    if reviews:
+        cards = Flashcard.__table__
+        card_decks = dict(session.connection().execute(
+            select(cards.c.id, cards.c.deck_id).where(cards.c.id.in_({card_id for card_id, _ in reviews}))
+        ).all())
+        latest = {}
+        for card_id, reviewed_at in reviews:
+            deck_id = card_decks.get(card_id)
+            if deck_id is not None and (deck_id not in latest or reviewed_at > latest[deck_id]):
+                latest[deck_id] = reviewed_at
+        for deck_id, reviewed_at in latest.items():
+            session.connection().execute(
+                decks.update().where(
+                    decks.c.id == deck_id,
+                    or_(decks.c.last_reviewed_at.is_(None), decks.c.last_reviewed_at < reviewed_at)
+                ).values(last_reviewed_at=reviewed_at, **KEEP_DECK_UPDATED_AT)
+            )
+        touched.update(latest)
+
+    # Due counts depend on the clock and on every review of every card, so recompute them
+    refresh_deck_counters(session, touched, due_only=True)
+
+
+def _layout_changed(card: Flashcard) -> bool:
+    state = inspect(card)
+    return any(state.attrs[name].history.has_changes() for name in LAYOUT_ATTRIBUTES)
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_changed_users(session, flush_context, instances):
+    pending = session.info.setdefault(_PENDING_KEY, set())
+    for obj in session.new:
+        if isinstance(obj, VERSIONED_MODELS):
+            pending.add(obj.user_id)
+    for obj in session.deleted:
+        if isinstance(obj, VERSIONED_MODELS):
+            pending.add(obj.user_id)
+    for obj in session.dirty:
+        if isinstance(obj, VERSIONED_MODELS) and session.is_modified(obj, include_collections=False):
+            pending.add(obj.user_id)
+
+    tagged = session.info.setdefault(_TAGGED_CARDS_KEY, [])
+    signed = session.info.setdefault(_SIGNED_CARDS_KEY, [])
+    deleted_cards = session.info.setdefault(_DELETED_CARD_IDS_KEY, set())
+    for obj in session.new:
+        if isinstance(obj, Flashcard):
+            tagged.append((obj, False))
+            signed.append((obj, False))
+    for obj in session.dirty:
+        if isinstance(obj, Flashcard):
+            state = inspect(obj)
+            if state.attrs.tags.history.has_changes():
+                tagged.append((obj, True))
+            if any(state.attrs[name].history.has_changes() for name in SIGNATURE_ATTRIBUTES):
+                signed.append((obj, True))
+    for obj in session.deleted:
+        if isinstance(obj, Flashcard):
+            deleted_cards.add(obj.id)
+
+    layout_pending = session.info.setdefault(_LAYOUT_PENDING_KEY, set())
+    for obj in session.new | session.deleted:
+        if isinstance(obj, Flashcard):
+            layout_pending.add(obj.user_id)
+    for obj in session.dirty:
+        if isinstance(obj, Flashcard) and _layout_changed(obj):
+            layout_pending.add(obj.user_id)
+
+    deltas = session.info.setdefault(_DECK_DELTAS_KEY, Counter())
+    reviews = session.info.setdefault(_DECK_REVIEWS_KEY, [])
+    for obj in session.new:
+        if isinstance(obj, Flashcard):
+            deltas[obj.deck_id] += 1
+        elif isinstance(obj, CardReview):
+            reviewed_at = obj.review_date or datetime.now(timezone.utc)
+            if reviewed_at.tzinfo is None:
+                reviewed_at = reviewed_at.replace(tzinfo=timezone.utc)
+            reviews.append((obj.flashcard_id, reviewed_at))
+    for obj in session.deleted:
+        if isinstance(obj, Flashcard):
+            deltas[_deck_history(session, obj)[0]] -= 1
+    for obj in session.dirty:
+        if isinstance(obj, Flashcard):
+            before, after = _deck_history(session, obj)
+            if before != after:
+                deltas[before] -= 1
+                deltas[after] += 1
+
+
+def _collect_deleted_row(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        entity_type = TOMBSTONE_TYPES[mapper.class_]
+        session.info.setdefault(_TOMBSTONES_KEY, []).append((target.user_id, entity_type, target.id))
+
+
+for _model in TOMBSTONE_TYPES:
+    # Mapper-level so cascaded and orphan deletes are included
+    event.listen(_model, "after_delete", _collect_deleted_row)
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_changed_users(session, flush_context):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        bump_user_data_version(session, *pending)
+
+    layout_pending = session.info.pop(_LAYOUT_PENDING_KEY, None)
+    if layout_pending:
+        mark_knowledge_maps_stale(session, *layout_pending)
+        session.info.setdefault(_LAYOUT_COMMIT_KEY, set()).update(layout_pending)
+
+    deltas = session.info.pop(_DECK_DELTAS_KEY, None)
+    reviews = session.info.pop(_DECK_REVIEWS_KEY, None)
+    if deltas or reviews:
+        _apply_deck_counter_changes(session, deltas or Counter(), reviews or [])
+
+    tagged = session.info.pop(_TAGGED_CARDS_KEY, None)
+    signed = session.info.pop(_SIGNED_CARDS_KEY, None)
+    deleted_cards = session.info.pop(_DELETED_CARD_IDS_KEY, None)
+    if deleted_cards:
+        # Covered by ON DELETE CASCADE where foreign keys are enforced
+        for model in (FlashcardTag, FlashcardSignature, FlashcardLshBucket):
+            table = model.__table__
+            session.connection().execute(table.delete().where(table.c.flashcard_id.in_(deleted_cards)))
+    if tagged:
+        new_cards = [(card.id, card.user_id, card.tags) for card, retagged in tagged if not retagged]
+        retagged_cards = [(card.id, card.user_id, card.tags) for card, retagged in tagged if retagged]
+        sync_flashcard_tags(session, new_cards, replace=False)
+        sync_flashcard_tags(session, retagged_cards)
+    if signed:
+        new_cards = [(card.id, card.user_id, card.concept, card.definition) for card, edited in signed if not edited]
+        edited_cards = [(card.id, card.user_id, card.concept, card.definition) for card, edited in signed if edited]
+        sync_flashcard_signatures(session, new_cards, replace=False)
+        sync_flashcard_signatures(session, edited_cards)
+
+    tombstones = session.info.pop(_TOMBSTONES_KEY, None)
+    if tombstones:
+        session.connection().execute(SyncTombstone.__table__.insert(), [
+            {"user_id": user_id, "entity_type": entity_type, "entity_id": entity_id}
+            for user_id, entity_type, entity_id in tombstones
+        ])
+
+
+@event.listens_for(Session, "after_commit")
+def _queue_layout_updates(session):
+    user_ids = session.info.pop(_LAYOUT_COMMIT_KEY, None)
+    if user_ids:
+        from app.services.knowledge_map_store import schedule_layout_updates
+        schedule_layout_updates(sorted(user_ids))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_changes(session):
+    # A failed flush leaves what before_flush collected; none of it may reach the next flush
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_LAYOUT_PENDING_KEY, None)
+    session.info.pop(_LAYOUT_COMMIT_KEY, None)
+    session.info.pop(_DECK_DELTAS_KEY, None)
+    session.info.pop(_DECK_REVIEWS_KEY, None)
+    session.info.pop(_TOMBSTONES_KEY, None)
+    session.info.pop(_TAGGED_CARDS_KEY, None)
+    session.info.pop(_SIGNED_CARDS_KEY, None)
+    session.info.pop(_DELETED_CARD_IDS_KEY, None)
@@ -1,8 +1,20 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import BigInteger, Column, Integer, String, Text, DateTime, ForeignKey, Index, literal_column
 from sqlalchemy.sql import func
+import sqlalchemy.dialects.postgresql  # noqa: F401 - registers the full-text search functions used below
 from sqlalchemy.orm import relationship
 from app.database import Base
 
+def search_document(concept, definition):
+    """
+    PostgreSQL tsvector over a card: concept weighted A, definition B.
+    The GIN index below is built on exactly this expression, and searches must use it too.
+    """
+    config = literal_column("'simple'::regconfig")  # No stemming: stems break prefix matching
+    empty = literal_column("''")
+    return func.setweight(func.to_tsvector(config, func.coalesce(concept, empty)), literal_column("'A'")).op("||")(
+        func.setweight(func.to_tsvector(config, func.coalesce(definition, empty)), literal_column("'B'"))
+    )
+
 class Flashcard(Base):
     __tablename__ = "flashcards"
     
@@ -14,9 +26,20 @@ class Flashcard(Base):
     source_url = Column(String(1024), nullable=True)  # URLs can be long
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Source Anki note of imported cards, so re-importing the deck updates them in place
+    # (DB columns added via /admin/migrate-anki-notes-public)
+    anki_guid = Column(String(64), nullable=True)
+    anki_mod = Column(BigInteger, nullable=True)  # Note modification time (epoch seconds) when last imported
     
     # Relationships
     user = relationship("User", back_populates="flashcards")
     reviews = relationship("CardReview", back_populates="flashcard", cascade="all, delete-orphan")
-    deck_id = Column(Integer, ForeignKey("decks.id"), nullable=True)
-    deck = relationship("Deck", back_populates="flashcards")
\ No newline at end of file
+    deck_id = Column(Integer, ForeignKey("decks.id"), nullable=True, index=True)
+    deck = relationship("Deck", back_populates="flashcards")
+
+    __table_args__ = (
+        Index("ix_flashcards_user_updated_at", "user_id", "updated_at"),  # Delta sync range scan
+        Index("ix_flashcards_deck_anki_guid", "deck_id", "anki_guid"),  # Anki re-import diff
+        # Full-text search (PostgreSQL; SQLite uses the FTS5 table from app/services/search.py)
+        Index("ix_flashcards_search", search_document(concept, definition), postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
\ No newline at end of file
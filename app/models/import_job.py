@@ -0,0 +1,68 @@
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, LargeBinary, UniqueConstraint
+from sqlalchemy.sql import func
+from app.database import Base
+
+class ImportJob(Base):
+    """
+    A background import (Anki package or text export, PDF, pasted text) run by the Celery
+    task in app/services/import_jobs.py and polled through GET /imports/{id}.
+    `checkpoint` holds what a retry needs to resume without redoing work: the Anki note
+    cursor and counts, or the cards the LLM already generated.
+    """
+    __tablename__ = "import_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    kind = Column(String(16), nullable=False)  # 'anki_package', 'anki_text', 'pdf', 'text'
+    status = Column(String(16), nullable=False, default="queued")  # queued, running, succeeded, failed, cancelled
+    stage = Column(String(32), nullable=False, default="queued")  # e.g. 'extracting', 'generating', 'saving'
+    progress_done = Column(Integer, nullable=False, default=0)
+    progress_total = Column(Integer, nullable=True)  # Unknown until the stage has counted its work
+    params = Column(JSON, nullable=False, default=dict)  # Import options (deck_id, duplicates, instructions, ...)
+    upload_path = Column(String, nullable=True)  # Local copy of the upload under IMPORT_UPLOAD_DIR; the bytes are in import_upload_chunks
+    idempotency_key = Column(String(128), nullable=True)  # Idempotency-Key header of the creating request
+    checkpoint = Column(JSON, nullable=False, default=dict)
+    created_card_ids = Column(JSON, nullable=False, default=list)
+    errors = Column(JSON, nullable=False, default=list)  # Per-card problems and the error that failed the job
+    result = Column(JSON, nullable=True)  # Summary of a finished import (counts, deck, duplicates)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)  # Last progress write of the running attempt
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "idempotency_key", name="uq_import_jobs_user_idempotency_key"),
+    )
+
+
+class ImportUploadChunk(Base):
+    """
+    The bytes of an import job's uploaded file, in order. Kept in the database because the
+    web process that receives the upload and the Celery worker that runs the job don't share
+    a filesystem; the worker writes them back to a local file (see _require_upload in
+    app/services/import_jobs.py). Deleted with the upload once the job succeeds or expires.
+    """
+    __tablename__ = "import_upload_chunks"
+
+    job_id = Column(Integer, ForeignKey("import_jobs.id", ondelete="CASCADE"), primary_key=True)
+    position = Column(Integer, primary_key=True)
+    data = Column(LargeBinary, nullable=False)
+
+class ImportCacheEntry(Base):
+    """
+    Reusable output of an import's expensive steps (extracted PDF pages, generated cards),
+    keyed by a SHA-256 of the uploaded content together with everything else that shaped
+    the output (import kind, instructions, GPT model); see app/services/import_cache.py.
+    Entries are shared across users: identical content and options give identical output.
+    """
+    __tablename__ = "import_cache_entries"
+
+    key = Column(String(64), primary_key=True)
+    kind = Column(String(16), nullable=False)  # 'pdf_pages', or the import kind whose cards it holds
+    payload = Column(JSON, nullable=False)
+    size_bytes = Column(Integer, nullable=False)  # Serialized payload size, for the IMPORT_CACHE_MAX_MB bound
+    hits = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_used_at = Column(DateTime(timezone=True), nullable=False, index=True)  # Least recently used entries are evicted first
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, Float, Boolean, DateTime, ForeignKey, JSON
+from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship
+from app.database import Base
+
+class KnowledgeMapLayout(Base):
+    """
+    Persisted knowledge map layout for a user.
+    Positions are raw layout coordinates keyed by flashcard id; `signatures` records the
+    deck and tags each card had when it was placed, so changed cards can be re-placed
+    incrementally instead of re-running the whole layout.
+    """
+    __tablename__ = "knowledge_map_layouts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, unique=True, index=True)
+    deck_attraction = Column(Float, nullable=False, default=1.0)
+    tag_attraction = Column(Float, nullable=False, default=0.5)
+    positions = Column(JSON, nullable=False, default=dict)  # {"<card_id>": [x, y]}
+    signatures = Column(JSON, nullable=False, default=dict)  # {"<card_id>": "<deck_id>|<tags>"}
+    links = Column(JSON, nullable=False, default=list)  # [{"source", "target", "value"}]
+    version = Column(Integer, nullable=False, default=0)  # Bumped on every rebuild
+    is_stale = Column(Boolean, nullable=False, default=True)  # Set when cards/tags change
+    update_queued_at = Column(DateTime(timezone=True), nullable=True)  # Set while a background update is queued
+    built_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    user = relationship("User", back_populates="knowledge_map_layout")
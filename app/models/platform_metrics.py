@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, Boolean, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+class PlatformMetricsSnapshot(Base):
+    """
+    Point-in-time site-wide counters for the admin panel.
+    Captured every few minutes by a Celery beat task; the first snapshot of each hour is
+    flagged is_hourly and kept as history, the rest are pruned after a day.
+    """
+    __tablename__ = "platform_metrics_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    captured_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+    is_hourly = Column(Boolean, default=False, nullable=False, index=True)
+
+    total_users = Column(Integer, default=0, nullable=False)
+    premium_users = Column(Integer, default=0, nullable=False)
+    sms_opt_in_users = Column(Integer, default=0, nullable=False)
+    active_users = Column(Integer, default=0, nullable=False)  # Reviewed in the last 30 days
+    users_with_sms_conversation = Column(Integer, default=0, nullable=False)
+    new_users_7d = Column(Integer, default=0, nullable=False)
+    new_users_30d = Column(Integer, default=0, nullable=False)
+    total_flashcards = Column(Integer, default=0, nullable=False)
+    total_reviews = Column(Integer, default=0, nullable=False)
+    total_decks = Column(Integer, default=0, nullable=False)
+    reviews_last_7d = Column(Integer, default=0, nullable=False)
+    reviews_last_30d = Column(Integer, default=0, nullable=False)
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, Float, DateTime, ForeignKey
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Integer, String, Text, Boolean, Float, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func, false
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import *
@@ -9,7 +9,7 @@ class CardReview(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    flashcard_id = Column(Integer, ForeignKey("flashcards.id"), nullable=False)
+    flashcard_id = Column(Integer, ForeignKey("flashcards.id"), nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     user_response = Column(Text)
     was_correct = Column(Boolean)
@@ -25,11 +25,16 @@ class CardReview(Base):
     
     # Review source tracking
     is_sms_review = Column(Boolean, default=False)  # True if review was done via SMS
+    is_imported = Column(Boolean, default=False, nullable=False, server_default=false())  # Schedule seeded from an Anki import, not an answer (added via /admin/migrate-imported-reviews-public)
         
     # Relationships
     user = relationship("User", back_populates="reviews")
     flashcard = relationship("Flashcard", back_populates="reviews")
 
+    __table_args__ = (
+        Index("ix_card_reviews_user_created_at", "user_id", "created_at"),  # Delta sync range scan
+    )
+
 class StudySession(Base):
     __tablename__ = "study_sessions"
     
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+class SyncTombstone(Base):
+    """
+    Record of a deleted flashcard, deck, deck SMS setting or review, so delta sync
+    (GET /sync) can tell clients what to drop from their local cache.
+    Written by the session hooks in app/models/events.py; pruned after
+    SYNC_TOMBSTONE_RETENTION_DAYS (older cursors get a full resync instead).
+    """
+    __tablename__ = "sync_tombstones"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, nullable=False)  # No FK: tombstones outlive the rows (and users) they describe
+    entity_type = Column(String(32), nullable=False)  # 'flashcard', 'deck', 'deck_sms_settings', 'review'
+    entity_id = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_sync_tombstones_user_deleted_at", "user_id", "deleted_at"),
+    )
@@ -0,0 +1,33 @@
+from sqlalchemy import Column, Integer, SmallInteger, String, DateTime, ForeignKey, UniqueConstraint, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+class Tag(Base):
+    """
+    A user's tag (normalized: stripped, lowercase).
+    Flashcard.tags keeps the comma-separated copy the API returns; the session hooks in
+    app/models/events.py keep flashcard_tags in step with it.
+    """
+    __tablename__ = "tags"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    name = Column(String(255), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "name", name="uq_tags_user_name"),
+    )
+
+
+class FlashcardTag(Base):
+    """Flashcard <-> tag link; position keeps the card's tag order"""
+    __tablename__ = "flashcard_tags"
+
+    flashcard_id = Column(Integer, ForeignKey("flashcards.id", ondelete="CASCADE"), primary_key=True)
+    tag_id = Column(Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True)
+    position = Column(SmallInteger, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_flashcard_tags_tag_id", "tag_id"),  # Cards carrying a tag
+    )
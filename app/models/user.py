@@ -23,6 +23,7 @@ class User(Base):
     current_streak_days = Column(Integer, default=0)  # Current consecutive days with reviews
     longest_streak_days = Column(Integer, default=0)  # Longest streak achieved
     last_study_date = Column(DateTime(timezone=True), nullable=True)  # Last date user studied
+    data_version = Column(Integer, default=0, nullable=False, server_default="0")  # Bumped on any review/flashcard/deck change (response cache key)
     
     # Stripe subscription fields
     is_premium = Column(Boolean, default=False)  # Quick check for premium status
@@ -42,4 +43,5 @@ class User(Base):
     sessions = relationship("StudySession", back_populates="user", cascade="all, delete-orphan")
     conversation_state = relationship("ConversationState", back_populates="user", uselist=False, cascade="all, delete-orphan")
     decks = relationship("Deck", back_populates="user", cascade="all, delete-orphan")
-    deck_sms_settings = relationship("UserDeckSmsSettings", back_populates="user", cascade="all, delete-orphan")
\ No newline at end of file
+    deck_sms_settings = relationship("UserDeckSmsSettings", back_populates="user", cascade="all, delete-orphan")
+    knowledge_map_layout = relationship("KnowledgeMapLayout", back_populates="user", uselist=False, cascade="all, delete-orphan")
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, Boolean, DateTime, UniqueConstraint
+from sqlalchemy import Column, Integer, ForeignKey, Boolean, DateTime, UniqueConstraint, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -20,6 +20,7 @@ class UserDeckSmsSettings(Base):
     # Ensure one record per user-deck combination
     __table_args__ = (
         UniqueConstraint('user_id', 'deck_id', name='uq_user_deck_sms'),
+        Index('ix_user_deck_sms_settings_user_updated_at', 'user_id', 'updated_at'),  # Delta sync range scan
     )
     
     # Relationships
@@ -1,14 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.orm import Session
-from sqlalchemy import text, func
+from sqlalchemy import text, func, or_
 from datetime import datetime, timedelta, timezone
 from app.database import get_db, engine
-from app.models import User, Flashcard, CardReview, Deck, ConversationState
+from app.models import Base, User, Flashcard, CardReview, Deck, ConversationState, Tag, FlashcardTag, FlashcardSignature, FlashcardLshBucket, ImportJob, ImportUploadChunk, ImportCacheEntry
 from app.services.auth import get_current_active_user, require_admin_access
 from app.services.scheduler_service import send_due_flashcards_to_all_users, send_due_flashcards_to_user, get_user_flashcard_stats, cleanup_old_conversation_states
 from app.services.summary_service import send_daily_summary_to_user, get_daily_review_summary
 from app.services.streak_reminder_service import check_and_send_streak_reminders_for_all_users
-from typing import Dict, Any, List
+from app.services.platform_metrics import get_platform_metrics, hourly_history
+from app.services.deck_counters import reconcile_deck_counters
+from app.services.tag_store import backfill_flashcard_tags
+from app.services.search import ensure_search_index
+from app.services.dedup import backfill_flashcard_signatures
+from app.services.export import ExportFormat, flashcards_export_query, reviews_export_query, streaming_export
+from app.utils.pagination import encode_cursor, keyset_filter, keyset_order
+from typing import Dict, Any, List, Optional
 
 router = APIRouter(tags=["Admin"])
 
@@ -972,8 +979,6 @@ async def set_premium_status_public(
     """
     await require_admin_access(request, db)
     try:
-        from datetime import datetime, timezone, timedelta
-        
         if is_premium:
             # Set premium to TRUE and add some test subscription data
             sql_command = """
@@ -1085,15 +1090,316 @@ async def migrate_admin_field_public(
             "error": str(e)
         }
 
+@router.post("/migrate-user-data-version-field-public")
+async def migrate_user_data_version_field_public(
+    request: Request,
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    Add data_version field to users table (response cache invalidation)
+    (Admin access required)
+    """
+    await require_admin_access(request, db)
+    try:
+        sql_command = """
+            ALTER TABLE users 
+            ADD COLUMN IF NOT EXISTS data_version INTEGER NOT NULL DEFAULT 0;
+        """
+        
+        with engine.connect() as conn:
+            conn.execute(text(sql_command))
+            conn.commit()
+        
+        return {
+            "success": True,
+            "message": "User data_version field migration completed"
+        }
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+@router.post("/migrate-deck-counters-public")
+async def migrate_deck_counters_public(
+    request: Request,
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    Add denormalized counter columns to decks (card_count, due_count_cached, last_reviewed_at),
+    index the foreign keys they are computed from, and backfill every deck
+    (Admin access required)
+    """
+    await require_admin_access(request, db)
+    try:
+        sql_commands = [
+            "ALTER TABLE decks ADD COLUMN IF NOT EXISTS card_count INTEGER NOT NULL DEFAULT 0;",
+            "ALTER TABLE decks ADD COLUMN IF NOT EXISTS due_count_cached INTEGER NOT NULL DEFAULT 0;",
+            "ALTER TABLE decks ADD COLUMN IF NOT EXISTS due_count_updated_at TIMESTAMP WITH TIME ZONE;",
+            "ALTER TABLE decks ADD COLUMN IF NOT EXISTS last_reviewed_at TIMESTAMP WITH TIME ZONE;",
+            "CREATE INDEX IF NOT EXISTS ix_flashcards_deck_id ON flashcards (deck_id);",
+            "CREATE INDEX IF NOT EXISTS ix_card_reviews_flashcard_id ON card_reviews (flashcard_id);",
+        ]
+        
+        with engine.connect() as conn:
+            for sql in sql_commands:
+                conn.execute(text(sql))
+            conn.commit()
+        
+        result = reconcile_deck_counters(db)
+        
+        return {
+            "success": True,
+            "message": f"Deck counters migration completed, backfilled {result['checked']} decks"
+        }
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+@router.post("/migrate-sync-public")
+async def migrate_sync_public(
+    request: Request,
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    Add decks.updated_at and the (user_id, updated_at/created_at) indexes delta sync scans
+    (Admin access required)
+    """
+    await require_admin_access(request, db)
+    try:
+        sql_commands = [
+            "ALTER TABLE decks ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT now();",
+            "UPDATE decks SET updated_at = COALESCE(created_at, now()) WHERE updated_at IS NULL;",
+            "CREATE INDEX IF NOT EXISTS ix_flashcards_user_updated_at ON flashcards (user_id, updated_at);",
+            "CREATE INDEX IF NOT EXISTS ix_decks_user_updated_at ON decks (user_id, updated_at);",
+            "CREATE INDEX IF NOT EXISTS ix_user_deck_sms_settings_user_updated_at ON user_deck_sms_settings (user_id, updated_at);",
+            "CREATE INDEX IF NOT EXISTS ix_card_reviews_user_created_at ON card_reviews (user_id, created_at);",
+        ]
+        
+        with engine.connect() as conn:
+            for sql in sql_commands:
+                conn.execute(text(sql))
+            conn.commit()
+        
+        return {
+            "success": True,
+            "message": "Delta sync migration completed (decks.updated_at and sync indexes)"
+        }
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+@router.post("/migrate-tags-public")
+async def migrate_tags_public(
+    request: Request,
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    Create the normalized tags / flashcard_tags tables and backfill them from every
+    flashcard's comma-separated tags (safe to re-run)
+    (Admin access required)
+    """
+    await require_admin_access(request, db)
+    try:
+        Base.metadata.create_all(bind=engine, tables=[Tag.__table__, FlashcardTag.__table__])
+        processed = backfill_flashcard_tags(db)
+        
+        return {
+            "success": True,
+            "message": f"Tags migration completed, backfilled {processed} flashcards"
+        }
+    except Exception as e:
+        db.rollback()
+        return {"success": False, "error": str(e)}
+
+@router.post("/migrate-search-public")
+async def migrate_search_public(
+    request: Request,
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    Create the full-text search index on flashcards (GIN tsvector index on PostgreSQL,
+    FTS5 table and triggers on SQLite)
+    (Admin access required)
+    """
+    await require_admin_access(request, db)
+    try:
+        if engine.dialect.name == "postgresql":
+            search_index = next(index for index in Flashcard.__table__.indexes if index.name == "ix_flashcards_search")
+            search_index.create(bind=engine, checkfirst=True)
+        else:
+            ensure_search_index(engine)
+        
+        return {
+            "success": True,
+            "message": "Full-text search index created"
+        }
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+@router.post("/migrate-dedup-public")
+async def migrate_dedup_public(
+    request: Request,
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    Create the near-duplicate detection tables (flashcard_signatures, flashcard_lsh_buckets)
+    and compute every flashcard's MinHash signature (safe to re-run)
+    (Admin access required)
+    """
+    await require_admin_access(request, db)
+    try:
+        Base.metadata.create_all(bind=engine, tables=[FlashcardSignature.__table__, FlashcardLshBucket.__table__])
+        processed = backfill_flashcard_signatures(db)
+        
+        return {
+            "success": True,
+            "message": f"Duplicate detection migration completed, backfilled {processed} flashcards"
+        }
+    except Exception as e:
+        db.rollback()
+        return {"success": False, "error": str(e)}
+
+@router.post("/migrate-import-jobs-public")
+async def migrate_import_jobs_public(
+    request: Request,
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    Create the import_jobs, import_upload_chunks and import_cache_entries tables for background
+    imports (safe to re-run)
+    (Admin access required)
+    """
+    await require_admin_access(request, db)
+    try:
+        Base.metadata.create_all(bind=engine, tables=[ImportJob.__table__, ImportUploadChunk.__table__, ImportCacheEntry.__table__])
+        
+        return {
+            "success": True,
+            "message": "Import jobs migration completed"
+        }
+    except Exception as e:
+        db.rollback()
+        return {"success": False, "error": str(e)}
+
+@router.post("/migrate-anki-notes-public")
+async def migrate_anki_notes_public(
+    request: Request,
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    Add flashcards.anki_guid / anki_mod and their (deck_id, anki_guid) index, which let Anki
+    re-imports update cards in place (safe to re-run)
+    (Admin access required)
+    """
+    await require_admin_access(request, db)
+    try:
+        sql_commands = [
+            "ALTER TABLE flashcards ADD COLUMN IF NOT EXISTS anki_guid VARCHAR(64);",
+            "ALTER TABLE flashcards ADD COLUMN IF NOT EXISTS anki_mod BIGINT;",
+            "CREATE INDEX IF NOT EXISTS ix_flashcards_deck_anki_guid ON flashcards (deck_id, anki_guid);",
+        ]
+        
+        with engine.connect() as conn:
+            for sql in sql_commands:
+                conn.execute(text(sql))
+            conn.commit()
+        
+        return {
+            "success": True,
+            "message": "Anki notes migration completed (flashcards.anki_guid, anki_mod)"
+        }
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+@router.post("/migrate-knowledge-map-queue-public")
+async def migrate_knowledge_map_queue_public(
+    request: Request,
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    Add knowledge_map_layouts.update_queued_at, which keeps at most one background layout
+    update queued per user (safe to re-run)
+    (Admin access required)
+    """
+    await require_admin_access(request, db)
+    try:
+        sql_commands = [
+            "ALTER TABLE knowledge_map_layouts ADD COLUMN IF NOT EXISTS update_queued_at TIMESTAMP WITH TIME ZONE;",
+        ]
+        
+        with engine.connect() as conn:
+            for sql in sql_commands:
+                conn.execute(text(sql))
+            conn.commit()
+        
+        return {
+            "success": True,
+            "message": "Knowledge map queue migration completed (knowledge_map_layouts.update_queued_at)"
+        }
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+@router.post("/migrate-imported-reviews-public")
+async def migrate_imported_reviews_public(
+    request: Request,
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    Add card_reviews.is_imported and mark the reviews earlier Anki imports seeded (the only
+    reviews written without a response or feedback) as imported (safe to re-run)
+    (Admin access required)
+    """
+    await require_admin_access(request, db)
+    try:
+        sql_commands = [
+            "ALTER TABLE card_reviews ADD COLUMN IF NOT EXISTS is_imported BOOLEAN NOT NULL DEFAULT FALSE;",
+            """
+            UPDATE card_reviews
+            SET is_imported = TRUE,
+                user_response = '',
+                confidence_score = CASE WHEN was_correct THEN 1.0 ELSE 0.0 END,
+                llm_feedback = 'Imported from Anki'
+            WHERE user_response IS NULL AND llm_feedback IS NULL AND confidence_score IS NULL;
+            """,
+        ]
+
+        with engine.connect() as conn:
+            for sql in sql_commands:
+                conn.execute(text(sql))
+            conn.commit()
+
+        return {
+            "success": True,
+            "message": "Imported reviews migration completed (card_reviews.is_imported)"
+        }
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+# Sort keys for the admin user list; nullable values sort as the epoch so keyset cursors stay total
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+ADMIN_USER_SORTS = ("created_at", "email", "last_review_date", "reviews_count", "flashcards_count", "decks_count")
+
+
 @router.get("/dashboard")
 async def get_admin_dashboard(
     request: Request,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    sort: str = Query("created_at", enum=list(ADMIN_USER_SORTS)),
+    order: str = Query("desc", enum=["asc", "desc"]),
+    is_premium: Optional[bool] = None,
+    sms_opt_in: Optional[bool] = None,
+    active_since: Optional[datetime] = None,
+    search: Optional[str] = None,
+    include_stats: Optional[bool] = None,
+    fresh: bool = False
 ) -> Dict[str, Any]:
     """
-    Get admin dashboard statistics and user list
+    Get admin dashboard statistics and a page of the user list
     (Admin access required)
+
+    Users are keyset-paginated: pass `next_cursor` from the previous page as `cursor`.
+    Filters: is_premium, sms_opt_in, active_since (last review at or after), search (email/name).
+    Site-wide stats are included on the first page (or when include_stats=true); they come
+    from the latest platform metrics snapshot unless fresh=1 forces a recompute.
     """
     # Check admin access
     await require_admin_access(request, db)
@@ -1106,72 +1412,71 @@ async def get_admin_dashboard(
         )
     
     try:
-        now = datetime.now(timezone.utc)
-        last_7_days = now - timedelta(days=7)
-        last_30_days = now - timedelta(days=30)
-        
-        # Overall statistics
-        total_users = db.query(func.count(User.id)).scalar() or 0
-        premium_users = db.query(func.count(User.id)).filter(User.is_premium == True).scalar() or 0
-        sms_opt_in_users = db.query(func.count(User.id)).filter(User.sms_opt_in == True).scalar() or 0
-        active_users = db.query(func.count(func.distinct(User.id))).join(
-            CardReview, User.id == CardReview.user_id
-        ).filter(CardReview.review_date >= last_30_days).scalar() or 0
-        
-        # Recent signups
-        new_users_7d = db.query(func.count(User.id)).filter(
-            User.created_at >= last_7_days
-        ).scalar() or 0
-        new_users_30d = db.query(func.count(User.id)).filter(
-            User.created_at >= last_30_days
-        ).scalar() or 0
-        
-        # Content statistics
-        total_flashcards = db.query(func.count(Flashcard.id)).scalar() or 0
-        total_reviews = db.query(func.count(CardReview.id)).scalar() or 0
-        total_decks = db.query(func.count(Deck.id)).scalar() or 0
-        
-        # Recent activity
-        reviews_last_7d = db.query(func.count(CardReview.id)).filter(
-            CardReview.review_date >= last_7_days
-        ).scalar() or 0
-        reviews_last_30d = db.query(func.count(CardReview.id)).filter(
-            CardReview.review_date >= last_30_days
-        ).scalar() or 0
-        
-        # Users with SMS conversation state
-        users_with_sms_conversation = db.query(func.count(func.distinct(ConversationState.user_id))).scalar() or 0
-        
-        # Get user list with details
-        users = db.query(User).order_by(User.created_at.desc()).all()
+        # Per-user counts as grouped subqueries, LEFT JOINed onto users in one statement
+        flashcard_counts = db.query(
+            Flashcard.user_id, func.count(Flashcard.id).label("flashcards_count")
+        ).group_by(Flashcard.user_id).subquery()
+        review_counts = db.query(
+            CardReview.user_id,
+            func.count(CardReview.id).label("reviews_count"),
+            func.max(CardReview.review_date).label("last_review_date")
+        ).filter(CardReview.is_imported == False).group_by(CardReview.user_id).subquery()
+        deck_counts = db.query(
+            Deck.user_id, func.count(Deck.id).label("decks_count")
+        ).group_by(Deck.user_id).subquery()
+        conversations = db.query(ConversationState.user_id).group_by(ConversationState.user_id).subquery()
+        
+        sort_columns = {
+            # Signup order; ids are assigned in creation order and avoid a datetime cursor
+            "created_at": User.id,
+            "email": User.email,
+            "last_review_date": func.coalesce(review_counts.c.last_review_date, _EPOCH),
+            "reviews_count": func.coalesce(review_counts.c.reviews_count, 0),
+            "flashcards_count": func.coalesce(flashcard_counts.c.flashcards_count, 0),
+            "decks_count": func.coalesce(deck_counts.c.decks_count, 0),
+        }
+        sort_column = sort_columns[sort]
+        descending = order == "desc"
+        
+        query = db.query(
+            User,
+            func.coalesce(flashcard_counts.c.flashcards_count, 0).label("flashcards_count"),
+            func.coalesce(review_counts.c.reviews_count, 0).label("reviews_count"),
+            func.coalesce(deck_counts.c.decks_count, 0).label("decks_count"),
+            review_counts.c.last_review_date,
+            conversations.c.user_id.isnot(None).label("has_sms_conversation"),
+            sort_column.label("sort_value")
+        ).outerjoin(
+            flashcard_counts, flashcard_counts.c.user_id == User.id
+        ).outerjoin(
+            review_counts, review_counts.c.user_id == User.id
+        ).outerjoin(
+            deck_counts, deck_counts.c.user_id == User.id
+        ).outerjoin(
+            conversations, conversations.c.user_id == User.id
+        )
+        
+        if is_premium is not None:
+            query = query.filter(func.coalesce(User.is_premium, False) == is_premium)
+        if sms_opt_in is not None:
+            query = query.filter(func.coalesce(User.sms_opt_in, False) == sms_opt_in)
+        if active_since is not None:
+            query = query.filter(review_counts.c.last_review_date >= active_since)
+        if search:
+            pattern = f"%{search.strip()}%"
+            query = query.filter(or_(User.email.ilike(pattern), User.name.ilike(pattern)))
+        
+        after_cursor = keyset_filter(sort_column, User.id, cursor, descending)
+        if after_cursor is not None:
+            query = query.filter(after_cursor)
+        
+        rows = query.order_by(*keyset_order(sort_column, User.id, descending)).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
         
         user_list = []
-        for user in users:
-            # Get user stats
-            user_flashcards = db.query(func.count(Flashcard.id)).filter(
-                Flashcard.user_id == user.id
-            ).scalar() or 0
-            
-            user_reviews = db.query(func.count(CardReview.id)).filter(
-                CardReview.user_id == user.id
-            ).scalar() or 0
-            
-            user_decks = db.query(func.count(Deck.id)).filter(
-                Deck.user_id == user.id
-            ).scalar() or 0
-            
-            # Check if user has SMS conversation
-            has_sms_conversation = db.query(ConversationState).filter(
-                ConversationState.user_id == user.id
-            ).first() is not None
-            
-            # Get last review date
-            last_review = db.query(CardReview).filter(
-                CardReview.user_id == user.id
-            ).order_by(CardReview.review_date.desc()).first()
-            
-            last_review_date = last_review.review_date.isoformat() if last_review else None
-            
+        for row in rows:
+            user = row.User
             user_list.append({
                 "id": user.id,
                 "email": user.email,
@@ -1179,38 +1484,40 @@ async def get_admin_dashboard(
                 "is_premium": user.is_premium or False,
                 "is_admin": user.is_admin or False,
                 "sms_opt_in": user.sms_opt_in or False,
-                "has_sms_conversation": has_sms_conversation,
+                "has_sms_conversation": bool(row.has_sms_conversation),
                 "phone_number": user.phone_number,
                 "timezone": user.timezone,
                 "current_streak_days": user.current_streak_days or 0,
                 "longest_streak_days": user.longest_streak_days or 0,
-                "flashcards_count": user_flashcards,
-                "reviews_count": user_reviews,
-                "decks_count": user_decks,
-                "last_review_date": last_review_date,
+                "flashcards_count": row.flashcards_count,
+                "reviews_count": row.reviews_count,
+                "decks_count": row.decks_count,
+                "last_review_date": row.last_review_date.isoformat() if row.last_review_date else None,
                 "created_at": user.created_at.isoformat() if user.created_at else None,
                 "subscription_status": user.stripe_subscription_status,
                 "subscription_end_date": user.subscription_end_date.isoformat() if user.subscription_end_date else None,
             })
         
-        return {
+        next_cursor = encode_cursor(rows[-1].sort_value, rows[-1].User.id) if has_more else None
+        
+        response = {
             "success": True,
-            "stats": {
-                "total_users": total_users,
-                "premium_users": premium_users,
-                "sms_opt_in_users": sms_opt_in_users,
-                "active_users": active_users,
-                "users_with_sms_conversation": users_with_sms_conversation,
-                "new_users_7d": new_users_7d,
-                "new_users_30d": new_users_30d,
-                "total_flashcards": total_flashcards,
-                "total_reviews": total_reviews,
-                "total_decks": total_decks,
-                "reviews_last_7d": reviews_last_7d,
-                "reviews_last_30d": reviews_last_30d,
-            },
-            "users": user_list
+            "users": user_list,
+            "pagination": {
+                "limit": limit,
+                "sort": sort,
+                "order": order,
+                "has_more": has_more,
+                "next_cursor": next_cursor,
+            }
         }
+        if include_stats or (include_stats is None and not cursor):
+            metrics = get_platform_metrics(db, fresh=fresh)
+            response["stats_captured_at"] = metrics.pop("captured_at")
+            response["stats"] = metrics
+        return response
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -1218,3 +1525,36 @@ async def get_admin_dashboard(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error fetching admin dashboard: {str(e)}"
         )
+
+
+@router.get("/metrics/history")
+async def get_platform_metrics_history(
+    request: Request,
+    db: Session = Depends(get_db),
+    hours: int = Query(168, ge=1, le=24 * 90)
+) -> Dict[str, Any]:
+    """
+    Hourly platform metrics snapshots for trend charts, oldest first
+    (Admin access required)
+    """
+    await require_admin_access(request, db)
+    return {"success": True, "hours": hours, "snapshots": hourly_history(db, hours)}
+
+
+@router.get("/export/{kind}")
+async def export_all_users(
+    kind: str,
+    request: Request,
+    db: Session = Depends(get_db),
+    format: ExportFormat = Query(ExportFormat.ndjson),
+    gzip: bool = Query(True, description="Compress the download (.gz)")
+):
+    """
+    Stream every user's flashcards or reviews (kind = flashcards | reviews) for backup,
+    with a user_id column (Admin access required)
+    """
+    await require_admin_access(request, db)
+    queries = {"flashcards": flashcards_export_query, "reviews": reviews_export_query}
+    if kind not in queries:
+        raise HTTPException(status_code=404, detail="Unknown export; use flashcards or reviews")
+    return streaming_export(queries[kind](), format, gzip, f"all-{kind}")
@@ -1,20 +1,25 @@
 """
 Dashboard routes for analytics and statistics
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_, case, cast, Integer
+from sqlalchemy import func, and_, or_, case, cast, Integer, Float
 from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Any
 from app.database import get_db
 from app.models import User, CardReview, Flashcard, Deck
 from app.services.auth import get_current_active_user
+from app.services.response_cache import cached_user_response
+from app.services import tag_store
 
 router = APIRouter()
 
+RESPONSE_WHITESPACE = " \t\n\r\x0b\x0c"  # Trimmed from answers before they are grouped
+
 
 @router.get("/stats")
 def get_dashboard_stats(
+    request: Request,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -25,6 +30,16 @@ def get_dashboard_stats(
     - Current streak
     - Weakest areas (tags/decks with lowest accuracy)
     """
+    # Streaks, heatmap range and week/month comparisons all depend on today's date
+    today = datetime.now(timezone.utc).date()
+    return cached_user_response(
+        request, current_user, "dashboard.stats",
+        lambda: _compute_dashboard_stats(current_user, db),
+        params={"date": today.isoformat()}
+    )
+
+
+def _compute_dashboard_stats(current_user: User, db: Session) -> Dict[str, Any]:
     today = datetime.now(timezone.utc).date()
     one_year_ago = today - timedelta(days=365)
     
@@ -67,6 +82,7 @@ def get_dashboard_stats(
     reviews = db.query(CardReview).filter(
         and_(
             CardReview.user_id == current_user.id,
+            CardReview.is_imported == False,
             CardReview.flashcard_id.in_(flashcard_ids),
             CardReview.review_date >= datetime.combine(one_year_ago, datetime.min.time()).replace(tzinfo=timezone.utc)
         )
@@ -162,36 +178,13 @@ def get_dashboard_stats(
     
     # Streak already calculated above, just use those values
     
-    # Weakest areas - calculate from reviews we already fetched
-    # Group by tags
-    tag_stats: Dict[str, Dict[str, int]] = {}
-    for review in reviews:
-        flashcard = next((f for f in all_flashcards if f.id == review.flashcard_id), None)
-        if not flashcard or not flashcard.tags:
-            continue
-        
-        tag = flashcard.tags
-        if tag not in tag_stats:
-            tag_stats[tag] = {'total': 0, 'correct': 0}
-        
-        tag_stats[tag]['total'] += 1
-        if review.was_correct:
-            tag_stats[tag]['correct'] += 1
-    
-    # Calculate accuracy for each tag and filter by minimum reviews
-    weakest_tags = []
-    for tag, stats in tag_stats.items():
-        if stats['total'] >= 5:  # Only show tags with at least 5 reviews
-            accuracy = (stats['correct'] / stats['total'] * 100) if stats['total'] > 0 else 0
-            weakest_tags.append({
-                'tag': tag,
-                'accuracy': round(accuracy, 1),
-                'review_count': stats['total']
-            })
-    
-    # Sort by accuracy (lowest first) and limit to 10
-    weakest_tags.sort(key=lambda x: x['accuracy'])
-    weakest_tags = weakest_tags[:10]
+    # Weakest areas - tags with at least 5 reviews in the past year, lowest accuracy first,
+    # aggregated in SQL over flashcard_tags
+    weakest_tags = tag_store.weakest_tags(
+        db, current_user.id,
+        since=datetime.combine(one_year_ago, datetime.min.time()).replace(tzinfo=timezone.utc),
+        min_reviews=5, limit=10
+    )
     
     # Weakest decks - calculate from deck_reviews we already have
     weakest_decks = []
@@ -260,6 +253,7 @@ def get_dashboard_stats(
         reviews = db.query(CardReview).filter(
             and_(
                 CardReview.user_id == current_user.id,
+                CardReview.is_imported == False,
                 CardReview.flashcard_id.in_(flashcard_ids),
                 CardReview.review_date >= start_of_day,
                 CardReview.review_date <= end_of_day
@@ -298,6 +292,7 @@ def get_dashboard_stats(
 
 @router.get("/difficult-cards")
 def get_difficult_cards(
+    request: Request,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -305,62 +300,71 @@ def get_difficult_cards(
     Get top 5 most difficult cards based on user's accuracy
     Returns cards with lowest accuracy (at least 3 reviews to avoid noise)
     """
-    # Get all flashcards for the user
-    all_flashcards = db.query(Flashcard).filter(Flashcard.user_id == current_user.id).all()
-    flashcard_ids = [card.id for card in all_flashcards]
-    
-    if not flashcard_ids:
-        return {"difficult_cards": []}
-    
-    # Get all reviews for user's flashcards
-    reviews = db.query(CardReview).filter(
+    return cached_user_response(
+        request, current_user, "dashboard.difficult_cards",
+        lambda: _compute_difficult_cards(current_user, db)
+    )
+
+
+def _compute_difficult_cards(current_user: User, db: Session) -> Dict[str, Any]:
+    # Per-card accuracy aggregated in SQL; only the 5 lowest-accuracy cards come back
+    total_reviews = func.count(CardReview.id)
+    correct_reviews = func.sum(case((CardReview.was_correct == True, 1), else_=0))
+    card_stats = db.query(
+        CardReview.flashcard_id,
+        total_reviews.label('total_reviews'),
+        correct_reviews.label('correct_reviews')
+    ).join(
+        Flashcard, Flashcard.id == CardReview.flashcard_id
+    ).filter(
         CardReview.user_id == current_user.id,
-        CardReview.flashcard_id.in_(flashcard_ids)
-    ).all()
-    
-    # Calculate accuracy per flashcard
-    card_stats: Dict[int, Dict[str, Any]] = {}
+        CardReview.is_imported == False,
+        Flashcard.user_id == current_user.id
+    ).group_by(
+        CardReview.flashcard_id
+    ).having(
+        total_reviews >= 3  # Minimum 3 reviews to avoid noise
+    ).order_by(
+        cast(correct_reviews, Float) / total_reviews,
+        CardReview.flashcard_id
+    ).limit(5).all()
+    
+    if not card_stats:
+        return {"difficult_cards": []}
     
-    for review in reviews:
-        flashcard_id = review.flashcard_id
-        if flashcard_id not in card_stats:
-            card_stats[flashcard_id] = {
-                'total_reviews': 0,
-                'correct_reviews': 0
-            }
-        
-        card_stats[flashcard_id]['total_reviews'] += 1
-        if review.was_correct:
-            card_stats[flashcard_id]['correct_reviews'] += 1
+    cards = _cards_with_deck_names(db, [row.flashcard_id for row in card_stats])
     
-    # Calculate accuracy and filter cards with at least 3 reviews
     difficult_cards = []
-    for flashcard_id, stats in card_stats.items():
-        if stats['total_reviews'] >= 3:  # Minimum 3 reviews to avoid noise
-            accuracy = (stats['correct_reviews'] / stats['total_reviews'] * 100) if stats['total_reviews'] > 0 else 0
-            
-            # Find the flashcard
-            flashcard = next((f for f in all_flashcards if f.id == flashcard_id), None)
-            if flashcard:
-                difficult_cards.append({
-                    'flashcard_id': flashcard_id,
-                    'concept': flashcard.concept,
-                    'definition': flashcard.definition,
-                    'accuracy': round(accuracy, 1),
-                    'total_reviews': stats['total_reviews'],
-                    'correct_reviews': stats['correct_reviews'],
-                    'deck_id': flashcard.deck_id,
-                    'deck_name': flashcard.deck.name if flashcard.deck else None
-                })
-    
-    # Sort by accuracy (lowest first) and take top 5
-    difficult_cards.sort(key=lambda x: x['accuracy'])
-    difficult_cards = difficult_cards[:5]
+    for row in card_stats:
+        flashcard = cards.get(row.flashcard_id)
+        if not flashcard:
+            continue
+        correct = int(row.correct_reviews or 0)
+        difficult_cards.append({
+            'flashcard_id': row.flashcard_id,
+            'concept': flashcard.concept,
+            'definition': flashcard.definition,
+            'accuracy': round(correct / row.total_reviews * 100, 1),
+            'total_reviews': row.total_reviews,
+            'correct_reviews': correct,
+            'deck_id': flashcard.deck_id,
+            'deck_name': flashcard.deck_name
+        })
     
     return {"difficult_cards": difficult_cards}
 
+
+def _cards_with_deck_names(db: Session, flashcard_ids: List[int]) -> Dict[int, Any]:
+    """Fetch just the given cards (with their deck name) keyed by id"""
+    rows = db.query(
+        Flashcard.id, Flashcard.concept, Flashcard.definition, Flashcard.deck_id,
+        Deck.name.label('deck_name')
+    ).outerjoin(Deck, Deck.id == Flashcard.deck_id).filter(Flashcard.id.in_(flashcard_ids)).all()
+    return {row.id: row for row in rows}
+
 @router.get("/confusion-breakdown")
 def get_confusion_breakdown(
+    request: Request,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -368,272 +372,186 @@ def get_confusion_breakdown(
     Get confusion breakdown - most common incorrect answers per flashcard
     Returns cards with their most frequently typed wrong answers
     """
-    # Get all flashcards for the user
-    all_flashcards = db.query(Flashcard).filter(Flashcard.user_id == current_user.id).all()
-    flashcard_ids = [card.id for card in all_flashcards]
-    
-    if not flashcard_ids:
-        return {"confusion_breakdown": []}
-    
-    # Get all incorrect reviews
-    incorrect_reviews = db.query(CardReview).filter(
+    return cached_user_response(
+        request, current_user, "dashboard.confusion_breakdown",
+        lambda: _compute_confusion_breakdown(current_user, db)
+    )
+
+
+def _compute_confusion_breakdown(current_user: User, db: Session) -> Dict[str, Any]:
+    # Normalize the response (lowercase, strip whitespace) in SQL so answers group there.
+    # Plain trim() only strips spaces; trim tabs and line breaks too, as str.strip() does.
+    trim = func.btrim if db.get_bind().dialect.name == "postgresql" else func.trim
+    normalized_response = func.lower(trim(CardReview.user_response, RESPONSE_WHITESPACE))
+    incorrect = and_(
         CardReview.user_id == current_user.id,
-        CardReview.flashcard_id.in_(flashcard_ids),
+        Flashcard.user_id == current_user.id,
+        CardReview.is_imported == False,
         CardReview.was_correct == False,
-        CardReview.user_response.isnot(None)
-    ).all()
-    
-    # Group incorrect answers by flashcard
-    confusion_map: Dict[int, Dict[str, int]] = {}
-    
-    for review in incorrect_reviews:
-        flashcard_id = review.flashcard_id
-        # Normalize the response (lowercase, strip whitespace)
-        normalized_response = review.user_response.strip().lower() if review.user_response else ""
-        
-        if not normalized_response:
-            continue
-        
-        if flashcard_id not in confusion_map:
-            confusion_map[flashcard_id] = {}
-        
-        if normalized_response not in confusion_map[flashcard_id]:
-            confusion_map[flashcard_id][normalized_response] = 0
-        
-        confusion_map[flashcard_id][normalized_response] += 1
+        CardReview.user_response.isnot(None),
+        normalized_response != ''
+    )
+    
+    # Top 3 most confused cards by total incorrect answers
+    total_incorrect = func.count(CardReview.id)
+    top_cards = db.query(
+        CardReview.flashcard_id,
+        total_incorrect.label('total_incorrect')
+    ).join(
+        Flashcard, Flashcard.id == CardReview.flashcard_id
+    ).filter(incorrect).group_by(
+        CardReview.flashcard_id
+    ).order_by(
+        total_incorrect.desc(), CardReview.flashcard_id
+    ).limit(3).all()
+    
+    if not top_cards:
+        return {"confusion_breakdown": []}
     
-    # Build result with top incorrect answers per card
+    top_card_ids = [row.flashcard_id for row in top_cards]
+    
+    # Top 5 wrong answers for each of those cards, ranked per card with a window function
+    answer_count = func.count(CardReview.id)
+    answer_counts = db.query(
+        CardReview.flashcard_id.label('flashcard_id'),
+        normalized_response.label('answer'),
+        answer_count.label('count'),
+        func.row_number().over(
+            partition_by=CardReview.flashcard_id,
+            order_by=(answer_count.desc(), normalized_response)
+        ).label('answer_rank')
+    ).join(
+        Flashcard, Flashcard.id == CardReview.flashcard_id
+    ).filter(
+        incorrect, CardReview.flashcard_id.in_(top_card_ids)
+    ).group_by(
+        CardReview.flashcard_id, normalized_response
+    ).subquery()
+    
+    top_answers: Dict[int, List[Dict[str, Any]]] = {card_id: [] for card_id in top_card_ids}
+    for row in db.query(answer_counts).filter(answer_counts.c.answer_rank <= 5).order_by(
+        answer_counts.c.flashcard_id, answer_counts.c.answer_rank
+    ):
+        top_answers[row.flashcard_id].append({'answer': row.answer, 'count': row.count})
+    
+    cards = _cards_with_deck_names(db, top_card_ids)
+    
+    # Most confused cards first
     confusion_breakdown = []
-    for flashcard_id, wrong_answers in confusion_map.items():
-        # Find the flashcard
-        flashcard = next((f for f in all_flashcards if f.id == flashcard_id), None)
+    for row in top_cards:
+        flashcard = cards.get(row.flashcard_id)
         if not flashcard:
             continue
-        
-        # Sort wrong answers by frequency and take top 5
-        sorted_answers = sorted(
-            wrong_answers.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )[:5]
-        
-        if sorted_answers:
-            confusion_breakdown.append({
-                'flashcard_id': flashcard_id,
-                'concept': flashcard.concept,
-                'definition': flashcard.definition,
-                'deck_id': flashcard.deck_id,
-                'deck_name': flashcard.deck.name if flashcard.deck else None,
-                'incorrect_answers': [
-                    {
-                        'answer': answer,
-                        'count': count
-                    }
-                    for answer, count in sorted_answers
-                ],
-                'total_incorrect': sum(wrong_answers.values())
-            })
-    
-    # Sort by total incorrect count (most confused cards first)
-    confusion_breakdown.sort(key=lambda x: x['total_incorrect'], reverse=True)
-    confusion_breakdown = confusion_breakdown[:3]  # Top 3 most confused cards
+        confusion_breakdown.append({
+            'flashcard_id': row.flashcard_id,
+            'concept': flashcard.concept,
+            'definition': flashcard.definition,
+            'deck_id': flashcard.deck_id,
+            'deck_name': flashcard.deck_name,
+            'incorrect_answers': top_answers[row.flashcard_id],
+            'total_incorrect': row.total_incorrect
+        })
     
     return {"confusion_breakdown": confusion_breakdown}
 
 @router.get("/knowledge-map")
 def get_knowledge_map(
+    request: Request,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db),
     deck_attraction: float = 1.0,
-    tag_attraction: float = 0.5
+    tag_attraction: float = 0.5,
+    rebuild: bool = False
 ):
     """
-    Get knowledge map data - 3D coordinates for flashcards based on tag similarity
-    Uses tag-based clustering to position similar cards closer together
+    Get knowledge map data - 2D coordinates for flashcards based on deck and tag similarity.
+    Positions come from the user's stored layout, which is updated in the background when
+    cards or tags change; `stale` is true while an update is pending. Pass rebuild=true to
+    recompute the layout from scratch.
     """
-    import math
-    from collections import defaultdict
-    
-    # Get all flashcards for the user
-    all_flashcards = db.query(Flashcard).filter(Flashcard.user_id == current_user.id).all()
-    
-    if not all_flashcards:
-        return {"nodes": [], "links": []}
-    
-    # Parse tags for each flashcard
-    flashcard_tags = {}
-    all_tags = set()
-    
-    for card in all_flashcards:
-        if card.tags:
-            tags = [tag.strip().lower() for tag in card.tags.split(',') if tag.strip()]
-        else:
-            tags = []
-        flashcard_tags[card.id] = tags
-        all_tags.update(tags)
-    
-    # Convert tags to vectors (one-hot encoding)
-    tag_list = sorted(list(all_tags))
-    tag_index = {tag: i for i, tag in enumerate(tag_list)}
-    
-    # Calculate tag vectors for each flashcard
-    card_vectors = {}
-    for card_id, tags in flashcard_tags.items():
-        vector = [0] * len(tag_list)
-        for tag in tags:
-            if tag in tag_index:
-                vector[tag_index[tag]] = 1
-        card_vectors[card_id] = vector
-    
-    # Calculate similarity matrix (Jaccard similarity)
-    def jaccard_similarity(vec1, vec2):
-        """Calculate Jaccard similarity between two binary vectors"""
-        intersection = sum(a and b for a, b in zip(vec1, vec2))
-        union = sum(a or b for a, b in zip(vec1, vec2))
-        return intersection / union if union > 0 else 0
-    
-    # Build similarity graph
-    similarities = {}
-    for card1_id in card_vectors:
-        for card2_id in card_vectors:
-            if card1_id < card2_id:  # Only calculate once per pair
-                sim = jaccard_similarity(card_vectors[card1_id], card_vectors[card2_id])
-                if sim > 0:  # Only store non-zero similarities
-                    similarities[(card1_id, card2_id)] = sim
-    
-    # Simple force-directed layout (2D projection, then add z based on deck)
-    # Use a simple spring-embedder approach
-    import random
-    random.seed(42)  # For reproducibility
-    
-    # Initialize positions randomly (2D only)
-    positions = {}
-    for card in all_flashcards:
-        positions[card.id] = {
-            'x': random.uniform(-1, 1),
-            'y': random.uniform(-1, 1)
+    from app.services.knowledge_map_store import (
+        get_layout, layout_matches, update_layout, background_updates_enabled
+    )
+
+    layout = get_layout(db, current_user.id)
+    if rebuild or layout is None or not layout_matches(layout, deck_attraction, tag_attraction):
+        layout = update_layout(db, current_user.id, deck_attraction, tag_attraction, force=rebuild)
+    elif layout.is_stale and not background_updates_enabled():
+        # No background task will pick it up (eager Celery in development, or disabled)
+        layout = update_layout(db, current_user.id)
+
+    return cached_user_response(
+        request, current_user, "dashboard.knowledge_map",
+        lambda: _compute_knowledge_map(current_user, db, layout),
+        params={
+            "deck_attraction": deck_attraction,
+            "tag_attraction": tag_attraction,
+            "layout_version": layout.version,
+            "stale": layout.is_stale,
         }
-    
-    # Simple force-directed iteration with tighter clustering (2D only)
-    for iteration in range(100):  # More iterations for better convergence
-        forces = {card_id: {'x': 0, 'y': 0} for card_id in positions}
-        
-        # Weaker repulsion to allow tighter clustering
-        for card1_id in positions:
-            for card2_id in positions:
-                if card1_id != card2_id:
-                    dx = positions[card1_id]['x'] - positions[card2_id]['x']
-                    dy = positions[card1_id]['y'] - positions[card2_id]['y']
-                    dist = math.sqrt(dx*dx + dy*dy) or 0.1
-                    
-                    # Reduced repulsion force
-                    force = 0.001 / (dist * dist)
-                    forces[card1_id]['x'] += force * dx / dist
-                    forces[card1_id]['y'] += force * dy / dist
-        
-        # Deck-based clustering: strong attraction for cards in the same deck
-        for card1 in all_flashcards:
-            for card2 in all_flashcards:
-                if card1.id < card2.id:  # Only calculate once per pair
-                    if card1.deck_id and card2.deck_id and card1.deck_id == card2.deck_id:
-                        # Same deck - strong attraction to cluster together
-                        dx = positions[card1.id]['x'] - positions[card2.id]['x']
-                        dy = positions[card1.id]['y'] - positions[card2.id]['y']
-                        dist = math.sqrt(dx*dx + dy*dy) or 0.1
-                        
-                        # Strong deck-based attraction (configurable) - make it stronger
-                        force = -deck_attraction * 5  # Multiply by 5 for stronger effect
-                        forces[card1.id]['x'] += force * dx / dist
-                        forces[card1.id]['y'] += force * dy / dist
-                        forces[card2.id]['x'] -= force * dx / dist
-                        forces[card2.id]['y'] -= force * dy / dist
-        
-        # Tag-based attraction (weaker than deck-based)
-        for (card1_id, card2_id), sim in similarities.items():
-            dx = positions[card1_id]['x'] - positions[card2_id]['x']
-            dy = positions[card1_id]['y'] - positions[card2_id]['y']
-            dist = math.sqrt(dx*dx + dy*dy) or 0.1
-            
-            # Tag similarity attraction (configurable) - make it stronger
-            force = -tag_attraction * sim * 3  # Multiply by 3 for stronger effect
-            forces[card1_id]['x'] += force * dx / dist
-            forces[card1_id]['y'] += force * dy / dist
-            forces[card2_id]['x'] -= force * dx / dist
-            forces[card2_id]['y'] -= force * dy / dist
-        
-        # Update positions with damping
-        damping = 0.8  # Add damping to prevent oscillation
-        for card_id in positions:
-            positions[card_id]['x'] += forces[card_id]['x'] * damping
-            positions[card_id]['y'] += forces[card_id]['y'] * damping
-    
-    # Normalize positions to fit in a smaller, tighter range (2D only)
-    all_x = [p['x'] for p in positions.values()]
-    all_y = [p['y'] for p in positions.values()]
-    
-    min_x, max_x = min(all_x), max(all_x)
-    min_y, max_y = min(all_y), max(all_y)
-    
-    range_x = max_x - min_x or 1
-    range_y = max_y - min_y or 1
-    
-    # Calculate accuracy for each card
-    card_accuracy = {}
-    reviews = db.query(CardReview).filter(
+    )
+
+
+def _compute_knowledge_map(current_user: User, db: Session, layout) -> Dict[str, Any]:
+    from app.services.knowledge_map import normalize_positions
+    from app.services.knowledge_map_store import card_signature, seed_positions
+
+    cards = db.query(
+        Flashcard.id, Flashcard.concept, Flashcard.definition,
+        Flashcard.deck_id, Deck.name.label("deck_name")
+    ).outerjoin(Deck, Flashcard.deck_id == Deck.id).filter(
+        Flashcard.user_id == current_user.id
+    ).order_by(Flashcard.id).all()
+
+    if not cards:
+        return {"nodes": [], "links": [], "stale": layout.is_stale, "layout_version": layout.version}
+
+    # Accuracy per card (0-100), aggregated in SQL
+    review_stats = db.query(
+        CardReview.flashcard_id,
+        func.count(CardReview.id).label('total'),
+        func.sum(case((CardReview.was_correct == True, 1), else_=0)).label('correct')
+    ).filter(
         CardReview.user_id == current_user.id,
-        CardReview.flashcard_id.in_([card.id for card in all_flashcards])
-    ).all()
-    
-    # Group reviews by flashcard
-    card_review_stats = defaultdict(lambda: {'total': 0, 'correct': 0})
-    for review in reviews:
-        card_review_stats[review.flashcard_id]['total'] += 1
-        if review.was_correct:
-            card_review_stats[review.flashcard_id]['correct'] += 1
-    
-    # Calculate accuracy (0-100)
-    for card_id, stats in card_review_stats.items():
-        if stats['total'] > 0:
-            card_accuracy[card_id] = (stats['correct'] / stats['total']) * 100
-        else:
-            card_accuracy[card_id] = None  # No reviews yet
-    
-    # Build nodes and links - normalize to smaller range (-2 to 2) for tighter clustering
+        CardReview.is_imported == False
+    ).group_by(CardReview.flashcard_id).all()
+    card_accuracy = {
+        row.flashcard_id: (row.correct or 0) / row.total * 100
+        for row in review_stats if row.total
+    }
+
+    card_tags = tag_store.card_tag_lists(db, current_user.id)
+
+    # Stored positions; cards added since the last update are placed provisionally near their deck
+    stored = layout.positions or {}
+    signatures = layout.signatures or {}
+    card_ids = [card.id for card in cards]
+    raw_positions, placed = seed_positions(stored, card_ids, [card.deck_id for card in cards])
+    positions = normalize_positions(raw_positions)
+    stale = bool(layout.is_stale or not placed.all() or any(
+        signatures.get(str(card.id)) != card_signature(card.deck_id, card_tags.get(card.id, [])) for card in cards
+    ))
+
+    # Build nodes (positions normalized to -2..2 for tighter clustering)
     nodes = []
-    for card in all_flashcards:
-        pos = positions[card.id]
-        # Normalize to -2 to 2 range for tighter clustering
+    for index, card in enumerate(cards):
         nodes.append({
             'id': card.id,
             'concept': card.concept,
             'definition': card.definition,
-            'tags': flashcard_tags[card.id],
+            'tags': card_tags.get(card.id, []),
             'deck_id': card.deck_id,
-            'deck_name': card.deck.name if card.deck else None,
+            'deck_name': card.deck_name,
             'accuracy': card_accuracy.get(card.id),  # None if no reviews
-            'x': (pos['x'] - min_x) / range_x * 4 - 2,
-            'y': (pos['y'] - min_y) / range_y * 4 - 2
+            'x': float(positions[index, 0]),
+            'y': float(positions[index, 1])
         })
-    
-    # Create links for similar cards (top 3 most similar per card)
-    links = []
-    for card in all_flashcards:
-        card_similarities = []
-        for other_card in all_flashcards:
-            if card.id != other_card.id:
-                key = (min(card.id, other_card.id), max(card.id, other_card.id))
-                if key in similarities:
-                    card_similarities.append((other_card.id, similarities[key]))
-        
-        # Get top 5 most similar (increased from 3) and lower threshold
-        card_similarities.sort(key=lambda x: x[1], reverse=True)
-        for other_id, sim in card_similarities[:5]:
-            if sim > 0.05:  # Lower threshold to show more connections (was 0.1)
-                links.append({
-                    'source': card.id,
-                    'target': other_id,
-                    'value': sim
-                })
-    
-    return {"nodes": nodes, "links": links}
 
+    # Stored similarity links, minus any to cards deleted since the last update
+    current_ids = set(card_ids)
+    links = [
+        link for link in (layout.links or [])
+        if link['source'] in current_ids and link['target'] in current_ids
+    ]
+
+    return {"nodes": nodes, "links": links, "stale": stale, "layout_version": layout.version}
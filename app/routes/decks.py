@@ -1,12 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Request, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy import and_
 from app.database import get_db
 from app.models import Deck, User, Flashcard, UserDeckSmsSettings, CardReview
+from app.models.events import record_tombstones
 from app.schemas.deck import DeckCreate, DeckOut, DeckWithFlashcards
 from app.services.auth import get_current_active_user
 from app.services.premium_service import check_deck_limit
-from typing import List, Dict, Any
+from app.services.response_cache import cached_user_response
+from app.services.deck_listing import deck_out, get_full_image_url
+from app.services.flashcard_listing import FLASHCARD_COLUMN_FIELDS, FLASHCARD_FIELDS, flashcard_dicts, flashcard_page
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, parse_fields
+from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
 from datetime import datetime, timedelta, timezone
 import os
@@ -16,24 +21,6 @@ import io
 
 router = APIRouter()
 
-def get_full_image_url(image_url: str | None) -> str | None:
-    """Convert relative image URL to full URL if needed"""
-    if not image_url:
-        return None
-    
-    # If it's already a full URL, return as is
-    if image_url.startswith('http'):
-        return image_url
-    
-    # Get base URL from environment or use Railway backend URL as fallback
-    base_url = os.getenv("BASE_URL", "https://sms-spaced-repetition-production.up.railway.app")
-    
-    # Convert relative URL to full URL
-    # Ensure image_url starts with / for proper concatenation
-    if not image_url.startswith('/'):
-        image_url = '/' + image_url
-    return f"{base_url}{image_url}"
-
 def save_uploaded_image(file: UploadFile, deck_id: int) -> str:
     """Save uploaded image and return the file path"""
     # Create deck-specific directory
@@ -116,29 +103,15 @@ def get_all_decks(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    decks = db.query(Deck).filter(Deck.user_id == current_user.id).all()
-    
-    # Get SMS settings for all decks
-    sms_settings = {
-        setting.deck_id: setting.sms_enabled
-        for setting in db.query(UserDeckSmsSettings).filter(
-            UserDeckSmsSettings.user_id == current_user.id
-        ).all()
-    }
+    # Counters are denormalized on Deck, so this is a single query
+    rows = db.query(Deck, UserDeckSmsSettings.sms_enabled).outerjoin(
+        UserDeckSmsSettings,
+        and_(UserDeckSmsSettings.deck_id == Deck.id, UserDeckSmsSettings.user_id == current_user.id)
+    ).filter(Deck.user_id == current_user.id).all()
     
     result = []
-    for deck in decks:
-        deck_out = DeckOut(
-            id=deck.id,
-            name=deck.name,
-            user_id=deck.user_id,
-            image_url=get_full_image_url(deck.image_url),
-            created_at=deck.created_at,
-            flashcards_count=db.query(func.count(Flashcard.id)).filter(Flashcard.deck_id == deck.id).scalar()
-        )
-        # Set SMS enabled status (defaults to False if not set)
-        deck_out.sms_enabled = sms_settings.get(deck.id, False)  # Default to False (muted)
-        result.append(deck_out)
+    for deck, sms_enabled in rows:
+        result.append(deck_out(deck, sms_enabled=sms_enabled or False))  # Default to False (muted)
     
     return result
 
@@ -146,8 +119,14 @@ def get_all_decks(
 def get_deck_by_id(
     deck_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description=f"Flashcard fields, comma-separated subset of: {', '.join(FLASHCARD_FIELDS)}"),
+    return_all: bool = Query(False, alias="all", description="Embed every flashcard in the deck (ignores limit/cursor)")
 ):
+    """Deck with one page of its flashcards (oldest first); pass next_cursor back as cursor for more"""
+    requested = parse_fields(fields, FLASHCARD_FIELDS)
     deck = (
         db.query(Deck)
         .filter(Deck.id == deck_id, Deck.user_id == current_user.id)
@@ -155,24 +134,12 @@ def get_deck_by_id(
     )
     if not deck:
         raise HTTPException(status_code=404, detail="Deck not found or not authorized")
-    
-    # Manually load flashcards with their tags parsed correctly
-    flashcards_data = []
-    for card in deck.flashcards:
-        if isinstance(card.tags, str):
-            parsed_tags = [tag.strip() for tag in card.tags.split(',') if tag.strip()]
-        else:
-            parsed_tags = card.tags if card.tags is not None else []
-        flashcards_data.append({
-            "id": card.id,
-            "user_id": card.user_id,
-            "concept": card.concept,
-            "definition": card.definition,
-            "tags": parsed_tags,
-            "created_at": card.created_at,
-            "updated_at": card.updated_at,
-            "deck_id": card.deck_id,
-        })
+
+    query = db.query(Flashcard).filter(Flashcard.deck_id == deck.id)
+    cards, next_cursor = flashcard_page(
+        query, None if return_all else cursor, None if return_all else limit,
+        requested or list(FLASHCARD_COLUMN_FIELDS)
+    )
 
     return DeckWithFlashcards(
         id=deck.id,
@@ -180,8 +147,11 @@ def get_deck_by_id(
         user_id=deck.user_id,
         image_url=get_full_image_url(deck.image_url),
         created_at=deck.created_at,
-        flashcards_count=len(deck.flashcards),
-        flashcards=flashcards_data
+        flashcards_count=deck.card_count or 0,
+        due_count=deck.due_count_cached or 0,
+        last_reviewed_at=deck.last_reviewed_at,
+        flashcards=flashcard_dicts(cards, requested or FLASHCARD_COLUMN_FIELDS),
+        next_cursor=next_cursor
     )
 
 @router.put("/{deck_id}", response_model=DeckOut)
@@ -202,14 +172,7 @@ def update_deck(
     deck.name = deck_update.name
     db.commit()
     db.refresh(deck)
-    return DeckOut(
-        id=deck.id,
-        name=deck.name,
-        user_id=deck.user_id,
-        image_url=get_full_image_url(deck.image_url),
-        created_at=deck.created_at,
-        flashcards_count=db.query(func.count(Flashcard.id)).filter(Flashcard.deck_id == deck.id).scalar()
-    )
+    return deck_out(deck)
 
 @router.delete("/{deck_id}")
 def delete_deck(
@@ -230,7 +193,9 @@ def delete_deck(
     flashcard_count = db.query(Flashcard).filter(Flashcard.deck_id == deck_id).count()
     
     if delete_cards:
-        # Delete all flashcards in this deck
+        # Delete all flashcards in this deck (bulk delete: record the sync tombstones ourselves)
+        card_ids = [card_id for (card_id,) in db.query(Flashcard.id).filter(Flashcard.deck_id == deck_id)]
+        record_tombstones(db, current_user.id, "flashcard", card_ids)
         db.query(Flashcard).filter(Flashcard.deck_id == deck_id).delete()
         message = f"Deck deleted successfully. {flashcard_count} flashcard(s) were also deleted."
     else:
@@ -291,10 +256,22 @@ def toggle_deck_sms(
 @router.get("/{deck_id}/mastery")
 def get_deck_mastery(
     deck_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get mastery data for a deck - performance over time"""
+    return cached_user_response(
+        request, current_user, "decks.mastery",
+        lambda: _compute_deck_mastery(deck_id, current_user, db),
+        params={
+            "deck_id": deck_id,
+            # Streak fields are returned as-is and can change without a content change
+            "streak": [current_user.current_streak_days, current_user.longest_streak_days]
+        }
+    )
+
+def _compute_deck_mastery(deck_id: int, current_user: User, db: Session) -> Dict[str, Any]:
     # Verify deck exists and belongs to user
     deck = db.query(Deck).filter(
         Deck.id == deck_id,
@@ -320,6 +297,7 @@ def get_deck_mastery(
     reviews = db.query(CardReview).filter(
         and_(
             CardReview.user_id == current_user.id,
+            CardReview.is_imported == False,
             CardReview.flashcard_id.in_(flashcard_ids)
         )
     ).order_by(CardReview.review_date.asc()).all()
@@ -364,10 +342,18 @@ def get_deck_mastery(
 
 @router.get("/mastery/all")
 def get_all_decks_mastery(
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get mastery data for all decks - overall average accuracy and cards reviewed per day"""
+    return cached_user_response(
+        request, current_user, "decks.mastery_all",
+        lambda: _compute_all_decks_mastery(current_user, db),
+        params={"streak": [current_user.current_streak_days, current_user.longest_streak_days]}
+    )
+
+def _compute_all_decks_mastery(current_user: User, db: Session) -> Dict[str, Any]:
     # Get all flashcards for the user (from all decks and no deck)
     all_flashcards = db.query(Flashcard).filter(Flashcard.user_id == current_user.id).all()
     flashcard_ids = [card.id for card in all_flashcards]
@@ -383,6 +369,7 @@ def get_all_decks_mastery(
     reviews = db.query(CardReview).filter(
         and_(
             CardReview.user_id == current_user.id,
+            CardReview.is_imported == False,
             CardReview.flashcard_id.in_(flashcard_ids)
         )
     ).order_by(CardReview.review_date.asc()).all()
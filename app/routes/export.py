@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, Query
+from app.models import User
+from app.services.auth import get_current_active_user
+from app.services.export import ExportFormat, flashcards_export_query, reviews_export_query, streaming_export
+
+router = APIRouter()
+
+
+@router.get("/reviews")
+def export_reviews(
+    format: ExportFormat = Query(ExportFormat.ndjson),
+    gzip: bool = Query(False, description="Compress the download (.gz)"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Stream the user's full review history as NDJSON or CSV"""
+    return streaming_export(reviews_export_query(current_user.id), format, gzip, "reviews")
+
+
+@router.get("/flashcards")
+def export_flashcards(
+    format: ExportFormat = Query(ExportFormat.ndjson),
+    gzip: bool = Query(False, description="Compress the download (.gz)"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Stream the user's flashcards (with deck names) as NDJSON or CSV"""
+    return streaming_export(flashcards_export_query(current_user.id), format, gzip, "flashcards")
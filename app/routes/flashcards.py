@@ -1,18 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, Header
+from sqlalchemy.orm import Session, joinedload
 from app.schemas.flashcard import FlashcardCreate, FlashcardOut, FlashcardWithNextReviewOut
-from app.models import Flashcard, CardReview
+from app.models import Flashcard, CardReview, Deck, FlashcardTag
 from app.database import get_db
 from datetime import datetime, timedelta
 from app.services.auth import get_current_active_user
+from app.services.tag_store import get_tag, has_tag, parse_tags
+from app.services.search import search_flashcards
+from app.services.latest_review import with_latest_review
+from app.services.dedup import DuplicatePolicy, duplicate_clusters
+from app.services.import_jobs import ImportKind, create_job, find_job_by_key, job_dict
+from app.services.flashcard_listing import FLASHCARD_FIELDS, flashcard_dicts, flashcard_page, split_tags
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, page_response, parse_fields
 from app.models import User
-from sqlalchemy import func
+from sqlalchemy import func, or_
 from typing import Optional, List
 from pydantic import BaseModel
-from openai import OpenAI
-import os
-import json
-import re
 
 router = APIRouter()
 
@@ -45,14 +48,34 @@ def create_flashcard(flashcard: FlashcardCreate, db: Session = Depends(get_db),
     db.refresh(new_card)
     return new_card
 
+def _list_response(cards, next_cursor, fields, response: Response, deck_name: bool = False):
+    """
+    Cards for a list endpoint: ORM rows through response_model normally, or a plain JSON
+    array of just the requested fields. The next page's cursor goes in X-Next-Cursor.
+    """
+    if fields is not None:
+        return page_response(flashcard_dicts(cards, fields), next_cursor)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    if deck_name:
+        return flashcard_dicts(cards)
+    return cards
+
 @router.get("/due", response_model=list[FlashcardOut])
-def get_due_flashcards(db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user), deck_id: Optional[int] = None):
-    from sqlalchemy.orm import joinedload
-    from app.models import Deck
-    
+def get_due_flashcards(
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+    deck_id: Optional[int] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description=f"Comma-separated subset of: {', '.join(FLASHCARD_FIELDS)}"),
+    return_all: bool = Query(False, alias="all", description="Return every due card in one response (ignores limit/cursor)")
+):
+    requested = parse_fields(fields, FLASHCARD_FIELDS)
     now = datetime.utcnow()
     
-    query = db.query(Flashcard).options(joinedload(Flashcard.deck)).filter(Flashcard.user_id == current_user.id)
+    query = db.query(Flashcard).filter(Flashcard.user_id == current_user.id)
     if deck_id is not None:
         query = query.filter(Flashcard.deck_id == deck_id)
 
@@ -60,68 +83,127 @@ def get_due_flashcards(db: Session = Depends(get_db), current_user: User = Depen
         CardReview.user_id == current_user.id,
         CardReview.next_review_date > now
     ).subquery()
-    
-    due_cards = query.filter(
-        ~Flashcard.id.in_(subquery)
-    ).all()
-    
-    # Convert to dict format with deck_name
-    result = []
-    for card in due_cards:
-        card_dict = {
-            "id": card.id,
-            "user_id": card.user_id,
-            "concept": card.concept,
-            "definition": card.definition,
-            "tags": card.tags,
-            "source_url": card.source_url,
-            "created_at": card.created_at,
-            "updated_at": card.updated_at,
-            "deck_id": card.deck_id,
-            "deck_name": card.deck.name if card.deck else None
-        }
-        result.append(card_dict)
-    
-    return result
+    query = query.filter(~Flashcard.id.in_(subquery))
+
+    cards, next_cursor = flashcard_page(
+        query, None if return_all else cursor, None if return_all else limit, requested, deck_name=True
+    )
+    return _list_response(cards, next_cursor, requested, response, deck_name=True)
 
 @router.get("/with-reviews", response_model=list[FlashcardWithNextReviewOut])
-def get_flashcards_with_next_review(db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user), deck_id: Optional[int] = None, tags: Optional[str] = None):
-    query = db.query(Flashcard).filter(Flashcard.user_id == current_user.id)
+def get_flashcards_with_next_review(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+    deck_id: Optional[int] = None,
+    tags: Optional[str] = None,
+    due_before: Optional[datetime] = None,
+    due_after: Optional[datetime] = None
+):
+    """
+    List the user's flashcards with the next_review_date from their latest review, in one query.
+    Filters (all applied in SQL):
+    - deck_id
+    - tags: comma-separated, cards must carry every tag (exact match)
+    - due_before / due_after: window on next_review_date; never-reviewed cards count as
+      due now, so they match due_before but not due_after
+    """
+    query = db.query(Flashcard)
+    query, next_review_date = with_latest_review(query, db, current_user.id)
+    query = query.add_columns(next_review_date).filter(Flashcard.user_id == current_user.id)
+    
     if deck_id is not None:
         query = query.filter(Flashcard.deck_id == deck_id)
 
-    if tags is not None:
-        query = query.filter(Flashcard.tags.ilike(f"%{tags}%"))
+    for tag in parse_tags(tags):
+        query = query.filter(has_tag(current_user.id, tag))
 
-    cards = query.all()
-    result = []
-    for card in cards:
-        latest_review = db.query(CardReview).filter(
-            CardReview.user_id == current_user.id,
-            CardReview.flashcard_id == card.id
-        ).order_by(CardReview.created_at.desc()).first()
-        # Ensure tags are a list of strings
-        if isinstance(card.tags, str):
-            parsed_tags = [tag.strip() for tag in card.tags.split(',') if tag.strip()]
-        else:
-            parsed_tags = card.tags if card.tags is not None else []
+    if due_before is not None:
+        query = query.filter(or_(next_review_date.is_(None), next_review_date < due_before))
+    if due_after is not None:
+        query = query.filter(next_review_date >= due_after)
 
+    result = []
+    for card, card_next_review in query.order_by(Flashcard.id).all():
         result.append({
             "id": card.id,
             "concept": card.concept,
             "definition": card.definition,
-            "tags": parsed_tags,
-            "next_review_date": latest_review.next_review_date if latest_review else None,
+            "tags": split_tags(card.tags),
+            "next_review_date": card_next_review,
             "deck_id": card.deck_id
         })
     return result
 
 @router.get("/", response_model=list[FlashcardOut])
-def get_all_flashcards(db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user), deck_id: Optional[int] = None):
+def get_all_flashcards(
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+    deck_id: Optional[int] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description=f"Comma-separated subset of: {', '.join(FLASHCARD_FIELDS)}"),
+    return_all: bool = Query(False, alias="all", description="Return every card in one response (ignores limit/cursor)")
+):
+    requested = parse_fields(fields, FLASHCARD_FIELDS)
     query = db.query(Flashcard).filter(Flashcard.user_id == current_user.id)
     if deck_id is not None:
         query = query.filter(Flashcard.deck_id == deck_id)
-    return query.all()
+    cards, next_cursor = flashcard_page(
+        query, None if return_all else cursor, None if return_all else limit, requested
+    )
+    return _list_response(cards, next_cursor, requested, response)
+
+@router.get("/search")
+def search_flashcards_route(
+    q: str = Query(..., min_length=1, description="Words to find in concept/definition; each is prefix-matched"),
+    deck_id: Optional[int] = None,
+    tags: Optional[str] = Query(None, description="Comma-separated; cards must carry every tag"),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Full-text search over the user's flashcards, best match first.
+    Returns flashcards with a `rank`; the next page's cursor is in X-Next-Cursor.
+    """
+    results, next_cursor = search_flashcards(
+        db, current_user.id, q, limit, cursor, deck_id=deck_id, tags=parse_tags(tags)
+    )
+    items = flashcard_dicts([card for card, _ in results], FLASHCARD_FIELDS)
+    for item, (_, rank) in zip(items, results):
+        item["rank"] = rank
+    return page_response(items, next_cursor)
+
+@router.get("/duplicates")
+def list_duplicate_clusters(
+    threshold: Optional[float] = Query(None, ge=0.5, le=1.0, description="Minimum estimated similarity (default DEDUP_SIMILARITY_THRESHOLD)"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Groups of near-duplicate flashcards for cleanup, largest group first.
+    Each group lists its oldest card first; `similarity` is each card's similarity to it.
+    """
+    clusters = duplicate_clusters(db, current_user.id, threshold)
+    shown = clusters[:limit]
+    card_ids = [card_id for cluster in shown for card_id, _ in cluster]
+    cards = {
+        card.id: card for card in db.query(Flashcard).options(joinedload(Flashcard.deck).load_only(Deck.name)).filter(
+            Flashcard.id.in_(card_ids)
+        ).all()
+    } if card_ids else {}
+
+    groups = []
+    for cluster in shown:
+        members = [(cards[card_id], similarity) for card_id, similarity in cluster if card_id in cards]
+        items = flashcard_dicts([card for card, _ in members], FLASHCARD_FIELDS)
+        for item, (_, similarity) in zip(items, members):
+            item["similarity"] = round(similarity, 3)
+        groups.append({"size": len(items), "flashcards": items})
+    return {"cluster_count": len(clusters), "clusters": groups}
 
 @router.get("/{card_id}", response_model=FlashcardOut)
 def get_flashcard(
@@ -135,9 +217,22 @@ def get_flashcard(
     return card
 
 @router.get("/decks/{deck_id}/all-flashcards", response_model=List[FlashcardOut])
-def get_all_flashcards_in_deck(deck_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    cards = db.query(Flashcard).filter(Flashcard.user_id == current_user.id, Flashcard.deck_id == deck_id).all()
-    return cards
+def get_all_flashcards_in_deck(
+    deck_id: int,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description=f"Comma-separated subset of: {', '.join(FLASHCARD_FIELDS)}"),
+    return_all: bool = Query(False, alias="all", description="Return the whole deck in one response (ignores limit/cursor)")
+):
+    requested = parse_fields(fields, FLASHCARD_FIELDS)
+    query = db.query(Flashcard).filter(Flashcard.user_id == current_user.id, Flashcard.deck_id == deck_id)
+    cards, next_cursor = flashcard_page(
+        query, None if return_all else cursor, None if return_all else limit, requested
+    )
+    return _list_response(cards, next_cursor, requested, response)
 
 @router.put("/{card_id}", response_model=FlashcardOut)
 def update_flashcard(
@@ -225,29 +320,22 @@ def delete_tag(
     Delete a tag from all flashcards belonging to the current user.
     This removes the tag from the tags field but does not delete the flashcards themselves.
     """
-    # Get all flashcards for this user that have this tag
-    flashcards = db.query(Flashcard).filter(
-        Flashcard.user_id == current_user.id,
-        Flashcard.tags.ilike(f"%{tag}%")
-    ).all()
+    tag_row = get_tag(db, current_user.id, tag)
+    # Only the cards carrying exactly this tag (via flashcard_tags)
+    flashcards = db.query(Flashcard).join(
+        FlashcardTag, FlashcardTag.flashcard_id == Flashcard.id
+    ).filter(FlashcardTag.tag_id == tag_row.id).all() if tag_row else []
     
     if not flashcards:
         raise HTTPException(status_code=404, detail=f"Tag '{tag}' not found in any of your flashcards")
     
-    # Remove the tag from each flashcard
+    # Remove the tag from each flashcard's tags string; the session hooks update flashcard_tags
     updated_count = 0
     for card in flashcards:
-        if card.tags:
-            # Parse tags, remove the target tag, and reconstruct
-            tag_list = [t.strip() for t in card.tags.split(',') if t.strip()]
-            # Remove the tag (case-insensitive)
-            tag_list = [t for t in tag_list if t.lower() != tag.lower()]
-            
-            if tag_list:
-                card.tags = ', '.join(tag_list)
-            else:
-                card.tags = None
-            updated_count += 1
+        tag_list = [t.strip() for t in (card.tags or "").split(',') if t.strip() and t.strip().lower() != tag_row.name]
+        card.tags = ', '.join(tag_list) if tag_list else None
+        updated_count += 1
+    db.delete(tag_row)
     
     db.commit()
     
@@ -259,20 +347,29 @@ def delete_tag(
 class BatchFlashcardCreate(BaseModel):
     raw_text: str
     deck_ids: List[int] = []
+    duplicates: DuplicatePolicy = DuplicatePolicy.skip  # Near-duplicates of existing cards: skip, flag or allow
+    use_cache: bool = True  # Reuse GPT's cards from an identical earlier import
 
-@router.post("/batch-create")
+@router.post("/batch-create", status_code=202)
 def batch_create_flashcards(
     data: BatchFlashcardCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     Create multiple flashcards from pasted text using GPT to parse and structure them.
     Supports various formats: lists, notes, etc.
+    Runs in the background: returns the import job, to be polled at GET /imports/{id}.
     """
     if not data.raw_text or not data.raw_text.strip():
         raise HTTPException(status_code=400, detail="raw_text is required and cannot be empty")
-    
+
+    # A retried request gets the job the first one created
+    existing = find_job_by_key(db, current_user.id, idempotency_key)
+    if existing:
+        return job_dict(existing)
+
     # Check deck limits for free users if deck_ids provided
     if data.deck_ids:
         from app.services.premium_service import check_flashcard_limit_in_deck
@@ -283,162 +380,12 @@ def batch_create_flashcards(
                     status_code=403,
                     detail=f"You've reached the free tier limit of {limit_check['limit']} flashcards in one of the selected decks. Upgrade to Premium for unlimited flashcards."
                 )
-    
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    
-    prompt = f"""You are an assistant that extracts multiple flashcards from text input. The user may paste:
-- A list of terms and definitions
-- Notes with concepts and explanations
-- Any structured or unstructured text containing information to memorize
-
-For each flashcard, extract:
-- concept: what the user is trying to remember (the question/front)
-- definition: the answer, explanation, or formula (the back)
-- tags: relevant tags if contextually obvious, otherwise empty string
-- source_url: empty string (user will add if needed)
-
-Return ONLY a JSON array of flashcard objects. Each object must have: concept, definition, tags, source_url.
-
-Examples:
-
-Input:
-"Tokyo - Capital of Japan
-Paris - Capital of France
-London - Capital of UK"
-
-Output:
-[
-  {{"concept": "Capital of Japan", "definition": "Tokyo", "tags": "", "source_url": ""}},
-  {{"concept": "Capital of France", "definition": "Paris", "tags": "", "source_url": ""}},
-  {{"concept": "Capital of UK", "definition": "London", "tags": "", "source_url": ""}}
-]
-
-Input:
-"Japanese words:
-こんにちは - Hello
-ありがとう - Thank you
-さようなら - Goodbye"
-
-Output:
-[
-  {{"concept": "こんにちは", "definition": "Hello", "tags": "japanese", "source_url": ""}},
-  {{"concept": "ありがとう", "definition": "Thank you", "tags": "japanese", "source_url": ""}},
-  {{"concept": "さようなら", "definition": "Goodbye", "tags": "japanese", "source_url": ""}}
-]
-
-Important:
-- Return ONLY a JSON array, no text before or after
-- Use double quotes for all keys and string values
-- Escape backslashes in LaTeX as \\\\
-- Always include all four fields: concept, definition, tags, source_url
-- If input is ambiguous, make reasonable assumptions about concept/definition split
-- Extract as many flashcards as possible from the input
-
-Now parse this text into flashcards:
-{data.raw_text}
-"""
-    
-    try:
-        completion = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-        )
-        response_text = completion.choices[0].message.content.strip()
-        
-        # Strip markdown code block if present
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.startswith("```"):
-            response_text = response_text[3:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
-        
-        try:
-            cards_data = json.loads(response_text)
-        except json.JSONDecodeError as e:
-            # Fallback: escape single backslashes and try again
-            safe_text = re.sub(r'(?<!\\)\\(?![\\ntr"])', r'\\\\', response_text)
-            try:
-                cards_data = json.loads(safe_text)
-            except json.JSONDecodeError as e2:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Failed to parse GPT response as JSON. Please try again with clearer formatting."
-                )
-        
-        if not isinstance(cards_data, list):
-            raise HTTPException(status_code=500, detail="GPT returned invalid format: expected array of flashcards")
-        
-        if len(cards_data) == 0:
-            raise HTTPException(status_code=400, detail="No flashcards could be extracted from the input text")
-        
-        # Validate and create flashcards
-        created_cards = []
-        errors = []
-        
-        for idx, card_data in enumerate(cards_data):
-            if not isinstance(card_data, dict):
-                errors.append(f"Card {idx + 1}: Invalid format")
-                continue
-            
-            if "concept" not in card_data or "definition" not in card_data:
-                errors.append(f"Card {idx + 1}: Missing concept or definition")
-                continue
-            
-            concept = str(card_data["concept"]).strip()
-            definition = str(card_data["definition"]).strip()
-            
-            if not concept or not definition:
-                errors.append(f"Card {idx + 1}: Empty concept or definition")
-                continue
-            
-            # Normalize tags
-            tags_str = ""
-            if "tags" in card_data and card_data["tags"]:
-                tags_list = [tag.strip().lower() for tag in str(card_data["tags"]).split(',') if tag.strip()]
-                tags_str = ', '.join(tags_list)
-            
-            # Create flashcard for each selected deck (or no deck if none selected)
-            deck_ids_to_use = data.deck_ids if data.deck_ids else [None]
-            
-            for deck_id in deck_ids_to_use:
-                # Check limit again before creating (in case we're creating multiple)
-                if deck_id:
-                    from app.services.premium_service import check_flashcard_limit_in_deck
-                    limit_check = check_flashcard_limit_in_deck(deck_id, current_user, db)
-                    if not limit_check["can_add"]:
-                        errors.append(f"Card {idx + 1}: Deck limit reached")
-                        continue
-                
-                new_card = Flashcard(
-                    user_id=current_user.id,
-                    concept=concept,
-                    definition=definition,
-                    tags=tags_str if tags_str else None,
-                    deck_id=deck_id,
-                    source_url=str(card_data.get("source_url", "")).strip() or None
-                )
-                db.add(new_card)
-                created_cards.append(new_card)
-        
-        db.commit()
-        
-        # Refresh all created cards
-        for card in created_cards:
-            db.refresh(card)
-        
-        return {
-            "success": True,
-            "created_count": len(created_cards),
-            "total_parsed": len(cards_data),
-            "errors": errors if errors else None,
-            "flashcards": [{"id": card.id, "concept": card.concept, "definition": card.definition} for card in created_cards]
-        }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to create flashcards: {str(e)}")
 
+    job = create_job(
+        db,
+        current_user.id,
+        ImportKind.text,
+        {"raw_text": data.raw_text, "deck_ids": data.deck_ids, "duplicates": data.duplicates.value, "use_cache": data.use_cache},
+        idempotency_key=idempotency_key,
+    )
+    return job_dict(job)
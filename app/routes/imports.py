@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from typing import Any, Dict
+from app.database import get_db
+from app.models import User
+from app.services.auth import get_current_active_user
+from app.services.import_jobs import cancel_job, get_job, job_dict, retry_job
+
+router = APIRouter()
+
+
+@router.get("/{job_id}")
+def get_import(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+) -> Dict[str, Any]:
+    """
+    Status of a background import: status (queued, running, succeeded, failed, cancelled),
+    stage, progress {done, total}, errors, created_card_ids and, once finished, result.
+    """
+    return job_dict(get_job(db, current_user.id, job_id))
+
+
+@router.post("/{job_id}/cancel")
+def cancel_import(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+) -> Dict[str, Any]:
+    """Cancel a queued or running import; cards a running import already saved are kept"""
+    return job_dict(cancel_job(db, get_job(db, current_user.id, job_id)))
+
+
+@router.post("/{job_id}/retry")
+def retry_import(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+) -> Dict[str, Any]:
+    """Re-run a failed or cancelled import from where it stopped (no-op for other imports)"""
+    return job_dict(retry_job(db, get_job(db, current_user.id, job_id)))
@@ -1,5 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.orm import Session, joinedload, load_only
 from sqlalchemy import func, cast, Integer
 from app.database import get_db
 from app.models import CardReview, Flashcard, User
@@ -8,7 +8,10 @@ from app.services.evaluator import evaluate_answer
 from app.services.scheduler import compute_next_review
 from app.services.auth import get_current_active_user
 from app.services.summary_service import calculate_streak_days
+from app.services.flashcard_listing import FLASHCARD_COLUMN_FIELDS, flashcard_dicts
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, fetch_page, page_response, parse_fields, select_fields
 from datetime import datetime, timezone
+from typing import Optional
 
 router = APIRouter()
 
@@ -71,18 +74,38 @@ def manual_review(
     return review
 
 
+REVIEW_FIELDS = tuple(ReviewWithFlashcard.model_fields)
+
+
 @router.get("/", response_model=list[ReviewWithFlashcard])
 def get_reviews_for_user(
+    response: Response,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description=f"Comma-separated subset of: {', '.join(REVIEW_FIELDS)}"),
+    return_all: bool = Query(False, alias="all", description="Return the whole review history in one response (ignores limit/cursor)")
 ):
-    return (
-        db.query(CardReview)
-        .options(joinedload(CardReview.flashcard))
-        .filter_by(user_id=current_user.id)
-        .order_by(CardReview.created_at.desc())
-        .all()
+    """Newest reviews first, keyset-paginated on (created_at, id); the next cursor is in X-Next-Cursor"""
+    requested = parse_fields(fields, REVIEW_FIELDS)
+    query = db.query(CardReview).filter_by(user_id=current_user.id)
+    if requested is None or "flashcard" in requested:
+        query = query.options(joinedload(CardReview.flashcard))
+    if requested is not None:
+        columns = {name for name in requested if name != "flashcard"} | {"id", "created_at"}
+        query = query.options(load_only(*[getattr(CardReview, name) for name in sorted(columns)]))
+
+    reviews, next_cursor = fetch_page(
+        query, CardReview.created_at, CardReview.id,
+        None if return_all else cursor, None if return_all else limit
     )
+    if requested is not None:
+        converters = {"flashcard": lambda review: flashcard_dicts([review.flashcard], FLASHCARD_COLUMN_FIELDS)[0] if review.flashcard else None}
+        return page_response(select_fields(reviews, requested, converters), next_cursor)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return reviews
 
 
 @router.get("/stats")
@@ -95,7 +118,7 @@ def get_review_stats(
             func.count(CardReview.id).label("total"),
             func.sum(cast(CardReview.was_correct, Integer)).label("correct")
         )
-        .filter(CardReview.user_id == current_user.id)
+        .filter(CardReview.user_id == current_user.id, CardReview.is_imported == False)
         .first()
     )
 
@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import Any, Dict, Optional
+from app.database import get_db
+from app.models import User
+from app.services.deck_listing import deck_out
+from app.schemas.review import ReviewOut
+from app.services.auth import get_current_active_user
+from app.services.flashcard_listing import FLASHCARD_COLUMN_FIELDS, flashcard_dicts
+from app.services.sync import changes_since
+
+router = APIRouter()
+
+
+@router.get("")
+def sync_changes(
+    since: Optional[str] = Query(None, description="Cursor from the previous sync; omit for a full snapshot"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+) -> Dict[str, Any]:
+    """
+    Flashcards, decks, deck SMS settings and reviews created, updated or deleted since the cursor.
+    Apply the upserts, then drop the ids under "deleted"; if "full" is true, replace the local
+    cache instead. Store "cursor" and send it as `since` next time.
+    """
+    changes = changes_since(db, current_user.id, since)
+    enabled = changes["deck_sms_enabled"]
+    return {
+        "cursor": changes["cursor"],
+        "full": changes["full"],
+        "flashcards": flashcard_dicts(changes["flashcards"], FLASHCARD_COLUMN_FIELDS),
+        "decks": [deck_out(deck, sms_enabled=enabled.get(deck.id, False)) for deck in changes["decks"]],
+        "deck_sms_settings": [
+            {
+                "id": setting.id,
+                "deck_id": setting.deck_id,
+                "sms_enabled": setting.sms_enabled,
+                "updated_at": setting.updated_at,
+            }
+            for setting in changes["deck_sms_settings"]
+        ],
+        "reviews": [ReviewOut.model_validate(review) for review in changes["reviews"]],
+        "deleted": changes["deleted"],
+    }
@@ -13,6 +13,8 @@ class DeckOut(BaseModel):
     image_url: Optional[str] = None
     created_at: datetime
     flashcards_count: Optional[int] = None
+    due_count: Optional[int] = None  # Cached; refreshed on review and periodically
+    last_reviewed_at: Optional[datetime] = None
     sms_enabled: Optional[bool] = False  # False = muted by default
 
     class Config:
@@ -20,5 +22,6 @@ class DeckOut(BaseModel):
 
 class DeckWithFlashcards(DeckOut):
     flashcards: List[dict]
+    next_cursor: Optional[str] = None  # Cursor for the next page of flashcards; None on the last page
 
 DeckWithFlashcards.model_rebuild() 
\ No newline at end of file
@@ -21,6 +21,7 @@ class ReviewOut(BaseModel):
     repetition_count: int
     ease_factor: float
     interval_days: int
+    is_imported: bool = False
 
     class Config:
         from_attributes = True
@@ -0,0 +1,363 @@
+"""
+Anki package (.apkg/.colpkg) import
+
+Built to take large decks without large memory spikes:
+- the upload is streamed to disk in UPLOAD_CHUNK_SIZE chunks;
+- only the collection database is extracted from the zip (media is never unpacked);
+- notes are read through a cursor in batches of NOTE_BATCH_SIZE, parsed, screened for
+  near-duplicates, and bulk-inserted (app/services/flashcard_bulk.py) batch by batch.
+
+Imported cards keep their note's guid and mod (last modified) time. Importing into a deck
+that already holds cards from the same notes is a diff against them: new guids are inserted,
+notes whose mod changed are updated in place (same card id, so reviews and scheduling stay),
+unchanged notes are not even parsed, and with remove_missing the deck's cards whose note is
+gone are deleted.
+
+New cards also take over their note's Anki scheduling (app/services/anki_scheduling.py), so
+an imported deck isn't due all at once.
+
+The caller owns the transaction: import_collection only flushes and hands each batch to an
+on_batch callback, where the import job (app/services/import_jobs.py) commits it together
+with its resume point.
+"""
+import json
+import os
+import shutil
+import sqlite3
+import zipfile
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from fastapi import HTTPException, UploadFile
+from sqlalchemy.orm import Session
+from app.models import Deck, Flashcard
+from app.services.anki_scheduling import read_note_schedules, seed_reviews
+from app.services.dedup import DUPLICATE_REPORT_LIMIT, DuplicatePolicy, add_screened_cards, screen_duplicates
+from app.services.flashcard_bulk import delete_flashcards, update_flashcards
+from app.utils.config import settings
+from app.utils.text_cleaning import parse_cloze_deletion, strip_html
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+NOTE_BATCH_SIZE = 2000
+
+# Newer packages also carry a collection.anki2 stub whose only note is ERROR_NOTE_TEXT,
+# so the real .anki21 database wins when both are present
+COLLECTION_MEMBERS = ("collection.anki21", "collection.anki2")
+ERROR_NOTE_TEXT = "Please update to the latest Anki version"
+ERROR_NOTE_INDICATORS = (ERROR_NOTE_TEXT, "import the .colpkg/.apkg file again")
+
+NO_NOTES_DETAIL = "No valid notes found in Anki deck. All notes contain the error message 'Please update to the latest Anki version, then import the .colpkg/.apkg file again.' This means the deck in Anki itself has this error message stored. To fix: 1) Open the deck in Anki and check if the cards display correctly, 2) If they show the error message in Anki too, you need to recreate the deck, 3) If they show correctly in Anki, try updating Anki to the latest version and re-exporting the deck."
+CORRUPT_COLLECTION_DETAIL = "This Anki file appears to be corrupted or from an incompatible Anki version. All notes contain an error message instead of actual card content. Please try: 1) Update Anki to the latest version, 2) Re-export your deck as 'Anki Deck Package (*.apkg)', 3) If the deck was originally imported from a .colpkg file, you may need to recreate the cards manually."
+
+
+async def save_upload(file: UploadFile, path: str, max_bytes: Optional[int] = None) -> int:
+    """Stream an upload to `path` in chunks; returns the number of bytes written. Uploads over max_bytes are removed and rejected (413)."""
+    size = 0
+    with open(path, "wb") as out:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            out.write(chunk)
+            size += len(chunk)
+            if max_bytes is not None and size > max_bytes:
+                break
+    if max_bytes is not None and size > max_bytes:
+        os.remove(path)
+        raise HTTPException(
+            status_code=413,
+            detail=f"This file is larger than {max_bytes // (1024 * 1024)} MB. Please split it into smaller files."
+        )
+    return size
+
+
+def extract_collection(package_path: str, directory: str) -> str:
+    """Extract just the collection database from an .apkg/.colpkg; returns its path"""
+    try:
+        with zipfile.ZipFile(package_path) as package:
+            names = set(package.namelist())
+            member = next((name for name in COLLECTION_MEMBERS if name in names), None)
+            if member is None:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Could not find Anki database in the file. This might be a newer Anki format. Please try exporting from Anki as 'Anki Deck Package (*.apkg)' instead of 'Anki Collection Package (*.colpkg)'."
+                )
+            path = os.path.join(directory, member)
+            with package.open(member) as source, open(path, "wb") as target:
+                shutil.copyfileobj(source, target, UPLOAD_CHUNK_SIZE)
+            return path
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="Invalid .apkg file format")
+
+
+def read_deck_name(conn: sqlite3.Connection) -> Optional[str]:
+    """Name of the first deck in the collection's col table, if readable"""
+    try:
+        row = conn.execute("SELECT decks FROM col").fetchone()
+        if row and row[0]:
+            decks_json = json.loads(row[0])
+            # decks_json is a dict where keys are deck IDs and values are deck info
+            if decks_json:
+                return list(decks_json.values())[0].get('name', None)
+    except Exception as e:
+        print(f"Could not read col table: {e}")
+    return None
+
+
+def check_collection(conn: sqlite3.Connection) -> int:
+    """Reject collections without a notes table or whose notes are all Anki's error stub; returns the importable note count"""
+    tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+    if 'notes' not in tables:
+        raise HTTPException(status_code=400, detail="Anki database structure not recognized. No 'notes' table found.")
+
+    total_notes, error_notes = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(flds LIKE ?), 0) FROM notes", (f"%{ERROR_NOTE_TEXT}%",)
+    ).fetchone()
+    if total_notes > 0 and error_notes == total_notes:
+        raise HTTPException(status_code=400, detail=CORRUPT_COLLECTION_DETAIL)
+    return total_notes - error_notes
+
+
+def iter_note_batches(
+    conn: sqlite3.Connection, batch_size: int = NOTE_BATCH_SIZE, after_note_id: int = 0
+) -> Iterator[List[tuple]]:
+    """(id, flds, tags, sfld, guid, mod) rows of the collection's notes with id > after_note_id, in id order, batch_size at a time"""
+    # Anki notes table structure: id, guid, mid (model id), mod, usn, tags, flds, sfld, csum, flags, data
+    cursor = conn.execute(
+        "SELECT id, flds, tags, sfld, guid, mod FROM notes WHERE id > ? AND flds NOT LIKE ? ORDER BY id",
+        (after_note_id, f"%{ERROR_NOTE_TEXT}%")
+    )
+    while rows := cursor.fetchmany(batch_size):
+        yield rows
+
+
+def read_note_guids(conn: sqlite3.Connection) -> Dict[str, bool]:
+    """guid of every note in the collection -> whether it is importable (not Anki's error stub)"""
+    return {
+        guid: bool(importable)
+        for guid, importable in conn.execute("SELECT guid, flds NOT LIKE ? FROM notes", (f"%{ERROR_NOTE_TEXT}%",))
+    }
+
+
+def deck_anki_notes(db: Session, deck_id: int) -> Dict[str, Tuple[int, Optional[int]]]:
+    """anki_guid -> (flashcard id, anki_mod) of the deck's cards imported from Anki notes"""
+    rows = db.query(Flashcard.anki_guid, Flashcard.id, Flashcard.anki_mod).filter(
+        Flashcard.deck_id == deck_id, Flashcard.anki_guid.isnot(None)
+    )
+    return {guid: (card_id, mod) for guid, card_id, mod in rows}
+
+
+def parse_note(note_id: int, flds: Optional[str], tags: Optional[str], sfld: Any) -> Optional[Tuple[str, str, Optional[str]]]:
+    """(concept, definition, tags string) for an Anki note, or None if it should be skipped"""
+    try:
+        # Convert sfld to string if it's not already (it might be an integer in the schema)
+        sfld_str = str(sfld) if sfld is not None else ""
+
+        # flds holds the note's fields (usually front, back for basic cards)
+        fields = flds.split('\x1f') if flds else []  # Anki uses \x1f as field separator
+
+        if len(fields) < 1:
+            return None
+
+        # Get the first field (main content) and strip HTML
+        main_field = strip_html(fields[0].strip()) if fields[0] else ""
+
+        # If main_field is empty or looks like an error, try using sfld (sort field) as fallback
+        if not main_field or any(indicator in main_field for indicator in ERROR_NOTE_INDICATORS):
+            if sfld_str and sfld_str != "None" and not sfld_str.isdigit():
+                main_field = strip_html(sfld_str.strip())
+                if not main_field or ERROR_NOTE_TEXT in main_field:
+                    return None
+            else:
+                return None
+    except Exception as e:
+        print(f"Error processing note {note_id}: {str(e)}")
+        return None
+
+    # Check if this is a cloze deletion card
+    cloze_result = parse_cloze_deletion(main_field)
+
+    if cloze_result:
+        # It's a cloze deletion card
+        concept, definition = cloze_result
+    elif len(fields) >= 2 and fields[1]:
+        # Regular card with a second field
+        concept = main_field
+        definition = strip_html(fields[1].strip())
+        # Skip if definition is also the error message
+        if ERROR_NOTE_TEXT in definition:
+            return None
+    else:
+        # Single field card - use the field as both concept and definition
+        concept = main_field
+        definition = main_field
+
+    if not concept:
+        return None
+
+    # If definition is empty, use concept as definition
+    if not definition:
+        definition = concept
+
+    # Parse tags (space-separated, may have # prefix)
+    tag_list = [tag.strip().lstrip('#') for tag in tags.split() if tag.strip()] if tags else []
+
+    # Convert tags to comma-separated string
+    return concept, definition, ', '.join(tag_list) if tag_list else None
+
+
+@dataclass
+class CollectionImport:
+    """
+    Where an import_collection run stands. Import jobs save it with every committed batch,
+    so a retry continues after last_note_id in the same deck instead of starting over.
+    """
+    deck_id: Optional[int] = None
+    last_note_id: int = 0
+    note_count: int = 0  # Importable notes in the collection
+    processed_count: int = 0
+    created_count: int = 0
+    updated_count: int = 0  # Cards re-imported from a changed note
+    unchanged_count: int = 0  # Cards whose note hasn't changed since it was imported
+    removed_count: int = 0  # Cards whose note is no longer in the collection (remove_missing)
+    scheduled_count: int = 0  # New cards that kept their Anki schedule
+    skipped_count: int = 0
+    duplicate_count: int = 0
+    duplicates: List[dict] = field(default_factory=list)
+
+
+def import_collection(
+    db: Session,
+    collection_path: str,
+    user_id: int,
+    deck_id: Optional[int],
+    default_deck_name: str,
+    duplicates: DuplicatePolicy = DuplicatePolicy.skip,
+    state: Optional[CollectionImport] = None,
+    on_batch: Optional[Callable[[CollectionImport, List[int]], None]] = None,
+    remove_missing: bool = False,
+    import_scheduling: bool = True,
+) -> Dict[str, Any]:
+    """
+    Create flashcards from an extracted Anki collection, in the given deck or a new one named
+    after the collection's deck (else default_deck_name). Cards the deck already has from the
+    collection's notes are updated in place if their note changed; with remove_missing, cards
+    from notes no longer in the collection are deleted. With import_scheduling, new cards get a
+    review carrying their Anki schedule. Only flushes; on_batch(state,
+    created_ids) runs after each batch, which is where import jobs commit and report progress.
+    Pass a saved `state` to resume a partly imported collection.
+    """
+    state = state or CollectionImport()
+    max_cards = settings.ANKI_IMPORT_MAX_CARDS
+    conn = sqlite3.connect(collection_path)
+    try:
+        state.note_count = check_collection(conn)
+        if state.note_count == 0:
+            raise HTTPException(status_code=400, detail=NO_NOTES_DETAIL)
+
+        # Get the deck; a new one is only created once a batch has cards for it
+        deck = None
+        deck_id = state.deck_id or deck_id
+        if deck_id:
+            deck = db.query(Deck).filter(Deck.id == deck_id, Deck.user_id == user_id).first()
+            if not deck:
+                raise HTTPException(status_code=404, detail="Deck not found")
+
+        # Set-based diff against the notes the deck's cards came from
+        existing = deck_anki_notes(db, deck.id) if deck else {}
+        note_guids = read_note_guids(conn)
+        new_count = sum(1 for guid, importable in note_guids.items() if importable and guid not in existing)
+        # Checked up front: batches may already be committed when a later one would cross the limit
+        if new_count > max_cards:
+            raise HTTPException(
+                status_code=400,
+                detail=f"This deck contains {new_count} {'new ' if existing else ''}notes, which exceeds the limit of {max_cards} cards per import. Please split your deck into smaller files."
+            )
+
+        schedules = read_note_schedules(conn) if import_scheduling else None
+
+        for notes in iter_note_batches(conn, after_note_id=state.last_note_id):
+            parsed_cards = []
+            note_ids = []
+            note_columns = []
+            changed_cards = []
+            for note_id, flds, tags, sfld, guid, mod in notes:
+                known = existing.get(guid)
+                if known and known[1] == mod:
+                    state.unchanged_count += 1
+                    continue
+                card = parse_note(note_id, flds, tags, sfld)
+                if card is None:
+                    state.skipped_count += 1
+                elif known:
+                    concept, definition, card_tags = card
+                    changed_cards.append({
+                        "id": known[0], "user_id": user_id, "concept": concept, "definition": definition,
+                        "tags": card_tags, "anki_mod": mod,
+                    })
+                else:
+                    parsed_cards.append(card)
+                    note_ids.append(note_id)
+                    note_columns.append({"anki_guid": guid, "anki_mod": mod})
+
+            # Changed notes keep their card (and its reviews); only the text and tags are rewritten
+            update_flashcards(db, changed_cards)
+            state.updated_count += len(changed_cards)
+
+            # Skip or flag cards that duplicate the user's existing cards (or each other);
+            # earlier batches are already inserted, so they count as existing cards
+            screen = screen_duplicates(db, user_id, [card[:2] for card in parsed_cards], duplicates)
+            if deck is None and any(screen.keep(index) for index in range(len(parsed_cards))):
+                deck = Deck(name=read_deck_name(conn) or default_deck_name, user_id=user_id)
+                db.add(deck)
+                db.flush()
+                state.deck_id = deck.id
+            created_ids = add_screened_cards(db, screen, parsed_cards, deck.id if deck else None, user_id, note_columns)
+            created_note_ids = [note_ids[index] for index in range(len(parsed_cards)) if screen.keep(index)]
+            state.scheduled_count += seed_reviews(db, user_id, created_ids, created_note_ids, schedules)
+            state.created_count += len(created_ids)
+            state.duplicate_count += screen.duplicate_count
+            state.duplicates.extend(screen.report()[:DUPLICATE_REPORT_LIMIT - len(state.duplicates)])
+            state.processed_count += len(notes)
+            state.last_note_id = notes[-1][0]
+            if on_batch:
+                on_batch(state, created_ids)
+
+        if remove_missing and existing:
+            missing = [card_id for guid, (card_id, _) in existing.items() if guid not in note_guids]
+            delete_flashcards(db, user_id, missing)
+            state.removed_count += len(missing)
+    finally:
+        conn.close()
+
+    synced_count = state.updated_count + state.unchanged_count + state.removed_count
+    # Check if we actually created any flashcards
+    if state.created_count == 0 and synced_count == 0 and state.duplicate_count:
+        raise HTTPException(
+            status_code=400,
+            detail=f"All {state.duplicate_count} cards in this deck duplicate flashcards you already have. Import with duplicates=allow to add them anyway."
+        )
+    if state.created_count == 0 and synced_count == 0:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Could not import any flashcards from this Anki deck. All {state.skipped_count} notes were skipped. This might be an Anki Collection Package (.colpkg) file. Please export your deck from Anki as 'Anki Deck Package (*.apkg)' instead. In Anki: File → Export → Select 'Anki Deck Package (*.apkg)' → Choose your deck → Export."
+        )
+
+    verb = "skipped" if duplicates == DuplicatePolicy.skip else "flagged"
+    notes = [f"{state.duplicate_count} duplicates {verb}"] if state.duplicate_count else []
+    if synced_count:
+        notes.append(f"{state.updated_count} updated, {state.unchanged_count} unchanged")
+    if state.removed_count:
+        notes.append(f"{state.removed_count} removed")
+    if state.scheduled_count:
+        notes.append(f"{state.scheduled_count} kept their Anki schedule")
+    return {
+        "success": True,
+        "message": f"Imported {state.created_count} flashcards from Anki deck" + (f" ({', '.join(notes)})" if notes else ""),
+        "deck_id": deck.id,
+        "deck_name": deck.name,
+        "created_count": state.created_count,
+        "updated_count": state.updated_count,
+        "unchanged_count": state.unchanged_count,
+        "removed_count": state.removed_count,
+        "scheduled_count": state.scheduled_count,
+        "skipped_count": state.skipped_count,
+        "duplicate_count": state.duplicate_count,
+        "duplicates": state.duplicates
+    }
@@ -0,0 +1,168 @@
+"""
+Anki scheduling import
+
+Cards imported without a CardReview are all never-reviewed, so get_next_due_flashcard sends
+every one of them first. read_note_schedules converts the collection's cards table (and its
+revlog, when present) to SM-2 state in one vectorized pass over all rows:
+- a note's cards (e.g. forward and reverse) become one of our cards, so the note takes the
+  schedule of its most reviewed card;
+- new cards (never answered) are left unscheduled;
+- ease_factor is Anki's factor / 1000 (at least 1.3; cards still in learning have none yet);
+- interval_days is ivl; repetition_count is reps - lapses in review, 0 while (re)learning;
+- next_review_date comes from due: a timestamp for cards in learning, else a day number
+  counted from the collection's creation (crt); cards in a filtered deck use odue;
+- review_date is the card's last revlog entry (else next_review_date - ivl) and was_correct
+  whether that answer wasn't "Again".
+seed_reviews then bulk-inserts one CardReview per newly imported card, marked is_imported so
+answer stats (accuracy, streaks, activity) leave it out.
+"""
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional, Sequence
+import numpy as np
+from sqlalchemy.orm import Session
+from app.services.flashcard_bulk import insert_reviews
+
+DAY_SECONDS = 86400
+TIMESTAMP_DUE_MIN = 10 ** 9  # due values above this are epoch seconds (learning), below day numbers
+MIN_EASE_FACTOR = 1.3
+DEFAULT_EASE_FACTOR = 2.5
+
+# Anki card types
+CARD_TYPE_NEW = 0
+CARD_TYPE_REVIEW = 2
+ANSWER_AGAIN = 1  # revlog ease of a failed answer
+
+IMPORTED_REVIEW_FEEDBACK = "Imported from Anki"  # llm_feedback of seeded reviews (no answer to evaluate)
+
+
+@dataclass
+class NoteSchedules:
+    """SM-2 state per Anki note id (arrays aligned with the sorted note_ids)"""
+    note_ids: np.ndarray
+    repetition_count: np.ndarray
+    ease_factor: np.ndarray
+    interval_days: np.ndarray
+    next_review: np.ndarray  # Epoch seconds
+    last_review: np.ndarray  # Epoch seconds
+    was_correct: np.ndarray
+
+    def positions(self, note_ids: Sequence[int]) -> np.ndarray:
+        """Index of each note's schedule, -1 for notes without one"""
+        wanted = np.asarray(note_ids, dtype=np.int64)
+        found = np.searchsorted(self.note_ids, wanted)
+        found[found == len(self.note_ids)] = 0
+        return np.where(self.note_ids[found] == wanted, found, -1)
+
+
+def _tables(conn: sqlite3.Connection) -> set:
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+
+
+def _last_answers(conn: sqlite3.Connection, card_ids: np.ndarray):
+    """(epoch seconds, answer ease) of each card's latest revlog entry; NaN / 0 for cards without one"""
+    last_at = np.full(len(card_ids), np.nan)
+    last_ease = np.zeros(len(card_ids), dtype=np.int64)
+    revlog = np.array(conn.execute("SELECT cid, id, ease FROM revlog").fetchall(), dtype=np.int64).reshape(-1, 3)
+    if not len(revlog):
+        return last_at, last_ease
+    revlog = revlog[np.lexsort((revlog[:, 1], revlog[:, 0]))]
+    latest = revlog[np.r_[revlog[1:, 0] != revlog[:-1, 0], True]]  # Last entry of each card
+    found = np.searchsorted(latest[:, 0], card_ids)
+    found[found == len(latest)] = 0
+    has = latest[found, 0] == card_ids
+    last_at[has] = latest[found[has], 1] / 1000  # revlog ids are epoch milliseconds
+    last_ease[has] = latest[found[has], 2]
+    return last_at, last_ease
+
+
+def read_note_schedules(conn: sqlite3.Connection, now: Optional[datetime] = None) -> Optional[NoteSchedules]:
+    """SM-2 state of the collection's reviewed notes, or None if it has no scheduling to import"""
+    tables = _tables(conn)
+    if "cards" not in tables or "col" not in tables:
+        return None
+    try:
+        created = conn.execute("SELECT crt FROM col").fetchone()
+        rows = conn.execute(
+            "SELECT id, nid, type, due, odue, odid, ivl, factor, reps, lapses FROM cards WHERE type != ? AND reps > 0",
+            (CARD_TYPE_NEW,)
+        ).fetchall()
+    except sqlite3.Error:
+        return None
+    if not created or created[0] is None or not rows:
+        return None
+    now_seconds = (now or datetime.now(timezone.utc)).timestamp()
+
+    cards = np.array(rows, dtype=np.int64)
+    # The most reviewed card of each note (lowest card id on ties) stands for the note
+    cards = cards[np.lexsort((cards[:, 0], -cards[:, 8], cards[:, 1]))]
+    cards = cards[np.r_[True, cards[1:, 1] != cards[:-1, 1]]]
+    card_id, note_id, card_type, due, odue, odid, ivl, factor, reps, lapses = cards.T
+
+    due = np.where((odid != 0) & (odue != 0), odue, due)
+    next_review = np.where(due >= TIMESTAMP_DUE_MIN, due, created[0] + due * DAY_SECONDS).astype(np.float64)
+    in_review = card_type == CARD_TYPE_REVIEW
+    interval_days = np.maximum(ivl, 0)
+
+    last_review = next_review - interval_days * DAY_SECONDS
+    was_correct = in_review.copy()
+    if "revlog" in tables:
+        last_at, last_ease = _last_answers(conn, card_id)
+        answered = ~np.isnan(last_at)
+        last_review = np.where(answered, last_at, last_review)
+        was_correct = np.where(answered, last_ease != ANSWER_AGAIN, was_correct)
+
+    return NoteSchedules(
+        note_ids=note_id,
+        repetition_count=np.where(in_review, np.maximum(reps - lapses, 1), 0),
+        ease_factor=np.where(factor > 0, np.maximum(factor / 1000, MIN_EASE_FACTOR), DEFAULT_EASE_FACTOR),
+        interval_days=interval_days,
+        next_review=next_review,
+        last_review=np.minimum(last_review, now_seconds),
+        was_correct=was_correct,
+    )
+
+
+def seed_reviews(db: Session, user_id: int, card_ids: Sequence[int], note_ids: Sequence[int], schedules: Optional[NoteSchedules]) -> int:
+    """Bulk-insert a CardReview carrying each imported card's Anki schedule; returns how many cards got one"""
+    if schedules is None or not card_ids:
+        return 0
+    positions = schedules.positions(note_ids)
+    scheduled = positions >= 0
+    if not scheduled.any():
+        return 0
+    card_ids = np.asarray(card_ids)[scheduled]
+    positions = positions[scheduled]
+
+    def dates(seconds: np.ndarray):
+        return [datetime.fromtimestamp(value, timezone.utc) for value in seconds.tolist()]
+
+    rows = [
+        {
+            "user_id": user_id,
+            "flashcard_id": card_id,
+            "user_response": "",
+            "was_correct": was_correct,
+            "confidence_score": 1.0 if was_correct else 0.0,
+            "llm_feedback": IMPORTED_REVIEW_FEEDBACK,
+            "review_date": review_date,
+            "next_review_date": next_review_date,
+            "repetition_count": repetition_count,
+            "ease_factor": ease_factor,
+            "interval_days": interval_days,
+            "is_sms_review": False,
+            "is_imported": True,
+        }
+        for card_id, was_correct, review_date, next_review_date, repetition_count, ease_factor, interval_days in zip(
+            card_ids.tolist(),
+            schedules.was_correct[positions].tolist(),
+            dates(schedules.last_review[positions]),
+            dates(schedules.next_review[positions]),
+            schedules.repetition_count[positions].tolist(),
+            schedules.ease_factor[positions].tolist(),
+            schedules.interval_days[positions].tolist(),
+        )
+    ]
+    insert_reviews(db, rows)
+    return len(rows)
@@ -0,0 +1,221 @@
+"""
+Anki plain-text export (.txt) parsing
+
+Anki's "Notes in Plain Text" / "Cards in Plain Text" exports are delimited text, since
+Anki 2.1.55 preceded by "#key:value" header lines:
+    #separator:tab        tab, comma, semicolon, space, pipe, colon, or the character itself
+    #html:true            fields are HTML
+    #tags:vocab jp        tags for every note
+    #guid column:1        1-based positions of the non-field columns
+    #notetype column:2
+    #deck column:3
+    #tags column:6
+Older exports have no headers and are tab-separated HTML.
+
+Rows are streamed through the csv module (quoted fields may hold separators, doubled
+quotes and newlines) and turned into cards locally, with the HTML and cloze handling used
+for .apkg notes. Only rows that can't be split into a question and an answer that way
+(a single column, e.g. "Tokyo - capital of Japan") are sent to GPT, LLM_BATCH_ROWS at a
+time; without an OpenAI key they are skipped.
+"""
+import csv
+import logging
+import re
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import Callable, Iterator, List, Optional, TextIO, Tuple
+from fastapi import HTTPException
+from app.services.card_generation import import_card_rows, parse_anki_export
+from app.utils.config import settings
+from app.utils.text_cleaning import parse_cloze_deletion, strip_html
+
+logger = logging.getLogger(__name__)
+
+LLM_BATCH_ROWS = 25
+PROGRESS_EVERY_ROWS = 1000
+MAX_FIELD_SIZE = 16 * 1024 * 1024  # HTML fields can embed images; csv's default limit is 128 KiB
+
+SEPARATORS = {"tab": "\t", "comma": ",", "semicolon": ";", "space": " ", "pipe": "|", "colon": ":"}
+HEADER_PATTERN = re.compile(r"^#([a-z ]+):(.*)$")
+# Header keys Anki writes or reads (columns, notetype, deck and if matches are skipped here);
+# any other "#word:..." line is the first row of data
+HEADER_KEYS = {
+    "separator", "html", "tags", "columns", "notetype", "deck", "if matches",
+    "guid column", "notetype column", "deck column", "tags column",
+}
+HTML_CLOZE_MARKERS = ("class=\"cloze\"", "class='cloze'")
+# "Cards in Plain Text" backs repeat the question above this rule
+ANSWER_RULE = re.compile(r"<hr\s+id=[\"']?answer[\"']?\s*/?>", re.IGNORECASE)
+
+Card = Tuple[str, str, Optional[str]]
+
+
+@dataclass
+class ExportFormat:
+    separator: str = "\t"
+    html: bool = True
+    tags: List[str] = field(default_factory=list)  # From the #tags header, added to every note
+    guid_column: Optional[int] = None  # 0-based
+    notetype_column: Optional[int] = None
+    deck_column: Optional[int] = None
+    tags_column: Optional[int] = None
+
+    def special_columns(self) -> set:
+        return {column for column in (self.guid_column, self.notetype_column, self.deck_column, self.tags_column) if column is not None}
+
+
+@dataclass
+class ParsedExport:
+    cards: List[Card] = field(default_factory=list)
+    row_count: int = 0
+    skipped_count: int = 0
+    llm_rows: List[str] = field(default_factory=list)  # Rows left for GPT, re-joined with tabs
+    llm_failed_count: int = 0  # Rows skipped because GPT was unavailable or its response unusable
+
+
+def read_format(export: TextIO) -> Tuple[ExportFormat, Iterator[str]]:
+    """
+    Consume the header lines; returns the format and the remaining lines (first data line
+    included). Headers end at the first line that isn't a known "#key:value" header.
+    """
+    fmt = ExportFormat()
+    has_separator = False
+    line = export.readline()
+    while line.startswith("#"):
+        match = HEADER_PATTERN.match(line.rstrip("\r\n"))
+        key = match and match.group(1).strip().lower()
+        if key not in HEADER_KEYS:
+            break
+        value = match.group(2).strip()
+        if key == "separator":
+            fmt.separator = SEPARATORS.get(value.lower(), value[:1] or "\t")
+            has_separator = True
+        elif key == "html":
+            fmt.html = value.lower() == "true"
+        elif key == "tags":
+            fmt.tags = value.split()
+        elif key.endswith(" column") and value.isdigit():
+            attribute = key.replace(" ", "_")
+            if hasattr(fmt, attribute):
+                setattr(fmt, attribute, int(value) - 1)
+        line = export.readline()
+
+    # Headerless exports are tab-separated; sniff the first row in case it was saved as CSV
+    if not has_separator and line and "\t" not in line:
+        try:
+            fmt.separator = csv.Sniffer().sniff(line, delimiters=",;|").delimiter
+        except csv.Error:
+            pass
+    return fmt, chain([line], export)
+
+
+def _clean(text: str, fmt: ExportFormat) -> str:
+    text = strip_html(text) if fmt.html else text
+    return (text or "").strip()
+
+
+def parse_row(fields: List[str], fmt: ExportFormat) -> Tuple[Optional[Card], bool]:
+    """(card, needs_llm) for one row: a card, a row for GPT, or (None, False) for an empty row"""
+    special = fmt.special_columns()
+    content = [value for index, value in enumerate(fields) if index not in special]
+    while content and not content[-1].strip():
+        content.pop()
+
+    tag_list = list(fmt.tags)
+    if fmt.tags_column is not None and fmt.tags_column < len(fields):
+        tag_list += [tag.lstrip('#') for tag in fields[fmt.tags_column].split() if tag.strip('#')]
+    tags = ', '.join(dict.fromkeys(tag_list)) or None
+
+    if not content or not any(_clean(value, fmt) for value in content):
+        return None, False
+
+    front = content[0]
+    back = content[1] if len(content) > 1 else ""
+    if back and ANSWER_RULE.search(back):
+        back = ANSWER_RULE.split(back)[-1]
+
+    # Cloze notes: {{c1::...}} in note exports, <span class="cloze"> in card exports
+    concept = _clean(front, fmt)
+    cloze = None
+    if "{{c" in concept:
+        cloze = parse_cloze_deletion(concept)
+    elif any(marker in front for marker in HTML_CLOZE_MARKERS):
+        cloze = parse_cloze_deletion(front)
+    if cloze:
+        return (cloze[0], cloze[1], tags), False
+
+    definition = _clean(back, fmt)
+    if concept and definition:
+        return (concept, definition, tags), False
+    return None, True
+
+
+def _llm_cards(rows: List[str]) -> Tuple[List[Card], int, int]:
+    """Cards GPT makes of rows the parser couldn't, LLM_BATCH_ROWS rows per call; how many rows gave no card; and how many of those were in failed calls"""
+    cards: List[Card] = []
+    skipped_count = 0
+    failed_count = 0
+    for start in range(0, len(rows), LLM_BATCH_ROWS):
+        batch = rows[start:start + LLM_BATCH_ROWS]
+        try:
+            batch_cards, _ = import_card_rows(parse_anki_export("\n".join(batch)))
+        except HTTPException as e:
+            # One bad response only costs its own rows
+            logger.warning(f"⚠️ Skipping {len(batch)} Anki export rows GPT could not parse: {e.detail}")
+            batch_cards = []
+            failed_count += len(batch)
+        cards.extend(batch_cards)
+        skipped_count += max(len(batch) - len(batch_cards), 0)
+    return cards, skipped_count, failed_count
+
+
+def parse_export(
+    export: TextIO,
+    max_cards: Optional[int] = None,
+    on_rows: Optional[Callable[[int], None]] = None,
+) -> ParsedExport:
+    """
+    Parse an export opened with newline="" (so quoted newlines survive). Rows for GPT are
+    only collected here; resolve them with resolve_llm_rows. Raises 400 as soon as the cards
+    plus pending GPT rows exceed max_cards.
+    """
+    fmt, lines = read_format(export)
+    parsed = ParsedExport()
+    csv.field_size_limit(max(csv.field_size_limit(), MAX_FIELD_SIZE))
+    for fields in csv.reader(lines, delimiter=fmt.separator):
+        if not fields:
+            continue
+        parsed.row_count += 1
+        card, needs_llm = parse_row(fields, fmt)
+        if card:
+            parsed.cards.append(card)
+        elif needs_llm:
+            parsed.llm_rows.append("\t".join(fields))
+        else:
+            parsed.skipped_count += 1
+
+        if max_cards is not None and len(parsed.cards) + len(parsed.llm_rows) > max_cards:
+            raise HTTPException(
+                status_code=400,
+                detail=f"This import contains more than {max_cards} cards, which exceeds the limit of {max_cards} cards per import. Please split your deck into smaller files."
+            )
+        if on_rows and parsed.row_count % PROGRESS_EVERY_ROWS == 0:
+            on_rows(parsed.row_count)
+    return parsed
+
+
+def resolve_llm_rows(parsed: ParsedExport) -> int:
+    """Add GPT's cards for the unparsed rows to `parsed`; returns how many rows went to GPT"""
+    rows, parsed.llm_rows = parsed.llm_rows, []
+    if not rows:
+        return 0
+    if not settings.OPENAI_API_KEY:
+        logger.warning(f"⚠️ Skipping {len(rows)} unparseable Anki export rows: OpenAI API key not configured")
+        parsed.skipped_count += len(rows)
+        parsed.llm_failed_count += len(rows)
+        return 0
+    cards, skipped_count, failed_count = _llm_cards(rows)
+    parsed.cards.extend(cards)
+    parsed.skipped_count += skipped_count
+    parsed.llm_failed_count += failed_count
+    return len(rows)
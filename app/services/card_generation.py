@@ -0,0 +1,373 @@
+"""
+LLM card generation for imports
+
+Prompts and response parsing for the imports that have GPT structure or write the cards:
+Anki plain-text exports, PDFs and pasted text. Each returns the list of card objects GPT
+produced; import_card_rows / pasted_card_rows validate them. Problems are raised as
+HTTPException, like the rest of the import code.
+
+Long PDFs are map-reduced: their chunks are sent in parallel as extraction produces them
+(generate_pdf_chunk_cards), and the combined cards are only sent back to GPT when the
+user's instructions (such as a card count) have to be applied to the whole set
+(merge_pdf_cards, which answers with the indexes of the cards to keep).
+"""
+import json
+import logging
+import re
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from itertools import chain
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from fastapi import HTTPException
+from openai import OpenAI
+from app.utils.config import settings
+from app.utils.text_cleaning import normalize_text
+
+logger = logging.getLogger(__name__)
+
+GPT_MODEL = "gpt-4o"
+
+
+def _client(purpose: str) -> OpenAI:
+    if not settings.OPENAI_API_KEY:
+        raise HTTPException(
+            status_code=500,
+            detail=f"OpenAI API key not configured. Cannot process {purpose}."
+        )
+    return OpenAI(api_key=settings.OPENAI_API_KEY)
+
+
+def _complete(client: OpenAI, prompt: str, temperature: float) -> str:
+    response = client.chat.completions.create(
+        model=GPT_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=temperature,
+    )
+    response_text = response.choices[0].message.content.strip()
+
+    # Strip markdown code block if present
+    if response_text.startswith("```json"):
+        response_text = response_text[7:]
+    if response_text.startswith("```"):
+        response_text = response_text[3:]
+    if response_text.endswith("```"):
+        response_text = response_text[:-3]
+    return response_text.strip()
+
+
+def _json_array(response_text: str) -> List[Any]:
+    try:
+        data = json.loads(response_text)
+    except json.JSONDecodeError:
+        # Fallback: escape single backslashes (LaTeX) and try again
+        safe_text = re.sub(r'(?<!\\)\\(?![\\ntr"])', r'\\\\', response_text)
+        try:
+            data = json.loads(safe_text)
+        except json.JSONDecodeError as e:
+            logger.warning(f"⚠️ Could not parse GPT response as JSON ({e}): {response_text[:500]}")
+            raise HTTPException(
+                status_code=500,
+                detail="Failed to parse GPT response as JSON. Please try again or contact support."
+            )
+    if not isinstance(data, list):
+        raise HTTPException(
+            status_code=500,
+            detail="GPT returned invalid format. Expected a JSON array."
+        )
+    return data
+
+
+def parse_anki_export(text_content: str) -> List[Any]:
+    """Cards GPT extracts from an Anki plain-text export"""
+    client = _client("Anki import")
+
+    prompt = f"""You are parsing an Anki deck export file. Extract all flashcards from the text below and return them as a JSON array.
+
+Each flashcard should have:
+- "concept": The front/question/prompt of the card (clean text, no HTML, no cloze markers)
+- "definition": The back/answer/explanation of the card (clean text, no HTML)
+- "tags": Optional comma-separated tags if present, otherwise empty string
+
+Rules:
+1. For cloze deletion cards (with {{c1::...}} or <span class="cloze">), extract the full question with "..." where the cloze deletion is, and put the answer in the definition field
+2. Remove all HTML tags and entities (convert &nbsp; to spaces, etc.)
+3. Skip empty cards or cards with no meaningful content
+4. Clean up extra whitespace
+5. If a card has multiple cloze deletions, combine all answers in the definition separated by commas
+6. Return ONLY valid JSON, no markdown code blocks, no explanation
+
+Example input:
+"A human hair is ~<span class=""cloze"" data-cloze=""50&#x20;um"" data-ordinal=""1"">[...]</span> in diameter."	"A human hair is ~<span class=""cloze"" data-ordinal=""1"">50 um</span> in diameter."
+
+Example output:
+[
+  {{
+    "concept": "A human hair is ~ ... in diameter.",
+    "definition": "A human hair is ~ 50 um in diameter.",
+    "tags": ""
+  }}
+]
+
+Now parse this Anki export:
+{text_content[:50000]}
+"""
+
+    return _json_array(_complete(client, prompt, temperature=0.1))  # Low temperature for consistent parsing
+
+
+def generate_pdf_cards(pdf_text: str, instructions: str = "", part: Optional[int] = None) -> List[Any]:
+    """Cards GPT writes from a PDF's text (or from chunk number `part` of it), following the user's instructions"""
+    client = _client("PDF import")
+
+    # Build GPT prompt with base instructions + user instructions
+    base_instructions = """CRITICAL: Create EXTREMELY concise flashcards. The definition should be as short as possible - ideally just a few words, a number, a name, or a single fact.
+
+Examples of good concise flashcards:
+- Concept: "Avogadro's number" → Definition: "6.02e23"
+- Concept: "Elon's birthplace" → Definition: "Pretoria"
+- Concept: "Capital of France" → Definition: "Paris"
+- Concept: "Year WW2 ended" → Definition: "1945"
+- Concept: "Photosynthesis equation" → Definition: "6CO2 + 6H2O → C6H12O6 + 6O2"
+
+Base instructions:
+- Don't create too many flashcards (aim for 10-30 cards unless the user specifies otherwise)
+- DEFINITIONS MUST BE EXTREMELY CONCISE: Just the essential answer - a number, name, short phrase, or key fact. NO repetition of the concept/question in the definition.
+- Concepts should be brief questions or prompts (one sentence or phrase max)
+- Focus on key facts, definitions, numbers, names, dates, and essential information
+- Skip verbose explanations, examples, or content that requires long answers
+- If the PDF is very long, prioritize the most important content
+- NEVER repeat the concept/question in the definition - the definition should ONLY contain the answer"""
+    
+    user_instructions_text = f"\n\nUser's specific instructions (apply these in addition to the base instructions above):\n{instructions}" if instructions.strip() else ""
+    if part:
+        # The card count is applied when the parts are merged (merge_pdf_cards)
+        user_instructions_text += f"""
+
+The text below is part {part} of a longer document. Create cards for this part only (aim for 10-30 cards for this part). If the user's instructions ask for a number of cards, ignore that number here: it applies to the whole document and is enforced after all parts are done."""
+    
+    prompt = f"""You are creating flashcards from a PDF document. {base_instructions}{user_instructions_text}
+
+Extract flashcards from the PDF text below and return them as a JSON array.
+
+Each flashcard should have:
+- "concept": The front/question/prompt of the card (brief and clear, one sentence or phrase)
+- "definition": The back/answer - MUST be extremely concise (just the essential answer: a number, name, short phrase, or key fact)
+- "tags": Optional comma-separated tags relevant to the content, otherwise empty string
+
+Rules:
+1. DEFINITIONS MUST BE AS CONCISE AS POSSIBLE - aim for 1-5 words, a number, or a short phrase
+2. NEVER repeat the concept/question in the definition - if the concept asks "What is X?", the definition should just be "X" or the answer, not "X is..."
+3. Focus on factual information: numbers, names, dates, definitions, key terms
+4. Skip verbose explanations, examples, or content that requires long answers
+5. Return ONLY valid JSON, no markdown code blocks, no explanation
+6. Follow the user's specific instructions above (in addition to these base rules)
+
+PDF content:
+{pdf_text}
+"""
+
+    return _json_array(_complete(client, prompt, temperature=0.3))  # Low temperature for consistent output
+
+
+def generate_pdf_chunk_cards(
+    chunks: Iterable[str],
+    instructions: str = "",
+    done: Optional[List[Optional[List[Any]]]] = None,
+    on_chunk: Optional[Callable[[int, List[Any]], None]] = None,
+) -> List[List[Any]]:
+    """
+    Cards GPT writes for each chunk of a PDF (pdf_text.chunk_pages), PDF_CHUNK_CONCURRENCY
+    requests at a time. `chunks` may be a generator: each chunk is sent as soon as it is
+    produced. Chunks already in `done` (from an earlier attempt) are not sent again.
+    on_chunk(index, cards) runs in the calling thread as chunks finish; if it (or a chunk)
+    raises, chunks not yet started are cancelled.
+    """
+    done = done or []
+    results: List[Optional[List[Any]]] = []
+    futures: Dict[Future, int] = {}
+
+    def collect(wait: bool) -> None:
+        for future in (as_completed(list(futures)) if wait else [future for future in futures if future.done()]):
+            index = futures.pop(future)
+            results[index] = future.result()
+            if on_chunk:
+                on_chunk(index, results[index])
+
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    if first is None:
+        return []
+    second = next(chunks, None)
+    # A single-chunk document gets the plain prompt, without the part wording
+    single = second is None
+
+    executor = ThreadPoolExecutor(max_workers=settings.PDF_CHUNK_CONCURRENCY, thread_name_prefix="pdf-chunk")
+    try:
+        for index, chunk in enumerate(chain([first], [] if single else [second], chunks)):
+            results.append(done[index] if index < len(done) else None)
+            if results[index] is None:
+                futures[executor.submit(generate_pdf_cards, chunk, instructions, None if single else index + 1)] = index
+            collect(wait=False)
+        collect(wait=True)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+    return results
+
+
+# Instructions that narrow a PDF's cards down: a card count, or wording that picks some cards over others
+_SELECTION_PATTERN = re.compile(
+    r"\d|\b(?:only|just|most|top|main|key|important|essential|fewer|focus\w*|limit\w*|max\w*|select\w*|choose|pick"
+    r"|ten|twenty|thirty|forty|fifty|hundred|dozen)\b",
+    re.IGNORECASE,
+)
+MERGE_FIELD_CHARS = 200  # Card text sent to the merge step, per field
+
+
+def instructions_select_cards(instructions: str) -> bool:
+    """Whether the user's instructions ask for a number or a selection of cards, which only the merge step can apply"""
+    return bool(_SELECTION_PATTERN.search(instructions or ""))
+
+
+def merge_pdf_cards(cards: List[Tuple[str, str, Optional[str]]], instructions: str) -> List[int]:
+    """
+    Indexes (in document order) of the cards generated from a PDF's chunks that GPT keeps
+    to meet the user's instructions (e.g. a card count). GPT answers with indexes rather
+    than the cards, so the response stays small however many cards there are.
+    """
+    client = _client("PDF import")
+
+    def brief(text: str) -> str:
+        text = " ".join(text.split())
+        return text if len(text) <= MERGE_FIELD_CHARS else text[:MERGE_FIELD_CHARS] + "..."
+
+    listing = "\n".join(f"{index}. {brief(concept)} => {brief(definition)}" for index, (concept, definition, _) in enumerate(cards))
+
+    prompt = f"""You are finalizing flashcards that were created separately from consecutive parts of one PDF document.
+
+User's instructions for the whole document:
+{instructions}
+
+Rules:
+1. Apply the user's instructions to the set as a whole: if they ask for a number of cards, keep that many, choosing the most important ones across all parts; if they ask for a focus, keep the cards that match it
+2. When several cards test the same fact, keep only one of them
+3. Return ONLY a JSON array of the numbers of the cards to keep, e.g. [0, 4, 7], no markdown code blocks, no explanation
+
+Flashcards (number. question => answer):
+{listing}
+"""
+
+    indexes = _json_array(_complete(client, prompt, temperature=0.1))
+    kept = sorted({index for index in indexes if type(index) is int and 0 <= index < len(cards)})
+    if not kept:
+        raise HTTPException(status_code=500, detail="GPT did not keep any of the cards.")
+    return kept
+
+
+def parse_pasted_text(raw_text: str) -> List[Any]:
+    """Cards GPT extracts from pasted notes, lists, etc."""
+    client = _client("batch flashcard creation")
+
+    prompt = f"""You are an assistant that extracts multiple flashcards from text input. The user may paste:
+- A list of terms and definitions
+- Notes with concepts and explanations
+- Any structured or unstructured text containing information to memorize
+
+For each flashcard, extract:
+- concept: what the user is trying to remember (the question/front)
+- definition: the answer, explanation, or formula (the back)
+- tags: relevant tags if contextually obvious, otherwise empty string
+- source_url: empty string (user will add if needed)
+
+Return ONLY a JSON array of flashcard objects. Each object must have: concept, definition, tags, source_url.
+
+Examples:
+
+Input:
+"Tokyo - Capital of Japan
+Paris - Capital of France
+London - Capital of UK"
+
+Output:
+[
+  {{"concept": "Capital of Japan", "definition": "Tokyo", "tags": "", "source_url": ""}},
+  {{"concept": "Capital of France", "definition": "Paris", "tags": "", "source_url": ""}},
+  {{"concept": "Capital of UK", "definition": "London", "tags": "", "source_url": ""}}
+]
+
+Input:
+"Japanese words:
+こんにちは - Hello
+ありがとう - Thank you
+さようなら - Goodbye"
+
+Output:
+[
+  {{"concept": "こんにちは", "definition": "Hello", "tags": "japanese", "source_url": ""}},
+  {{"concept": "ありがとう", "definition": "Thank you", "tags": "japanese", "source_url": ""}},
+  {{"concept": "さようなら", "definition": "Goodbye", "tags": "japanese", "source_url": ""}}
+]
+
+Important:
+- Return ONLY a JSON array, no text before or after
+- Use double quotes for all keys and string values
+- Escape backslashes in LaTeX as \\\\
+- Always include all four fields: concept, definition, tags, source_url
+- If input is ambiguous, make reasonable assumptions about concept/definition split
+- Extract as many flashcards as possible from the input
+
+Now parse this text into flashcards:
+{raw_text}
+"""
+
+    return _json_array(_complete(client, prompt, temperature=0.3))
+
+
+def import_card_rows(flashcards_data: List[Any]) -> Tuple[List[Tuple[str, str, Optional[str]]], int]:
+    """(concept, definition, tags) of the valid cards GPT returned for an Anki/PDF import, and how many were skipped"""
+    parsed_cards = []
+    skipped_count = 0
+    for card_data in flashcards_data:
+        if not isinstance(card_data, dict):
+            skipped_count += 1
+            continue
+
+        concept = normalize_text(str(card_data.get("concept") or ""))
+        definition = normalize_text(str(card_data.get("definition") or ""))
+        tags = str(card_data.get("tags") or "").strip()
+
+        # Skip if concept or definition is empty
+        if not concept or not definition:
+            skipped_count += 1
+            continue
+
+        parsed_cards.append((concept, definition, tags if tags else None))
+    return parsed_cards, skipped_count
+
+
+def pasted_card_rows(cards_data: List[Any]) -> Tuple[List[Tuple[int, str, str, str, str]], List[str]]:
+    """(index, concept, definition, tags, source_url) of the valid pasted-text cards, and per-card errors"""
+    parsed_cards = []
+    errors = []
+    for idx, card_data in enumerate(cards_data):
+        if not isinstance(card_data, dict):
+            errors.append(f"Card {idx + 1}: Invalid format")
+            continue
+
+        if "concept" not in card_data or "definition" not in card_data:
+            errors.append(f"Card {idx + 1}: Missing concept or definition")
+            continue
+
+        concept = normalize_text(str(card_data["concept"]))
+        definition = normalize_text(str(card_data["definition"]))
+
+        if not concept or not definition:
+            errors.append(f"Card {idx + 1}: Empty concept or definition")
+            continue
+
+        # Normalize tags
+        tags_str = ""
+        if "tags" in card_data and card_data["tags"]:
+            tags_list = [tag.strip().lower() for tag in str(card_data["tags"]).split(',') if tag.strip()]
+            tags_str = ', '.join(tags_list)
+
+        parsed_cards.append((idx, concept, definition, tags_str, str(card_data.get("source_url", "")).strip()))
+    return parsed_cards, errors
@@ -0,0 +1,61 @@
+"""
+Reconciliation of the denormalized deck counters
+
+Deck.card_count, due_count_cached and last_reviewed_at are maintained incrementally by
+the session hooks in app/models/events.py. Bulk statements that bypass the ORM can leave
+them wrong, and due counts go stale on their own as cards come due, so a periodic task
+recomputes every deck's counters from the source tables and reports how many drifted.
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+from sqlalchemy import or_, select, func, true
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import Deck
+from app.models.events import KEEP_DECK_UPDATED_AT, deck_counter_expressions
+from app.utils.celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+
+def reconcile_deck_counters(db: Session, deck_ids: Optional[Iterable[int]] = None) -> dict:
+    """
+    Recompute counters for all decks (or the given ones) and commit.
+    Returns how many decks were checked and how many had drifted card/review counters.
+    """
+    now = datetime.now(timezone.utc)
+    decks = Deck.__table__
+    expected = deck_counter_expressions(now)
+    scope = decks.c.id.in_(list(deck_ids)) if deck_ids is not None else true()
+
+    drifted = db.execute(
+        select(func.count()).select_from(decks).where(scope).where(or_(
+            decks.c.card_count != expected["card_count"],
+            decks.c.last_reviewed_at.is_distinct_from(expected["last_reviewed_at"]),
+        ))
+    ).scalar() or 0
+    checked = db.execute(
+        decks.update().where(scope).values(due_count_updated_at=now, **expected, **KEEP_DECK_UPDATED_AT)
+    ).rowcount
+    db.commit()
+
+    if drifted:
+        logger.warning(f"⚠️ Deck counters: repaired drift on {drifted} of {checked} decks")
+    return {"checked": checked, "drifted": drifted}
+
+
+@celery_app.task
+def reconcile_deck_counters_task():
+    """Celery task: recompute deck counters and refresh due counts"""
+    db = SessionLocal()
+    try:
+        result = reconcile_deck_counters(db)
+        logger.info(f"✅ Deck counters reconciled: {result}")
+        return result
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Deck counter reconciliation failed: {e}")
+        raise
+    finally:
+        db.close()
@@ -0,0 +1,39 @@
+"""
+Deck serialization shared by the deck endpoints and delta sync (GET /sync)
+"""
+import os
+from app.models import Deck
+from app.schemas.deck import DeckOut
+
+
+def get_full_image_url(image_url: str | None) -> str | None:
+    """Convert relative image URL to full URL if needed"""
+    if not image_url:
+        return None
+    
+    # If it's already a full URL, return as is
+    if image_url.startswith('http'):
+        return image_url
+    
+    # Get base URL from environment or use Railway backend URL as fallback
+    base_url = os.getenv("BASE_URL", "https://sms-spaced-repetition-production.up.railway.app")
+    
+    # Convert relative URL to full URL
+    # Ensure image_url starts with / for proper concatenation
+    if not image_url.startswith('/'):
+        image_url = '/' + image_url
+    return f"{base_url}{image_url}"
+
+
+def deck_out(deck: Deck, sms_enabled: bool = False) -> DeckOut:
+    return DeckOut(
+        id=deck.id,
+        name=deck.name,
+        user_id=deck.user_id,
+        image_url=get_full_image_url(deck.image_url),
+        created_at=deck.created_at,
+        flashcards_count=deck.card_count or 0,
+        due_count=deck.due_count_cached or 0,
+        last_reviewed_at=deck.last_reviewed_at,
+        sms_enabled=sms_enabled
+    )
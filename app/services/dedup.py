@@ -0,0 +1,308 @@
+"""
+Near-duplicate flashcard detection
+
+Every card has a MinHash signature and LSH_BANDS bucket keys (flashcard_signatures /
+flashcard_lsh_buckets, maintained by the session hooks in app/models/events.py). Checking
+a batch of new cards looks up only the buckets those cards fall into, then confirms the
+candidates by signature similarity, so the cost grows with the batch and the number of
+near matches, not with the size of the user's collection.
+
+Imports screen their parsed cards with screen_duplicates and skip or flag the duplicates
+(DuplicatePolicy); duplicate_clusters groups a user's existing near-duplicates for cleanup.
+"""
+import logging
+from dataclasses import dataclass, field
+from itertools import combinations
+from enum import Enum
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Set, Tuple
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.models import Flashcard, FlashcardLshBucket, FlashcardSignature
+from app.models.events import sync_flashcard_signatures
+from app.services.flashcard_bulk import insert_flashcards
+from app.utils.config import settings
+from app.utils.minhash import (
+    lsh_buckets, minhash_signatures, pair_similarities, signature_from_bytes, similar_pairs, similarities,
+)
+
+logger = logging.getLogger(__name__)
+
+LOOKUP_CHUNK_SIZE = 1000  # Bucket keys / card ids per IN (...) query
+BACKFILL_BATCH_SIZE = 2000
+DUPLICATE_REPORT_LIMIT = 100  # Duplicates listed in an import response
+PAIRWISE_BUCKET_SIZE = 32  # Larger buckets are compared blockwise instead of pair by pair
+
+
+class DuplicatePolicy(str, Enum):
+    skip = "skip"    # Don't create cards that duplicate an existing (or earlier imported) card
+    flag = "flag"    # Create them, but list them in the response
+    allow = "allow"  # No duplicate check
+
+
+@dataclass
+class DuplicateMatch:
+    similarity: float
+    flashcard_id: Optional[int] = None  # Existing card it duplicates
+    batch_index: Optional[int] = None   # ...or an earlier card of the same batch
+
+
+def _chunks(values: Sequence, size: int = LOOKUP_CHUNK_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _bucket_members(db: Session, user_id: int, keys: Sequence[int]) -> Dict[int, List[int]]:
+    """bucket key -> ids of the user's cards in that bucket"""
+    members: Dict[int, List[int]] = {}
+    for chunk in _chunks(list(keys)):
+        # Joined to flashcards so rows of bulk-deleted cards (no FK cascade on SQLite) never match
+        rows = db.execute(
+            select(FlashcardLshBucket.bucket, FlashcardLshBucket.flashcard_id)
+            .join(Flashcard, Flashcard.id == FlashcardLshBucket.flashcard_id)
+            .where(FlashcardLshBucket.user_id == user_id, FlashcardLshBucket.bucket.in_(chunk))
+        ).all()
+        for bucket, flashcard_id in rows:
+            members.setdefault(bucket, []).append(flashcard_id)
+    return members
+
+
+def _load_signatures(db: Session, card_ids: Sequence[int]) -> Dict[int, np.ndarray]:
+    signatures = {}
+    for chunk in _chunks(list(card_ids)):
+        rows = db.execute(
+            select(FlashcardSignature.flashcard_id, FlashcardSignature.minhash)
+            .where(FlashcardSignature.flashcard_id.in_(chunk))
+        ).all()
+        signatures.update((flashcard_id, signature_from_bytes(minhash)) for flashcard_id, minhash in rows)
+    return signatures
+
+
+def find_duplicates(
+    db: Session,
+    user_id: int,
+    cards: Sequence[Tuple[str, str]],
+    threshold: Optional[float] = None,
+    signatures: Optional[np.ndarray] = None,
+) -> List[Optional[DuplicateMatch]]:
+    """
+    For each (concept, definition), the most similar existing card of the user or earlier card
+    of the batch at or above `threshold` (estimated Jaccard similarity), or None.
+    Existing cards take precedence over batch matches. `signatures` may be passed if already computed.
+    """
+    if not cards:
+        return []
+    threshold = settings.DEDUP_SIMILARITY_THRESHOLD if threshold is None else threshold
+    if signatures is None:
+        signatures = minhash_signatures(cards)
+    buckets = lsh_buckets(signatures)
+
+    members = _bucket_members(db, user_id, {int(key) for key in buckets.flat})
+    existing = _load_signatures(db, sorted({card_id for ids in members.values() for card_id in ids}))
+
+    matches: List[Optional[DuplicateMatch]] = []
+    batch_buckets: Dict[int, List[int]] = {}
+    for index, (signature, card_buckets) in enumerate(zip(signatures, buckets)):
+        keys = [int(key) for key in card_buckets]
+        match = None
+        candidates = sorted({card_id for key in keys for card_id in members.get(key, ()) if card_id in existing})
+        if candidates:
+            scores = similarities(signature, np.stack([existing[card_id] for card_id in candidates]))
+            best = int(np.argmax(scores))
+            if scores[best] >= threshold:
+                match = DuplicateMatch(similarity=float(scores[best]), flashcard_id=candidates[best])
+        if match is None:
+            earlier = sorted({other for key in keys for other in batch_buckets.get(key, ())})
+            if earlier:
+                scores = similarities(signature, signatures[earlier])
+                best = int(np.argmax(scores))
+                if scores[best] >= threshold:
+                    match = DuplicateMatch(similarity=float(scores[best]), batch_index=earlier[best])
+        matches.append(match)
+        for key in keys:
+            batch_buckets.setdefault(key, []).append(index)
+    return matches
+
+
+@dataclass
+class DuplicateScreen:
+    """Result of screening an import batch: which cards to create and which were duplicates"""
+    policy: DuplicatePolicy
+    cards: Sequence[Tuple[str, str]]
+    matches: List[Optional[DuplicateMatch]]
+    signatures: Optional[np.ndarray] = None  # MinHash of each card, reused when inserting
+    created_ids: Dict[int, int] = field(default_factory=dict)  # batch index -> created card id
+
+    def keep(self, index: int) -> bool:
+        return self.policy != DuplicatePolicy.skip or self.matches[index] is None
+
+    @property
+    def duplicate_count(self) -> int:
+        return sum(match is not None for match in self.matches)
+
+    def note(self) -> str:
+        """Suffix for an import's success message, e.g. ' (3 duplicates skipped)'"""
+        if not self.duplicate_count:
+            return ""
+        verb = "skipped" if self.policy == DuplicatePolicy.skip else "flagged"
+        return f" ({self.duplicate_count} duplicates {verb})"
+
+    def record_created(self, index: int, flashcard_id: int) -> None:
+        self.created_ids.setdefault(index, flashcard_id)
+
+    def _resolve(self, index: int) -> Optional[int]:
+        """Card id that batch card `index` duplicates (following skipped batch duplicates)"""
+        match = self.matches[index]
+        while match is not None and match.flashcard_id is None:
+            index = match.batch_index
+            if index in self.created_ids:
+                return self.created_ids[index]
+            match = self.matches[index]
+        return match.flashcard_id if match is not None else None
+
+    def report(self) -> List[dict]:
+        """Duplicates for the import response; call after the kept cards are flushed (record_created)"""
+        return [
+            {
+                "concept": self.cards[index][0],
+                "duplicate_of": self._resolve(index),
+                "similarity": round(match.similarity, 3),
+                "created_id": self.created_ids.get(index),
+            }
+            for index, match in enumerate(self.matches) if match is not None
+        ][:DUPLICATE_REPORT_LIMIT]
+
+
+def screen_duplicates(
+    db: Session,
+    user_id: int,
+    cards: Sequence[Tuple[str, str]],
+    policy: DuplicatePolicy = DuplicatePolicy.skip,
+) -> DuplicateScreen:
+    """Check (concept, definition) pairs about to be imported against the user's cards and each other"""
+    if policy == DuplicatePolicy.allow:
+        return DuplicateScreen(policy=policy, cards=cards, matches=[None] * len(cards))
+    signatures = minhash_signatures(cards)
+    matches = find_duplicates(db, user_id, cards, signatures=signatures)
+    return DuplicateScreen(policy=policy, cards=cards, matches=matches, signatures=signatures)
+
+
+def distinct_card_indexes(cards: Sequence[Tuple[str, str]], threshold: Optional[float] = None) -> List[int]:
+    """Indexes of the cards left when near-duplicates among `cards` are merged into their first occurrence"""
+    if len(cards) < 2:
+        return list(range(len(cards)))
+    pairs = similar_pairs(minhash_signatures(cards), threshold or settings.DEDUP_SIMILARITY_THRESHOLD)
+    earlier: Dict[int, List[int]] = {}
+    for first, second in pairs.tolist():
+        earlier.setdefault(second, []).append(first)
+    kept: Set[int] = set()
+    for index in range(len(cards)):
+        if not any(match in kept for match in earlier.get(index, ())):
+            kept.add(index)
+    return sorted(kept)
+
+
+def add_screened_cards(
+    db: Session,
+    screen: DuplicateScreen,
+    cards: Sequence[Tuple[str, str, Optional[str]]],
+    deck_id: Optional[int],
+    user_id: int,
+    extra_columns: Optional[Sequence[Mapping[str, Any]]] = None,
+) -> List[int]:
+    """
+    Bulk-insert the (concept, definition, tags) cards the screen keeps; returns their ids.
+    extra_columns holds further column values for each card (e.g. its Anki note guid).
+    """
+    kept = [index for index in range(len(cards)) if screen.keep(index)]
+    ids = insert_flashcards(db, [
+        {
+            "user_id": user_id, "deck_id": deck_id, "concept": cards[index][0], "definition": cards[index][1], "tags": cards[index][2],
+            **(extra_columns[index] if extra_columns else {}),
+        }
+        for index in kept
+    ], signatures=screen.signatures[kept] if screen.signatures is not None else None)
+    for index, card_id in zip(kept, ids):
+        screen.record_created(index, card_id)
+    return ids
+
+
+def duplicate_clusters(db: Session, user_id: int, threshold: Optional[float] = None) -> List[List[Tuple[int, float]]]:
+    """
+    Groups of the user's near-duplicate cards, largest first. Each group is [(card_id, similarity
+    to the group's oldest card)], oldest card first with similarity 1.0.
+    """
+    threshold = settings.DEDUP_SIMILARITY_THRESHOLD if threshold is None else threshold
+    buckets = FlashcardLshBucket.__table__
+    shared = select(buckets.c.bucket).where(buckets.c.user_id == user_id).group_by(
+        buckets.c.bucket
+    ).having(func.count() > 1)
+    rows = db.execute(
+        select(buckets.c.bucket, buckets.c.flashcard_id)
+        .join(Flashcard, Flashcard.id == buckets.c.flashcard_id)
+        .where(buckets.c.user_id == user_id, buckets.c.bucket.in_(shared))
+    ).all()
+    members: Dict[int, Set[int]] = {}
+    for bucket, flashcard_id in rows:
+        members.setdefault(bucket, set()).add(flashcard_id)
+    loaded = _load_signatures(db, sorted({card_id for ids in members.values() for card_id in ids}))
+    card_ids = sorted(loaded)
+    if not card_ids:
+        return []
+    position = {card_id: index for index, card_id in enumerate(card_ids)}
+    signatures = np.stack([loaded[card_id] for card_id in card_ids])
+
+    # Small buckets: collect candidate pairs and confirm them all at once;
+    # large ones (templated cards) are compared blockwise
+    candidates: Set[Tuple[int, int]] = set()
+    confirmed = []
+    for ids in members.values():
+        positions = sorted(position[card_id] for card_id in ids if card_id in position)
+        if len(positions) <= PAIRWISE_BUCKET_SIZE:
+            candidates.update(combinations(positions, 2))
+        else:
+            indices = np.array(positions)
+            confirmed.append(indices[similar_pairs(signatures[indices], threshold)])
+    if candidates:
+        pairs = np.array(sorted(candidates), dtype=np.int64)
+        confirmed.append(pairs[pair_similarities(signatures, pairs) >= threshold])
+
+    parent = list(range(len(card_ids)))
+
+    def root(index: int) -> int:
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    for first, second in np.concatenate(confirmed) if confirmed else ():
+        parent[root(int(second))] = root(int(first))
+
+    groups: Dict[int, List[int]] = {}
+    for index in range(len(card_ids)):
+        groups.setdefault(root(index), []).append(index)
+    clusters = []
+    for indices in groups.values():
+        if len(indices) < 2:
+            continue
+        scores = similarities(signatures[indices[0]], signatures[indices])  # Indices ascend with card id
+        clusters.append([(card_ids[index], float(score)) for index, score in zip(indices, scores)])
+    clusters.sort(key=lambda cluster: (-len(cluster), cluster[0][0]))
+    return clusters
+
+
+def backfill_flashcard_signatures(db: Session) -> int:
+    """Recompute every card's signature and buckets, in id-ordered batches; returns cards processed"""
+    processed, last_id = 0, 0
+    while True:
+        cards = db.query(Flashcard.id, Flashcard.user_id, Flashcard.concept, Flashcard.definition).filter(
+            Flashcard.id > last_id
+        ).order_by(Flashcard.id).limit(BACKFILL_BATCH_SIZE).all()
+        if not cards:
+            break
+        sync_flashcard_signatures(db, [tuple(card) for card in cards])
+        db.commit()
+        processed += len(cards)
+        last_id = cards[-1].id
+    logger.info(f"🧬 Backfilled duplicate-detection signatures for {processed} flashcards")
+    return processed
@@ -0,0 +1,133 @@
+"""
+Streaming export of flashcards and review history
+
+Exports can cover hundreds of thousands of reviews, so nothing is materialized: rows are
+read through a server-side cursor (yield_per) in batches of EXPORT_BATCH_SIZE, each batch
+is encoded (NDJSON or CSV, optionally gzip-compressed incrementally) and yielded to a
+StreamingResponse. Memory stays at roughly one batch whatever the export size.
+
+The generator opens its own session so the cursor outlives the request's dependencies.
+"""
+import csv
+import io
+import json
+import logging
+import zlib
+from datetime import date, datetime, timezone
+from enum import Enum
+from typing import Any, Iterator, Optional
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from app.database import SessionLocal
+from app.models import CardReview, Deck, Flashcard
+
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_SIZE = 1000
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv",
+}
+
+FLASHCARD_EXPORT_COLUMNS = [
+    Flashcard.id, Flashcard.deck_id, Deck.name.label("deck_name"), Flashcard.concept,
+    Flashcard.definition, Flashcard.tags, Flashcard.source_url, Flashcard.created_at, Flashcard.updated_at,
+]
+REVIEW_EXPORT_COLUMNS = [
+    CardReview.id, CardReview.flashcard_id, Flashcard.concept, CardReview.created_at, CardReview.review_date,
+    CardReview.user_response, CardReview.was_correct, CardReview.confidence_score, CardReview.llm_feedback,
+    CardReview.next_review_date, CardReview.repetition_count, CardReview.ease_factor, CardReview.interval_days,
+    CardReview.is_sms_review, CardReview.is_imported,
+]
+
+
+def flashcards_export_query(user_id: Optional[int] = None):
+    """Flashcards with their deck name, one user's or everyone's (user_id column added) in id order"""
+    columns = FLASHCARD_EXPORT_COLUMNS if user_id is not None else [Flashcard.user_id] + FLASHCARD_EXPORT_COLUMNS
+    query = select(*columns).outerjoin(Deck, Deck.id == Flashcard.deck_id)
+    if user_id is not None:
+        query = query.where(Flashcard.user_id == user_id)
+    return query.order_by(Flashcard.id)
+
+
+def reviews_export_query(user_id: Optional[int] = None):
+    """Reviews with the reviewed card's concept, one user's or everyone's (user_id column added) in id order"""
+    columns = REVIEW_EXPORT_COLUMNS if user_id is not None else [CardReview.user_id] + REVIEW_EXPORT_COLUMNS
+    query = select(*columns).outerjoin(Flashcard, Flashcard.id == CardReview.flashcard_id)
+    if user_id is not None:
+        query = query.where(CardReview.user_id == user_id)
+    return query.order_by(CardReview.id)
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return "" if value is None else value
+
+
+def _encode_batches(query, fmt: ExportFormat) -> Iterator[str]:
+    """Text chunks for the query's rows, one per batch (CSV starts with a header chunk)"""
+    db = SessionLocal()
+    try:
+        result = db.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        keys = list(result.keys())
+        buffer = io.StringIO()
+        writer = csv.writer(buffer) if fmt == ExportFormat.csv else None
+        if writer is not None:
+            writer.writerow(keys)
+            yield buffer.getvalue()
+        for batch in result.partitions():
+            buffer.seek(0)
+            buffer.truncate()
+            if writer is not None:
+                writer.writerows([_csv_value(value) for value in row] for row in batch)
+            else:
+                for row in batch:
+                    buffer.write(json.dumps(dict(zip(keys, row)), default=_json_value))
+                    buffer.write("\n")
+            yield buffer.getvalue()
+    except Exception as e:
+        logger.error(f"❌ Export failed mid-stream: {e}")
+        raise
+    finally:
+        db.close()
+
+
+def _gzip(chunks: Iterator[str]) -> Iterator[bytes]:
+    """Incrementally gzip-compress text chunks"""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)  # gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def streaming_export(query, fmt: ExportFormat, gzip: bool, name: str) -> StreamingResponse:
+    """StreamingResponse downloading the query's rows as <name>-<date>.<ndjson|csv>[.gz]"""
+    filename = f"{name}-{datetime.now(timezone.utc):%Y-%m-%d}.{fmt.value}"
+    chunks = _encode_batches(query, fmt)
+    if gzip:
+        return StreamingResponse(
+            _gzip(chunks),
+            media_type="application/gzip",
+            headers={"Content-Disposition": f'attachment; filename="{filename}.gz"'}
+        )
+    return StreamingResponse(
+        (chunk.encode("utf-8") for chunk in chunks),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
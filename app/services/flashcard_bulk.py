@@ -0,0 +1,114 @@
+"""
+Bulk flashcard inserts, updates and deletes (and review inserts) for imports
+
+Rows are written as multi-row INSERT ... RETURNING id statements of INSERT_CHUNK_SIZE rows
+(SQLAlchemy's insertmanyvalues; an explicit multi-row VALUES insert on SQLite) instead of
+one ORM add per card, then flashcards_inserted
+applies what the session hooks would have done (data_version, deck counters, tag links,
+duplicate-detection signatures, knowledge map). Updates are one executemany UPDATE by id and
+deletes one DELETE per chunk of ids, followed by flashcards_updated / flashcards_deleted.
+Reviews (imported Anki schedules) are inserted with executemany and reviews_inserted.
+Everything runs in the caller's transaction.
+"""
+from typing import List, Mapping, Optional, Sequence
+import numpy as np
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm import Session
+from app.models import CardReview, Flashcard
+from app.models.events import (
+    flashcards_deleted, flashcards_inserted, flashcards_updated, record_tombstones, reviews_inserted
+)
+
+INSERT_CHUNK_SIZE = 2000  # 8 columns a row stays under SQLite's 32766 bound parameters
+
+_OPTIONAL_COLUMNS = ("deck_id", "tags", "source_url", "anki_guid", "anki_mod")
+
+
+def insert_flashcards(db: Session, rows: Sequence[Mapping], signatures: Optional[np.ndarray] = None) -> List[int]:
+    """
+    Insert flashcards given as dicts (user_id, concept, definition, and optionally deck_id,
+    tags, source_url, anki_guid, anki_mod); returns their ids in row order. `signatures` are the rows' MinHash
+    signatures if the caller already computed them (duplicate screening).
+    """
+    table = Flashcard.__table__
+    statement = table.insert().returning(table.c.id, sort_by_parameter_order=True)
+    connection = db.connection()
+    sqlite = connection.dialect.name == "sqlite"
+    ids: List[int] = []
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        chunk = [
+            {
+                "user_id": row["user_id"],
+                "concept": row["concept"],
+                "definition": row["definition"],
+                **{name: row.get(name) for name in _OPTIONAL_COLUMNS},
+            }
+            for row in rows[start:start + INSERT_CHUNK_SIZE]
+        ]
+        if sqlite:
+            # SQLAlchemy can't order insertmanyvalues RETURNING rows on SQLite and would fall back to
+            # one INSERT per row; one multi-row VALUES statement assigns rowids in row order instead
+            chunk_ids = sorted(connection.execute(table.insert().values(chunk).returning(table.c.id)).scalars().all())
+        else:
+            chunk_ids = connection.execute(statement, chunk).scalars().all()
+        flashcards_inserted(db, [
+            (card_id, row["user_id"], row["deck_id"], row["concept"], row["definition"], row["tags"])
+            for card_id, row in zip(chunk_ids, chunk)
+        ], signatures=signatures[start:start + INSERT_CHUNK_SIZE] if signatures is not None else None)
+        ids.extend(chunk_ids)
+    return ids
+
+
+def update_flashcards(db: Session, rows: Sequence[Mapping]) -> None:
+    """
+    Rewrite the text of existing flashcards given as dicts (id, user_id, concept, definition,
+    tags, and optionally anki_mod). Ids, decks and reviews are left alone; updated_at is bumped.
+    """
+    table = Flashcard.__table__
+    statement = table.update().where(table.c.id == bindparam("card_id")).values(
+        concept=bindparam("new_concept"),
+        definition=bindparam("new_definition"),
+        tags=bindparam("new_tags"),
+        anki_mod=bindparam("new_anki_mod"),
+    )
+    connection = db.connection()
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        chunk = rows[start:start + INSERT_CHUNK_SIZE]
+        connection.execute(statement, [
+            {
+                "card_id": row["id"],
+                "new_concept": row["concept"],
+                "new_definition": row["definition"],
+                "new_tags": row["tags"],
+                "new_anki_mod": row.get("anki_mod"),
+            }
+            for row in chunk
+        ])
+        flashcards_updated(db, [
+            (row["id"], row["user_id"], row["concept"], row["definition"], row["tags"]) for row in chunk
+        ])
+
+
+def delete_flashcards(db: Session, user_id: int, card_ids: Sequence[int]) -> None:
+    """Delete a user's flashcards and their reviews, recording sync tombstones for both"""
+    cards, reviews = Flashcard.__table__, CardReview.__table__
+    connection = db.connection()
+    for start in range(0, len(card_ids), INSERT_CHUNK_SIZE):
+        chunk = list(card_ids[start:start + INSERT_CHUNK_SIZE])
+        review_ids = connection.execute(select(reviews.c.id).where(reviews.c.flashcard_id.in_(chunk))).scalars().all()
+        record_tombstones(db, user_id, "review", review_ids)
+        record_tombstones(db, user_id, "flashcard", chunk)
+        deck_ids = connection.execute(select(cards.c.deck_id).where(cards.c.id.in_(chunk)).distinct()).scalars().all()
+        connection.execute(reviews.delete().where(reviews.c.flashcard_id.in_(chunk)))
+        connection.execute(cards.delete().where(cards.c.id.in_(chunk), cards.c.user_id == user_id))
+        flashcards_deleted(db, user_id, chunk, deck_ids)
+
+
+def insert_reviews(db: Session, rows: Sequence[Mapping]) -> None:
+    """Insert card reviews given as dicts of CardReview columns (user_id, flashcard_id, review_date, next_review_date, ...)"""
+    table = CardReview.__table__
+    connection = db.connection()
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        chunk = rows[start:start + INSERT_CHUNK_SIZE]
+        connection.execute(table.insert(), chunk)
+        reviews_inserted(db, [(row["user_id"], row["flashcard_id"], row["review_date"]) for row in chunk])
@@ -0,0 +1,55 @@
+"""
+Paginated, column-restricted flashcard listings
+
+Shared by the flashcard list endpoints and the deck detail endpoint. Pages are keyset
+pages on (created_at, id), oldest first; `fields=` restricts both the columns loaded
+(load_only) and the keys serialized, and the deck is only joined when deck_name is needed.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Query, joinedload, load_only
+from app.models import Deck, Flashcard
+from app.utils.pagination import fetch_page, select_fields
+
+FLASHCARD_FIELDS = (
+    "id", "user_id", "concept", "definition", "tags", "source_url",
+    "created_at", "updated_at", "deck_id", "deck_name",
+)
+# Everything stored on the card itself (deck_name needs the deck)
+FLASHCARD_COLUMN_FIELDS = tuple(name for name in FLASHCARD_FIELDS if name != "deck_name")
+
+
+def split_tags(tags: Optional[str]) -> List[str]:
+    """Comma-separated tags column -> list, as FlashcardOut serializes it"""
+    return [tag.strip() for tag in tags.split(',') if tag.strip()] if tags else []
+
+
+FLASHCARD_CONVERTERS = {
+    "tags": lambda card: split_tags(card.tags),
+    "deck_name": lambda card: card.deck.name if card.deck else None,
+}
+
+
+def flashcard_page(
+    query: Query,
+    cursor: Optional[str],
+    limit: Optional[int],
+    fields: Optional[List[str]] = None,
+    deck_name: bool = False,
+) -> Tuple[List[Flashcard], Optional[str]]:
+    """
+    One page of a Flashcard query. Only the requested columns (plus the keyset columns)
+    are loaded when `fields` is given; the deck is joined if deck_name is wanted.
+    limit=None returns everything. Returns (cards, next_cursor).
+    """
+    if fields is not None:
+        columns = {name for name in fields if name != "deck_name"} | {"id", "created_at"}
+        query = query.options(load_only(*[getattr(Flashcard, name) for name in sorted(columns)]))
+        deck_name = "deck_name" in fields
+    if deck_name:
+        query = query.options(joinedload(Flashcard.deck).load_only(Deck.name))
+    return fetch_page(query, Flashcard.created_at, Flashcard.id, cursor, limit, descending=False)
+
+
+def flashcard_dicts(cards: List[Flashcard], fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Serialize cards to FlashcardOut-shaped dicts, restricted to `fields` if given"""
+    return select_fields(cards, fields or FLASHCARD_FIELDS, FLASHCARD_CONVERTERS)
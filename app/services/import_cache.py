@@ -0,0 +1,106 @@
+"""
+Content-hash cache for import results
+
+Re-uploading the same PDF or export (e.g. after a failed request) shouldn't pay for text
+extraction and GPT generation again. Import jobs look up their generated cards (and PDF
+jobs their extracted pages) under cache_key(kind, SHA-256 of the content, *options), where
+the options are whatever else shapes the output: instructions, GPT model, chunk size.
+A hit goes straight to inserting the cards.
+
+Entries live in import_cache_entries, shared by all workers; once their serialized size
+passes IMPORT_CACHE_MAX_MB the least recently used are evicted. Imports can opt out with
+use_cache=false (the fresh output still replaces the cached one), and IMPORT_CACHE_ENABLED
+turns the cache off.
+"""
+import hashlib
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Optional
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models import ImportCacheEntry
+from app.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 2  # Bump when parsing or prompts change, so older output is no longer reused
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as content:
+        while chunk := content.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def text_digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def cache_key(kind: str, content_digest: str, *options: Any) -> str:
+    material = json.dumps([CACHE_VERSION, kind, content_digest, *options], sort_keys=True, default=str)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def get_cached(db: Session, key: str) -> Optional[Any]:
+    """Cached payload under `key`, or None; commits the hit"""
+    if not settings.IMPORT_CACHE_ENABLED:
+        return None
+    entry = db.get(ImportCacheEntry, key)
+    if entry is None:
+        return None
+    entry.hits += 1
+    entry.last_used_at = datetime.now(timezone.utc)
+    payload = entry.payload
+    db.commit()
+    return payload
+
+
+def put_cached(db: Session, key: str, kind: str, payload: Any) -> None:
+    """Store (or replace) the payload under `key` and evict past IMPORT_CACHE_MAX_MB; commits"""
+    if not settings.IMPORT_CACHE_ENABLED:
+        return
+    size = len(json.dumps(payload, default=str))
+    max_bytes = settings.IMPORT_CACHE_MAX_MB * 1024 * 1024
+    if size > max_bytes:
+        return
+
+    now = datetime.now(timezone.utc)
+    entry = db.get(ImportCacheEntry, key)
+    if entry is None:
+        db.add(ImportCacheEntry(key=key, kind=kind, payload=payload, size_bytes=size, last_used_at=now))
+    else:
+        entry.payload = payload
+        entry.size_bytes = size
+        entry.last_used_at = now
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another worker stored the same content first; its entry is as good as ours
+        db.rollback()
+        return
+    evict(db, max_bytes)
+
+
+def evict(db: Session, max_bytes: Optional[int] = None) -> int:
+    """Delete least recently used entries until the cache fits in max_bytes; returns how many were deleted"""
+    max_bytes = settings.IMPORT_CACHE_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+    total = db.query(func.coalesce(func.sum(ImportCacheEntry.size_bytes), 0)).scalar()
+    if total <= max_bytes:
+        return 0
+
+    evicted = []
+    for key, size in db.query(ImportCacheEntry.key, ImportCacheEntry.size_bytes).order_by(ImportCacheEntry.last_used_at).all():
+        if total <= max_bytes:
+            break
+        evicted.append(key)
+        total -= size
+    for start in range(0, len(evicted), 500):
+        db.query(ImportCacheEntry).filter(ImportCacheEntry.key.in_(evicted[start:start + 500])).delete(synchronize_session=False)
+    db.commit()
+    logger.info(f"🧹 Evicted {len(evicted)} import cache entries")
+    return len(evicted)
@@ -0,0 +1,760 @@
+"""
+Background import jobs
+
+The import endpoints (POST /anki/import, /pdf/import, /flashcards/batch-create) only validate
+the request, store any upload in import_upload_chunks (an Anki package as just its collection
+database) and create an import_jobs row; the work (LLM calls, parsing, inserting cards) runs
+in run_import_job_task on a Celery worker, and clients poll GET /imports/{id} for the stage,
+progress counts, errors and created cards.
+Workers need no filesystem shared with the web process: they copy the upload from the
+database to their own IMPORT_UPLOAD_DIR when a job starts.
+
+Retries are idempotent:
+- a request repeated with the same Idempotency-Key header returns the existing job;
+- a job is claimed with a conditional update (queued, or running without a heartbeat for
+  IMPORT_JOB_LEASE_SECONDS), so a redelivered task never runs next to a live attempt;
+- Anki batches are committed together with the job's resume point and created card ids,
+  and LLM output is saved before any card is created, so a retried job picks up where the
+  last attempt stopped instead of creating cards twice or calling the LLM again.
+- an upload identical to an earlier one (same content and options) reuses that import's
+  generated cards from the content-hash cache (app/services/import_cache.py).
+
+Cancellation is cooperative: the worker checks cancel_requested between batches and stages.
+Cards committed before that point are kept and listed in created_card_ids.
+"""
+import logging
+import os
+import sqlite3
+import tempfile
+import uuid
+import zipfile
+from dataclasses import asdict
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import Deck, ImportJob, ImportUploadChunk, User
+from app.services.anki_package import CollectionImport, extract_collection, import_collection
+from app.services.anki_text import parse_export, resolve_llm_rows
+from app.services.card_generation import (
+    GPT_MODEL, generate_pdf_chunk_cards, import_card_rows, instructions_select_cards, merge_pdf_cards, parse_pasted_text,
+    pasted_card_rows,
+)
+from app.services.dedup import DuplicatePolicy, add_screened_cards, distinct_card_indexes, screen_duplicates
+from app.services.flashcard_bulk import insert_flashcards
+from app.services.import_cache import cache_key, file_digest, get_cached, put_cached, text_digest
+from app.services.pdf_text import chunk_pages, iter_pdf_pages
+from app.utils.celery_app import celery_app
+from app.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_BYTES = 4 * 1024 * 1024  # Size of the import_upload_chunks rows an upload is stored in
+
+
+class ImportJobStatus(str, Enum):
+    queued = "queued"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+    cancelled = "cancelled"
+
+
+FINISHED_STATUSES = (ImportJobStatus.succeeded, ImportJobStatus.failed, ImportJobStatus.cancelled)
+
+
+class ImportKind(str, Enum):
+    anki_package = "anki_package"  # .apkg/.colpkg
+    anki_text = "anki_text"        # Anki plain-text export (app/services/anki_text.py)
+    pdf = "pdf"
+    text = "text"                  # Pasted text (batch create)
+
+
+class ImportCancelled(Exception):
+    """Raised inside a running job once the user has cancelled it"""
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def job_dict(job: ImportJob) -> Dict[str, Any]:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "stage": job.stage,
+        "progress": {"done": job.progress_done, "total": job.progress_total},
+        "errors": job.errors or [],
+        "created_card_ids": job.created_card_ids or [],
+        "result": job.result,
+        "cancel_requested": job.cancel_requested,
+        "attempts": job.attempts,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def get_job(db: Session, user_id: int, job_id: int) -> ImportJob:
+    job = db.query(ImportJob).filter(ImportJob.id == job_id, ImportJob.user_id == user_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return job
+
+
+def find_job_by_key(db: Session, user_id: int, idempotency_key: Optional[str]) -> Optional[ImportJob]:
+    """The job an earlier request with this Idempotency-Key created, if any"""
+    if not idempotency_key:
+        return None
+    return db.query(ImportJob).filter(
+        ImportJob.user_id == user_id, ImportJob.idempotency_key == idempotency_key
+    ).first()
+
+
+def check_deck(db: Session, user_id: int, deck_id: Optional[int]) -> None:
+    """Fail the request early (404) if the target deck isn't the user's"""
+    if deck_id and not db.query(Deck.id).filter(Deck.id == deck_id, Deck.user_id == user_id).first():
+        raise HTTPException(status_code=404, detail="Deck not found")
+
+
+def new_upload_path(filename: Optional[str]) -> str:
+    os.makedirs(settings.IMPORT_UPLOAD_DIR, exist_ok=True)
+    extension = os.path.splitext(filename or "")[1].lower()
+    return os.path.join(settings.IMPORT_UPLOAD_DIR, f"{uuid.uuid4().hex}{extension}")
+
+
+def extract_package_upload(package_path: str) -> str:
+    """
+    Replace a saved .apkg/.colpkg with just its collection database, so the job stores (and
+    the worker copies) no media; returns the new upload path
+    """
+    try:
+        with tempfile.TemporaryDirectory(dir=settings.IMPORT_UPLOAD_DIR) as temp_dir:
+            collection_path = extract_collection(package_path, temp_dir)
+            upload_path = new_upload_path(os.path.basename(collection_path))
+            os.replace(collection_path, upload_path)
+            return upload_path
+    finally:
+        _remove_upload(package_path)
+
+
+def _remove_upload(path: Optional[str]) -> None:
+    if path and os.path.exists(path):
+        try:
+            os.unlink(path)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not remove import upload {path}: {e}")
+
+
+def _store_upload(db: Session, job_id: int, path: str) -> None:
+    """Copy a saved upload into import_upload_chunks (committed with the job)"""
+    table = ImportUploadChunk.__table__
+    with open(path, "rb") as upload:
+        position = 0
+        while chunk := upload.read(UPLOAD_CHUNK_BYTES):
+            db.execute(table.insert().values(job_id=job_id, position=position, data=chunk))
+            position += 1
+
+
+def _has_upload(db: Session, job_id: int) -> bool:
+    return db.query(ImportUploadChunk.job_id).filter(ImportUploadChunk.job_id == job_id).first() is not None
+
+
+def _local_upload_path(job: ImportJob) -> str:
+    return os.path.join(settings.IMPORT_UPLOAD_DIR, os.path.basename(job.upload_path))
+
+
+def _delete_upload(db: Session, job: ImportJob) -> None:
+    """Drop a job's upload: the stored chunks and this machine's copy"""
+    if not job.upload_path:
+        return
+    db.query(ImportUploadChunk).filter(ImportUploadChunk.job_id == job.id).delete(synchronize_session=False)
+    _remove_upload(_local_upload_path(job))
+    job.upload_path = None
+
+
+def create_job(
+    db: Session,
+    user_id: int,
+    kind: ImportKind,
+    params: Dict[str, Any],
+    upload_path: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+) -> ImportJob:
+    """Record and queue an import; a concurrent request with the same Idempotency-Key gets the first one's job"""
+    job = ImportJob(
+        user_id=user_id,
+        kind=kind.value,
+        status=ImportJobStatus.queued.value,
+        stage="queued",
+        params=params,
+        upload_path=upload_path,
+        idempotency_key=idempotency_key or None,
+    )
+    db.add(job)
+    try:
+        db.flush()
+        if upload_path:
+            _store_upload(db, job.id, upload_path)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        existing = find_job_by_key(db, user_id, idempotency_key)
+        if existing is None:
+            raise
+        return existing
+    finally:
+        # The worker reads the stored copy, possibly on another machine
+        _remove_upload(upload_path)
+    enqueue_job(db, job)
+    return job
+
+
+def enqueue_job(db: Session, job: ImportJob) -> None:
+    try:
+        run_import_job_task.delay(job.id)
+    except Exception as e:
+        logger.error(f"❌ Could not queue import job {job.id}: {e}")
+        db.rollback()
+        _finish(db, job, ImportJobStatus.failed, error="Could not start the import. Please try again.")
+    db.refresh(job)  # Development runs tasks eagerly, so the job may already be finished
+
+
+def cancel_job(db: Session, job: ImportJob) -> ImportJob:
+    """Queued jobs are cancelled at once; running ones stop at their next batch or stage"""
+    if job.status in FINISHED_STATUSES:
+        raise HTTPException(status_code=409, detail=f"This import has already {'finished' if job.status == ImportJobStatus.succeeded else job.status}")
+    db.query(ImportJob).filter(ImportJob.id == job.id).update(
+        {ImportJob.cancel_requested: True}, synchronize_session=False
+    )
+    db.query(ImportJob).filter(ImportJob.id == job.id, ImportJob.status == ImportJobStatus.queued.value).update(
+        {ImportJob.status: ImportJobStatus.cancelled.value, ImportJob.finished_at: _now()}, synchronize_session=False
+    )
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def retry_job(db: Session, job: ImportJob) -> ImportJob:
+    """Re-run a failed or cancelled job from its checkpoint; no-op for queued, running or succeeded jobs"""
+    if job.status not in (ImportJobStatus.failed, ImportJobStatus.cancelled):
+        return job
+    if job.kind != ImportKind.text and not (job.upload_path and _has_upload(db, job.id)):
+        raise HTTPException(status_code=409, detail="The uploaded file is no longer available. Please start a new import.")
+    job.status = ImportJobStatus.queued.value
+    job.stage = "queued"
+    job.cancel_requested = False
+    job.finished_at = None
+    job.errors = []
+    db.commit()
+    enqueue_job(db, job)
+    return job
+
+
+class JobProgress:
+    """Stage and progress writes of a running job; each write commits whatever the job has flushed so far"""
+
+    def __init__(self, db: Session, job: ImportJob):
+        self.db = db
+        self.job = job
+
+    def stage(self, name: str, total: Optional[int] = None, done: int = 0) -> None:
+        self.job.stage = name
+        self.job.progress_total = total
+        self.job.progress_done = done
+        self.commit()
+
+    def update(self, done: int, total: Optional[int] = None) -> None:
+        self.job.progress_done = done
+        if total is not None:
+            self.job.progress_total = total
+        self.commit()
+
+    def commit(self) -> None:
+        self.job.heartbeat_at = _now()
+        self.db.commit()
+
+    def check_cancelled(self) -> None:
+        if self.db.query(ImportJob.cancel_requested).filter(ImportJob.id == self.job.id).scalar():
+            raise ImportCancelled()
+
+
+def _claim(db: Session, job_id: int) -> Optional[ImportJob]:
+    """Mark the job running for this attempt, unless it's finished or another attempt still holds it"""
+    now = _now()
+    stale = now - timedelta(seconds=settings.IMPORT_JOB_LEASE_SECONDS)
+    claimed = db.query(ImportJob).filter(
+        ImportJob.id == job_id,
+        or_(
+            ImportJob.status == ImportJobStatus.queued.value,
+            and_(
+                ImportJob.status == ImportJobStatus.running.value,
+                or_(ImportJob.heartbeat_at.is_(None), ImportJob.heartbeat_at < stale),
+            ),
+        ),
+    ).update({
+        ImportJob.status: ImportJobStatus.running.value,
+        ImportJob.attempts: ImportJob.attempts + 1,
+        ImportJob.heartbeat_at: now,
+    }, synchronize_session=False)
+    db.commit()
+    if not claimed:
+        return None
+    job = db.get(ImportJob, job_id)
+    if job.started_at is None:
+        job.started_at = now
+        db.commit()
+    return job
+
+
+def _finish(
+    db: Session,
+    job: ImportJob,
+    status: ImportJobStatus,
+    result: Optional[Dict[str, Any]] = None,
+    error: Optional[str] = None,
+) -> None:
+    job.status = status.value
+    if status == ImportJobStatus.succeeded:
+        job.stage = "done"
+        job.result = result
+        # Failed and cancelled jobs keep their upload for a retry (see prune_import_jobs)
+        _delete_upload(db, job)
+    if error:
+        job.errors = (job.errors or []) + [error]
+    job.finished_at = _now()
+    db.commit()
+
+
+def _require_upload(db: Session, job: ImportJob) -> str:
+    """Path of the job's upload on this machine, copied from import_upload_chunks unless an earlier attempt here already did"""
+    if not job.upload_path:
+        raise HTTPException(status_code=400, detail="The uploaded file is no longer available. Please start a new import.")
+    path = _local_upload_path(job)
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(settings.IMPORT_UPLOAD_DIR, exist_ok=True)
+    partial_path = f"{path}.{uuid.uuid4().hex}.part"
+    chunks = db.execute(
+        select(ImportUploadChunk.data).where(ImportUploadChunk.job_id == job.id).order_by(ImportUploadChunk.position)
+        .execution_options(yield_per=1)
+    ).scalars()
+    written = 0
+    with open(partial_path, "wb") as local:
+        for data in chunks:
+            local.write(data)
+            written += 1
+    if not written:
+        _remove_upload(partial_path)
+        raise HTTPException(status_code=400, detail="The uploaded file is no longer available. Please start a new import.")
+    os.replace(partial_path, path)
+    return path
+
+
+def _deck(db: Session, user_id: int, deck_id: Optional[int], default_name: str) -> Deck:
+    if deck_id:
+        deck = db.query(Deck).filter(Deck.id == deck_id, Deck.user_id == user_id).first()
+        if not deck:
+            raise HTTPException(status_code=404, detail="Deck not found")
+        return deck
+    deck = Deck(name=default_name, user_id=user_id)
+    db.add(deck)
+    db.flush()
+    return deck
+
+
+def _content_digest(db: Session, job: ImportJob) -> Optional[str]:
+    """SHA-256 of the job's upload (or pasted text) when its cards still have to be generated and may come from the import cache"""
+    if "cards" in (job.checkpoint or {}) or not settings.IMPORT_CACHE_ENABLED:
+        return None
+    if job.upload_path:
+        return file_digest(_require_upload(db, job))
+    return text_digest(job.params.get("raw_text") or "")
+
+
+def _generate_once(
+    job: ImportJob,
+    progress: JobProgress,
+    generate: Callable[[], Dict[str, Any]],
+    first_stage: str = "generating",
+    cache_key: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    LLM output of the job, generated on the first attempt and reused by retries. With a
+    cache_key, the output of an identical earlier import is reused too (unless the job was
+    created with use_cache=false); output marked "partial" is not cached.
+    """
+    if "cards" not in (job.checkpoint or {}):
+        cached = get_cached(progress.db, cache_key) if cache_key and job.params.get("use_cache", True) else None
+        if cached is not None:
+            logger.info(f"♻️ Import job {job.id} reuses the cached output of an identical {job.kind} import")
+            job.checkpoint = {**cached, "cached": True}
+        else:
+            progress.stage(first_stage)
+            job.checkpoint = generate()
+        progress.commit()
+        if cache_key and cached is None and not job.checkpoint.get("partial"):
+            put_cached(progress.db, cache_key, job.kind, job.checkpoint)
+        progress.check_cancelled()
+    return job.checkpoint
+
+
+def _save_generated_cards(
+    db: Session,
+    job: ImportJob,
+    progress: JobProgress,
+    default_deck_name: str,
+    message: str,
+    source: str,
+    invalid_detail: str,
+) -> Dict[str, Any]:
+    """Screen and insert an Anki-text/PDF job's generated cards; committed by _finish together with the result"""
+    checkpoint = job.checkpoint
+    parsed_cards = [tuple(card) for card in checkpoint["cards"]]
+    duplicates = DuplicatePolicy(job.params.get("duplicates", DuplicatePolicy.skip.value))
+    progress.stage("saving", total=len(parsed_cards))
+
+    deck = _deck(db, job.user_id, job.params.get("deck_id"), default_deck_name)
+    # Skip or flag cards that duplicate the user's existing cards (or each other)
+    screen = screen_duplicates(db, job.user_id, [card[:2] for card in parsed_cards], duplicates)
+    created_ids = add_screened_cards(db, screen, parsed_cards, deck.id, job.user_id)
+
+    if not created_ids:
+        if screen.duplicate_count:
+            raise HTTPException(
+                status_code=400,
+                detail=f"All {screen.duplicate_count} cards {source} duplicate flashcards you already have. Import with duplicates=allow to add them anyway."
+            )
+        raise HTTPException(status_code=400, detail=invalid_detail)
+
+    job.created_card_ids = created_ids
+    job.progress_done = len(parsed_cards)
+    return {
+        "success": True,
+        "message": message.format(count=len(created_ids)) + screen.note(),
+        "deck_id": deck.id,
+        "deck_name": deck.name,
+        "created_count": len(created_ids),
+        "skipped_count": checkpoint["skipped_count"],
+        "cached": bool(checkpoint.get("cached")),
+        "duplicate_count": screen.duplicate_count,
+        "duplicates": screen.report(),
+    }
+
+
+def _run_anki_package(db: Session, job: ImportJob, progress: JobProgress) -> Dict[str, Any]:
+    params = job.params
+    progress.stage("extracting")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        collection_path = _require_upload(db, job)
+        if zipfile.is_zipfile(collection_path):
+            # Queued before uploads were stored as just the collection
+            collection_path = extract_collection(collection_path, temp_dir)
+        state = CollectionImport(**job.checkpoint) if job.checkpoint else CollectionImport()
+        progress.stage("importing", total=state.note_count or None, done=state.processed_count)
+
+        def on_batch(state: CollectionImport, created_ids: List[int]) -> None:
+            # The batch's cards, the resume point and the progress are committed together
+            job.checkpoint = asdict(state)
+            job.created_card_ids = (job.created_card_ids or []) + created_ids
+            progress.update(state.processed_count, state.note_count)
+            progress.check_cancelled()
+
+        return import_collection(
+            db, collection_path, job.user_id, params.get("deck_id"), params.get("deck_name") or "Anki Import",
+            DuplicatePolicy(params.get("duplicates", DuplicatePolicy.skip.value)), state=state, on_batch=on_batch,
+            remove_missing=bool(params.get("remove_missing")), import_scheduling=params.get("import_scheduling", True),
+        )
+
+
+def _run_anki_text(db: Session, job: ImportJob, progress: JobProgress) -> Dict[str, Any]:
+    def generate() -> Dict[str, Any]:
+        # Parsed locally; only rows the parser can't split into question and answer go to GPT
+        with open(_require_upload(db, job), encoding="utf-8-sig", newline="") as export:
+            try:
+                parsed = parse_export(export, settings.ANKI_IMPORT_MAX_CARDS, on_rows=progress.update)
+            except UnicodeDecodeError:
+                raise HTTPException(status_code=400, detail="Could not read this file as UTF-8 text. Please export it from Anki again.")
+        if parsed.llm_rows:
+            progress.check_cancelled()
+            progress.stage("generating", total=len(parsed.llm_rows))
+        llm_row_count = resolve_llm_rows(parsed)
+        return {
+            "cards": parsed.cards,
+            "skipped_count": parsed.skipped_count,
+            "row_count": parsed.row_count,
+            "llm_row_count": llm_row_count,
+            "partial": parsed.llm_failed_count > 0,  # Rows GPT wasn't (successfully) asked about; worth retrying later
+        }
+
+    digest = _content_digest(db, job)
+    checkpoint = _generate_once(
+        job, progress, generate, first_stage="parsing",
+        cache_key=digest and cache_key(job.kind, digest, settings.ANKI_IMPORT_MAX_CARDS, GPT_MODEL),
+    )
+    llm_row_count = checkpoint["llm_row_count"]
+    return _save_generated_cards(
+        db, job, progress, job.params.get("deck_name") or "Anki Import",
+        message="Imported {count} flashcards from Anki export" + (f", {llm_row_count} rows parsed with GPT" if llm_row_count else ""),
+        source="in this export",
+        invalid_detail=f"Could not import any flashcards. None of the {checkpoint['row_count']} rows in this file were valid cards. Please check your Anki export file.",
+    )
+
+
+def _run_pdf(db: Session, job: ImportJob, progress: JobProgress) -> Dict[str, Any]:
+    instructions = job.params.get("instructions", "")
+
+    digest = _content_digest(db, job)
+
+    def generate() -> Dict[str, Any]:
+        # Extracted pages are cached apart from the cards, so new instructions for the same PDF skip extraction
+        pages_key = digest and cache_key("pdf_pages", digest)
+        cached_pages = get_cached(db, pages_key) if pages_key and job.params.get("use_cache", True) else None
+        data = None
+        if cached_pages is None:
+            with open(_require_upload(db, job), "rb") as upload:
+                data = upload.read()
+
+        # Chunks an earlier attempt finished are kept in the checkpoint and not sent again
+        previous = job.checkpoint or {}
+        done = previous["chunks"] if previous.get("chunk_tokens") == settings.PDF_CHUNK_TOKENS else []
+        job.checkpoint = {"chunk_tokens": settings.PDF_CHUNK_TOKENS, "chunks": done}
+        chunk_count = 0
+
+        def pages() -> Iterator[str]:
+            if cached_pages is not None:
+                progress.update(len(cached_pages), len(cached_pages))
+                yield from cached_pages
+                return
+            extracted = []
+            try:
+                for text in iter_pdf_pages(data, on_page=lambda pages_done, page_count: progress.update(pages_done, page_count)):
+                    extracted.append(text)
+                    yield text
+            except HTTPException:
+                raise
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Error extracting text from PDF: {str(e)}")
+            if pages_key:
+                put_cached(db, pages_key, "pdf_pages", extracted)
+
+        def chunks() -> Iterator[str]:
+            # Generation starts while pages are still being extracted; the stage switches once they all are
+            nonlocal chunk_count
+            for chunk in chunk_pages(pages()):
+                chunk_count += 1
+                yield chunk
+            if not chunk_count:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Could not extract any text from the PDF. Please ensure the PDF contains readable text."
+                )
+            progress.check_cancelled()
+            finished = sum(cards is not None for cards in job.checkpoint["chunks"][:chunk_count])
+            progress.stage("generating", total=chunk_count, done=finished)
+
+        def on_chunk(index: int, cards: List[Any]) -> None:
+            chunk_cards = list(job.checkpoint["chunks"])
+            chunk_cards += [None] * (index + 1 - len(chunk_cards))
+            chunk_cards[index] = cards
+            job.checkpoint = {"chunk_tokens": settings.PDF_CHUNK_TOKENS, "chunks": chunk_cards}
+            if job.stage == "generating":
+                progress.update(sum(cards is not None for cards in chunk_cards[:chunk_count]))
+            else:
+                progress.commit()
+            progress.check_cancelled()
+
+        results = generate_pdf_chunk_cards(chunks(), instructions, done=done, on_chunk=on_chunk)
+        flashcards_data = [card for cards in results for card in cards]
+        parsed_cards, skipped_count = import_card_rows(flashcards_data)
+        merge_error = None
+        if chunk_count > 1 and parsed_cards:
+            # Reduce: merge cards repeated across chunks, then apply the instructions (e.g. a card count) to the whole set
+            progress.stage("merging")
+            parsed_cards = [parsed_cards[index] for index in distinct_card_indexes([card[:2] for card in parsed_cards])]
+            if instructions_select_cards(instructions):
+                try:
+                    parsed_cards = [parsed_cards[index] for index in merge_pdf_cards(parsed_cards, instructions)]
+                except Exception as e:
+                    # The locally merged cards are still a good import
+                    logger.warning(f"⚠️ Import job {job.id} could not apply the instructions to the merged cards: {e.detail if isinstance(e, HTTPException) else e}")
+                    merge_error = f"Could not apply your instructions to the document as a whole, so all {len(parsed_cards)} cards were kept."
+        return {
+            "cards": parsed_cards,
+            "skipped_count": skipped_count,
+            "parsed_count": len(flashcards_data),
+            "chunk_count": chunk_count,
+            "merge_error": merge_error,
+            "partial": merge_error is not None,  # Not cached, so the next identical import tries the merge again
+        }
+
+    checkpoint = _generate_once(
+        job, progress, generate, first_stage="extracting",
+        cache_key=digest and cache_key(job.kind, digest, instructions, settings.PDF_CHUNK_TOKENS, GPT_MODEL),
+    )
+    if checkpoint.get("merge_error"):
+        job.errors = (job.errors or []) + [checkpoint["merge_error"]]
+    return _save_generated_cards(
+        db, job, progress, job.params.get("deck_name") or "PDF Import",
+        message="Created {count} flashcards from PDF",
+        source="GPT created from this PDF",
+        invalid_detail=f"Could not create any flashcards. GPT parsed {checkpoint['parsed_count']} cards but none were valid. Please try adjusting your instructions.",
+    )
+
+
+def _run_text(db: Session, job: ImportJob, progress: JobProgress) -> Dict[str, Any]:
+    def generate() -> Dict[str, Any]:
+        cards_data = parse_pasted_text(job.params["raw_text"])
+        if len(cards_data) == 0:
+            raise HTTPException(status_code=400, detail="No flashcards could be extracted from the input text")
+        parsed_cards, errors = pasted_card_rows(cards_data)
+        return {"cards": parsed_cards, "errors": errors, "parsed_count": len(cards_data)}
+
+    digest = _content_digest(db, job)
+    checkpoint = _generate_once(job, progress, generate, cache_key=digest and cache_key(job.kind, digest, GPT_MODEL))
+    parsed_cards = [tuple(card) for card in checkpoint["cards"]]
+    errors = list(checkpoint["errors"])
+    deck_ids = job.params.get("deck_ids") or []
+    progress.stage("saving", total=len(parsed_cards))
+
+    from app.services.premium_service import check_flashcard_limit_in_deck
+    user = db.get(User, job.user_id)
+    # Free-tier room left in each selected deck, looked up once (None: unlimited)
+    remaining = {deck_id: check_flashcard_limit_in_deck(deck_id, user, db)["remaining"] for deck_id in deck_ids if deck_id}
+
+    # Skip or flag cards that duplicate the user's existing cards (or each other)
+    screen = screen_duplicates(
+        db, job.user_id, [(concept, definition) for _, concept, definition, _, _ in parsed_cards],
+        DuplicatePolicy(job.params.get("duplicates", DuplicatePolicy.skip.value))
+    )
+
+    rows = []
+    positions = []
+    for position, (idx, concept, definition, tags_str, source_url) in enumerate(parsed_cards):
+        if not screen.keep(position):
+            continue
+
+        # Create flashcard for each selected deck (or no deck if none selected)
+        for deck_id in deck_ids or [None]:
+            if deck_id and remaining[deck_id] is not None:
+                if remaining[deck_id] <= 0:
+                    errors.append(f"Card {idx + 1}: Deck limit reached")
+                    continue
+                remaining[deck_id] -= 1
+
+            rows.append({
+                "user_id": job.user_id,
+                "concept": concept,
+                "definition": definition,
+                "tags": tags_str if tags_str else None,
+                "deck_id": deck_id,
+                "source_url": source_url or None,
+            })
+            positions.append(position)
+
+    created_ids = insert_flashcards(db, rows, signatures=screen.signatures[positions] if screen.signatures is not None else None)
+    for position, card_id in zip(positions, created_ids):
+        screen.record_created(position, card_id)
+
+    job.created_card_ids = created_ids
+    job.errors = errors
+    job.progress_done = len(parsed_cards)
+    return {
+        "success": True,
+        "created_count": len(created_ids),
+        "total_parsed": checkpoint["parsed_count"],
+        "errors": errors if errors else None,
+        "duplicate_count": screen.duplicate_count,
+        "duplicates": screen.report(),
+        "flashcards": [{"id": card_id, "concept": row["concept"], "definition": row["definition"]} for card_id, row in zip(created_ids, rows)]
+    }
+
+
+RUNNERS: Dict[str, Callable[[Session, ImportJob, JobProgress], Dict[str, Any]]] = {
+    ImportKind.anki_package.value: _run_anki_package,
+    ImportKind.anki_text.value: _run_anki_text,
+    ImportKind.pdf.value: _run_pdf,
+    ImportKind.text.value: _run_text,
+}
+
+
+def run_job(db: Session, job: ImportJob) -> None:
+    """Run a claimed job to a finished status; never raises for import errors"""
+    progress = JobProgress(db, job)
+    try:
+        progress.check_cancelled()
+        result = RUNNERS[job.kind](db, job, progress)
+    except ImportCancelled:
+        db.rollback()
+        logger.info(f"🛑 Import job {job.id} cancelled")
+        _finish(db, job, ImportJobStatus.cancelled)
+    except HTTPException as e:
+        db.rollback()
+        _finish(db, job, ImportJobStatus.failed, error=str(e.detail))
+    except sqlite3.Error as e:
+        db.rollback()
+        _finish(db, job, ImportJobStatus.failed, error=f"Error reading Anki database: {str(e)}")
+    except Exception as e:
+        db.rollback()
+        logger.exception(f"❌ Import job {job.id} failed: {e}")
+        _finish(db, job, ImportJobStatus.failed, error=f"Error importing: {str(e)}")
+    else:
+        _finish(db, job, ImportJobStatus.succeeded, result=result)
+        logger.info(f"📥 Import job {job.id} created {len(job.created_card_ids or [])} flashcards")
+
+
+@celery_app.task(acks_late=True, reject_on_worker_lost=True)
+def run_import_job_task(job_id: int):
+    """Celery task: run an import job. Safe to deliver more than once (see module docstring)."""
+    db = SessionLocal()
+    try:
+        job = _claim(db, job_id)
+        if job is None:
+            return {"job_id": job_id, "skipped": True}
+        run_job(db, job)
+        return {"job_id": job_id, "status": job.status}
+    finally:
+        db.close()
+
+
+def prune_import_jobs(db: Session, now: Optional[datetime] = None) -> dict:
+    """Drop uploads kept for retries after IMPORT_UPLOAD_RETENTION_HOURS, and finished jobs after IMPORT_JOB_RETENTION_DAYS"""
+    now = now or _now()
+    finished = ImportJob.status.in_([status.value for status in FINISHED_STATUSES])
+    expired_uploads = db.query(ImportJob).filter(
+        finished,
+        ImportJob.upload_path.isnot(None),
+        ImportJob.finished_at < now - timedelta(hours=settings.IMPORT_UPLOAD_RETENTION_HOURS),
+    ).all()
+    for job in expired_uploads:
+        _delete_upload(db, job)
+    expired = and_(finished, ImportJob.finished_at < now - timedelta(days=settings.IMPORT_JOB_RETENTION_DAYS))
+    # Covered by ON DELETE CASCADE where foreign keys are enforced
+    db.query(ImportUploadChunk).filter(
+        ImportUploadChunk.job_id.in_(select(ImportJob.id).where(expired))
+    ).delete(synchronize_session=False)
+    deleted = db.query(ImportJob).filter(expired).delete(synchronize_session=False)
+    db.commit()
+    return {"uploads_removed": len(expired_uploads), "jobs_deleted": deleted}
+
+
+@celery_app.task
+def prune_import_jobs_task():
+    """Celery task: clean up old import uploads and jobs"""
+    db = SessionLocal()
+    try:
+        result = prune_import_jobs(db)
+        logger.info(f"🧹 Pruned {result['uploads_removed']} import uploads and {result['jobs_deleted']} import jobs")
+        return result
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Import job pruning failed: {e}")
+        raise
+    finally:
+        db.close()
@@ -0,0 +1,329 @@
+"""
+Knowledge map layout service
+
+Positions a user's flashcards in 2D so that cards from the same deck and cards with
+similar tags end up close together. Everything runs on NumPy arrays:
+- repulsion uses a multi-level grid (Barnes-Hut style): far-away cells act through
+  their centroid, so each iteration is O(n log n) instead of all-pairs
+- same-deck attraction is a linear spring to the deck centroid, which is exactly the
+  sum of springs between all same-deck pairs, computed through a sparse membership
+  (card -> deck) index instead of an n^2 loop
+- tag attraction uses a sparse edge list of each card's most similar neighbours
+- the step size cools every iteration and the loop stops early once it converges
+"""
+import math
+import random
+from typing import List, Optional, Sequence, Tuple, Union
+import numpy as np
+from app.services.tag_index import TagIndex
+
+# Force constants (layout units: initial positions are uniform in [-1, 1]).
+# Repulsion is split evenly over all cards so the layout's scale doesn't depend on n.
+REPULSION = 0.05
+DECK_SPRING = 0.25
+DECK_SEPARATION = 0.05
+TAG_SPRING = 0.15
+GRAVITY = 0.02
+DAMPING = 0.8
+
+MAX_ITERATIONS = 100
+INITIAL_STEP = 0.1
+# Per-card adaptive step: a card whose force flips direction is oscillating, so its step
+# is cut; otherwise it grows back towards INITIAL_STEP. The layout stops early once the
+# mean movement per iteration drops below CONVERGENCE_TOLERANCE x the layout's extent.
+STEP_SHRINK = 0.5
+STEP_GROWTH = 1.2
+CONVERGENCE_TOLERANCE = 2e-3
+SOFTENING = 1e-3
+# Above this many near-field pairs per card the grid is refined (up to MAX_GRID_LEVEL)
+NEAR_FIELD_PAIR_LIMIT = 256
+MAX_GRID_LEVEL = 11
+
+# Number of most-similar neighbours per card used as tag springs
+TAG_NEIGHBORS = 10
+
+
+def tag_similarity_edges(
+    tag_lists: Sequence[Sequence[str]],
+    top_k: int = TAG_NEIGHBORS
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Jaccard similarity between cards' tag sets, keeping each card's top_k most similar
+    other cards (similarity > 0). Returns (source, target, similarity) arrays of
+    positional card indices, ordered by source then descending similarity.
+    Only pairs sharing a tag are scored (via the inverted tag index).
+    """
+    return TagIndex(tag_lists).similarity_edges(top_k)
+
+
+def _grid_levels(n: int) -> int:
+    """Finest grid level so that cells hold a handful of cards on average"""
+    return int(min(MAX_GRID_LEVEL, max(2, math.ceil(math.log(max(n, 2), 4)))))
+
+
+# Children of a parent's 3x3 neighbourhood form a 6x6 block of cells
+_BLOCK_OFFSETS = np.array([(dx, dy) for dx in range(6) for dy in range(6)])
+_NEIGHBOR_OFFSETS = np.array([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)])
+_OWN_CELL = (_NEIGHBOR_OFFSETS == 0).all(axis=1)
+# _SEPARATED[px, py] marks block cells more than one cell away from a cell with parity (px, py)
+_SEPARATED = np.array([
+    [np.abs(_BLOCK_OFFSETS - 2 - np.array([px, py])).max(axis=1) > 1 for py in (0, 1)]
+    for px in (0, 1)
+])
+
+
+def _cell_stats(pos: np.ndarray, cells: np.ndarray, size: int):
+    flat = cells[:, 0] * size + cells[:, 1]
+    count = np.bincount(flat, minlength=size * size).astype(np.float64)
+    sum_x = np.bincount(flat, weights=pos[:, 0], minlength=size * size)
+    sum_y = np.bincount(flat, weights=pos[:, 1], minlength=size * size)
+    safe = np.maximum(count, 1.0)
+    return count, sum_x / safe, sum_y / safe
+
+
+def _accumulate(pos, force, cand_x, cand_y, valid, count, cen_x, cen_y, size, strength, own=None):
+    """Add inverse-square repulsion from candidate cells' centroids to force"""
+    valid = valid & (cand_x >= 0) & (cand_x < size) & (cand_y >= 0) & (cand_y < size)
+    flat = np.where(valid, cand_x * size + cand_y, 0)
+    mass = np.where(valid, count[flat], 0.0)
+    if own is not None:
+        own = own & valid
+        mass = np.where(own, mass - 1.0, mass)
+
+    # Most candidate cells are empty once cards cluster; only evaluate occupied ones
+    owner, slot = np.nonzero(mass > 0)
+    flat = flat[owner, slot]
+    mass = mass[owner, slot]
+    cx = cen_x[flat]
+    cy = cen_y[flat]
+    if own is not None:
+        # Remove the card itself from its own cell's centroid
+        is_own = own[owner, slot]
+        cx = np.where(is_own, (cx * (mass + 1.0) - pos[owner, 0]) / mass, cx)
+        cy = np.where(is_own, (cy * (mass + 1.0) - pos[owner, 1]) / mass, cy)
+    dx = pos[owner, 0] - cx
+    dy = pos[owner, 1] - cy
+    dist2 = dx * dx + dy * dy + SOFTENING * SOFTENING
+    magnitude = strength * mass / (dist2 * np.sqrt(dist2))
+    force[:, 0] += np.bincount(owner, weights=magnitude * dx, minlength=len(pos))
+    force[:, 1] += np.bincount(owner, weights=magnitude * dy, minlength=len(pos))
+
+
+def _near_field(pos: np.ndarray, cells: np.ndarray, size: int, strength: float) -> Optional[np.ndarray]:
+    """
+    Exact repulsion from every card in the 3x3 neighbourhood of each card's cell.
+    Returns None if the neighbourhoods are too crowded to enumerate cheaply.
+    """
+    n = len(pos)
+    flat = cells[:, 0] * size + cells[:, 1]
+    order = np.argsort(flat, kind="stable")
+    count = np.bincount(flat, minlength=size * size)
+    start = np.concatenate(([0], np.cumsum(count)[:-1]))
+
+    near_x = cells[:, 0, None] + _NEIGHBOR_OFFSETS[:, 0]
+    near_y = cells[:, 1, None] + _NEIGHBOR_OFFSETS[:, 1]
+    valid = (near_x >= 0) & (near_x < size) & (near_y >= 0) & (near_y < size)
+    near = np.where(valid, near_x * size + near_y, 0)
+    lengths = np.where(valid, count[near], 0).ravel()
+    total = int(lengths.sum())
+    if total > NEAR_FIELD_PAIR_LIMIT * n:
+        return None
+
+    owners = np.repeat(np.repeat(np.arange(n), len(_NEIGHBOR_OFFSETS)), lengths)
+    within = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    members = order[np.repeat(start[near].ravel(), lengths) + within]
+    keep = owners != members
+    owners, members = owners[keep], members[keep]
+
+    dx = pos[owners, 0] - pos[members, 0]
+    dy = pos[owners, 1] - pos[members, 1]
+    dist2 = dx * dx + dy * dy + SOFTENING * SOFTENING
+    magnitude = strength / (dist2 * np.sqrt(dist2))
+    force = np.empty_like(pos)
+    force[:, 0] = np.bincount(owners, weights=magnitude * dx, minlength=n)
+    force[:, 1] = np.bincount(owners, weights=magnitude * dy, minlength=n)
+    return force
+
+
+def _repulsion(pos: np.ndarray, strength: float, levels: int) -> np.ndarray:
+    """
+    Approximate all-pairs inverse-square repulsion with a multi-level grid.
+    At each level a card interacts with the cells that are children of its parent's
+    neighbourhood but not its own neighbours (the Barnes-Hut "well separated" cells)
+    through their centroids; at the finest level its own neighbourhood is summed exactly.
+    Crowded neighbourhoods refine the grid further before falling back to centroids.
+    """
+    force = np.zeros_like(pos)
+    low = pos.min(axis=0)
+    span = max(float((pos.max(axis=0) - low).max()), 1e-9)
+    unit = (pos - low) / span
+
+    level = 2
+    while True:
+        size = 1 << level
+        cells = np.minimum((unit * size).astype(np.int64), size - 1)
+        cell_x, cell_y = cells[:, 0], cells[:, 1]
+        count, cen_x, cen_y = _cell_stats(pos, cells, size)
+
+        # Which cells of the 6x6 block are well separated depends only on cell parity
+        origin_x = (cell_x // 2 * 2 - 2)[:, None]
+        origin_y = (cell_y // 2 * 2 - 2)[:, None]
+        separated = _SEPARATED[cell_x % 2, cell_y % 2]
+        _accumulate(
+            pos, force, origin_x + _BLOCK_OFFSETS[:, 0], origin_y + _BLOCK_OFFSETS[:, 1],
+            separated, count, cen_x, cen_y, size, strength
+        )
+
+        if level >= levels:
+            near = _near_field(pos, cells, size, strength)
+            if near is not None:
+                return force + near
+            if level >= MAX_GRID_LEVEL:
+                # Still crowded at the finest grid: use centroids of the neighbouring cells
+                _accumulate(
+                    pos, force,
+                    cell_x[:, None] + _NEIGHBOR_OFFSETS[:, 0], cell_y[:, None] + _NEIGHBOR_OFFSETS[:, 1],
+                    np.ones((len(pos), len(_NEIGHBOR_OFFSETS)), dtype=bool),
+                    count, cen_x, cen_y, size, strength, own=_OWN_CELL[None, :]
+                )
+                return force
+        level += 1
+
+
+def _deck_forces(pos: np.ndarray, deck_index: np.ndarray, n_decks: int, deck_attraction: float) -> np.ndarray:
+    """
+    Linear spring from each deck card to its deck centroid (equal to springs between all
+    same-deck pairs), plus repulsion between deck centroids so that overlapping decks
+    separate. Cards without a deck feel neither.
+    """
+    force = np.zeros_like(pos)
+    in_deck = deck_index >= 0
+    if not in_deck.any():
+        return force
+    members = deck_index[in_deck]
+    count = np.bincount(members, minlength=n_decks)
+    safe = np.maximum(count, 1)
+    cen_x = np.bincount(members, weights=pos[in_deck, 0], minlength=n_decks) / safe
+    cen_y = np.bincount(members, weights=pos[in_deck, 1], minlength=n_decks) / safe
+
+    dx = cen_x[:, None] - cen_x[None, :]
+    dy = cen_y[:, None] - cen_y[None, :]
+    dist2 = dx * dx + dy * dy + SOFTENING * SOFTENING
+    magnitude = DECK_SEPARATION * (count / len(pos))[None, :] / (dist2 * np.sqrt(dist2))
+    np.fill_diagonal(magnitude, 0.0)
+    push_x = (magnitude * dx).sum(axis=1)
+    push_y = (magnitude * dy).sum(axis=1)
+
+    spring = deck_attraction * DECK_SPRING
+    force[in_deck, 0] = spring * (cen_x[members] - pos[in_deck, 0]) + push_x[members]
+    force[in_deck, 1] = spring * (cen_y[members] - pos[in_deck, 1]) + push_y[members]
+    return force
+
+
+def _edge_force(pos: np.ndarray, source: np.ndarray, target: np.ndarray, weight: np.ndarray) -> np.ndarray:
+    """Linear springs along weighted edges, accumulated on both endpoints"""
+    n = len(pos)
+    force = np.zeros_like(pos)
+    if len(source) == 0:
+        return force
+    for axis in (0, 1):
+        pull = weight * (pos[target, axis] - pos[source, axis])
+        force[:, axis] = (
+            np.bincount(source, weights=pull, minlength=n)
+            - np.bincount(target, weights=pull, minlength=n)
+        )
+    return force
+
+
+def layout_positions(
+    deck_ids: Sequence[Optional[int]],
+    edges: Tuple[np.ndarray, np.ndarray, np.ndarray],
+    deck_attraction: float = 1.0,
+    tag_attraction: float = 0.5,
+    seed: int = 42,
+    initial_positions: Optional[np.ndarray] = None,
+    max_iterations: int = MAX_ITERATIONS,
+    initial_step: Union[float, np.ndarray] = INITIAL_STEP,
+) -> np.ndarray:
+    """
+    Run the force-directed layout and return an (n, 2) array of raw positions.
+    Cards are seeded uniformly in [-1, 1] from `seed` (same draw order as before),
+    unless initial_positions is given.
+    """
+    n = len(deck_ids)
+    if n == 0:
+        return np.zeros((0, 2))
+
+    if initial_positions is None:
+        rng = random.Random(seed)
+        pos = np.array([(rng.uniform(-1, 1), rng.uniform(-1, 1)) for _ in range(n)], dtype=np.float64)
+    else:
+        pos = np.array(initial_positions, dtype=np.float64)
+
+    deck_lookup = {}
+    deck_index = np.array(
+        [deck_lookup.setdefault(d, len(deck_lookup)) if d else -1 for d in deck_ids],
+        dtype=np.int64
+    )
+
+    # Tag springs: one undirected edge per similar pair, normalised by neighbour count
+    source, target, sim = edges
+    if len(source):
+        low, high = np.minimum(source, target), np.maximum(source, target)
+        _, first = np.unique(low * n + high, return_index=True)
+        source, target, sim = low[first], high[first], sim[first]
+    tag_weight = tag_attraction * TAG_SPRING * sim / TAG_NEIGHBORS
+
+    levels = _grid_levels(n)
+    # initial_step may be per card, e.g. to let new cards move freely while settled ones barely shift
+    max_step = np.broadcast_to(np.asarray(initial_step, dtype=np.float64), (n,)).copy()
+    step = max_step.copy()
+    previous = np.zeros_like(pos)
+    for _ in range(max_iterations):
+        force = _repulsion(pos, REPULSION / n, levels)
+        force += _deck_forces(pos, deck_index, len(deck_lookup), deck_attraction)
+        force += _edge_force(pos, source, target, tag_weight)
+        force -= GRAVITY * pos
+
+        displacement = DAMPING * force
+        oscillating = (displacement * previous).sum(axis=1) < 0
+        step = np.where(oscillating, step * STEP_SHRINK, np.minimum(step * STEP_GROWTH, max_step))
+        length = np.sqrt((displacement ** 2).sum(axis=1))
+        displacement *= np.minimum(1.0, step / np.maximum(length, 1e-12))[:, None]
+        pos += displacement
+        previous = displacement
+
+        extent = float((pos.max(axis=0) - pos.min(axis=0)).max())
+        if float(np.minimum(length, step).mean()) < CONVERGENCE_TOLERANCE * extent:
+            break
+
+    return pos
+
+
+def normalize_positions(pos: np.ndarray) -> np.ndarray:
+    """Scale raw positions into the [-2, 2] square used by the frontend"""
+    if len(pos) == 0:
+        return pos
+    low = pos.min(axis=0)
+    extent = pos.max(axis=0) - low
+    extent[extent == 0] = 1
+    return (pos - low) / extent * 4 - 2
+
+
+def top_links(
+    ids: Sequence[int],
+    edges: Tuple[np.ndarray, np.ndarray, np.ndarray],
+    per_card: int = 5,
+    threshold: float = 0.05
+) -> List[dict]:
+    """Links for each card's `per_card` most similar neighbours above threshold"""
+    source, target, sim = edges
+    links = []
+    emitted = {}
+    for s, t, value in zip(source.tolist(), target.tolist(), sim.tolist()):
+        if emitted.get(s, 0) >= per_card:
+            continue
+        emitted[s] = emitted.get(s, 0) + 1
+        if value > threshold:
+            links.append({'source': ids[s], 'target': ids[t], 'value': value})
+    return links
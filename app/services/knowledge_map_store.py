@@ -0,0 +1,285 @@
+"""
+Persisted knowledge map layouts
+
+Each user's layout (raw positions, tag-similarity links and the deck/tags each card was
+placed with) lives in knowledge_map_layouts, so viewing the map only reads positions and
+joins current accuracies. Layouts are updated by a background task whenever cards are
+added, deleted, moved between decks or retagged (see app/models/events.py), at most
+one queued update per user at a time:
+- small changes run a short local relaxation seeded from the stored positions; changed
+  cards start near their deck and move freely while settled cards barely shift
+- large changes, new attraction settings or a forced rebuild re-run the full layout
+"""
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from app.database import SessionLocal, engine
+from app.models import Flashcard, KnowledgeMapLayout
+from app.services.knowledge_map import (
+    INITIAL_STEP, tag_similarity_edges, layout_positions, top_links
+)
+from app.services.tag_store import card_tag_lists
+from app.utils.celery_app import celery_app
+from app.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DECK_ATTRACTION = 1.0
+DEFAULT_TAG_ATTRACTION = 0.5
+LAYOUT_SEED = 42
+
+# Local relaxation after small changes
+LOCAL_RELAXATION_ITERATIONS = 20
+SETTLED_STEP = 0.005  # Step cap for cards that keep their stored position
+PLACEMENT_JITTER = 0.05  # New cards start within this fraction of the layout extent of their deck centroid
+
+
+def card_signature(deck_id: Optional[int], tags: List[str]) -> str:
+    """What a card's placement depends on: its deck and its (normalized) tags"""
+    return f"{deck_id or ''}|{','.join(tags)}"
+
+
+def get_layout(db: Session, user_id: int) -> Optional[KnowledgeMapLayout]:
+    return db.query(KnowledgeMapLayout).filter(KnowledgeMapLayout.user_id == user_id).first()
+
+
+def layout_matches(layout: KnowledgeMapLayout, deck_attraction: float, tag_attraction: float) -> bool:
+    return layout.deck_attraction == deck_attraction and layout.tag_attraction == tag_attraction
+
+
+def seed_positions(
+    stored: Dict[str, List[float]],
+    card_ids: Sequence[int],
+    deck_ids: Sequence[Optional[int]],
+    placed: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Starting positions for a layout from stored ones.
+    Cards without a usable stored position (new, or not in `placed`) start near the centroid
+    of their deck's placed cards (or of all placed cards), with a small per-card jitter.
+    Returns (positions, placed mask).
+    """
+    n = len(card_ids)
+    pos = np.zeros((n, 2))
+    if placed is None:
+        placed = np.array([str(card_id) in stored for card_id in card_ids], dtype=bool)
+    for index in np.flatnonzero(placed):
+        pos[index] = stored[str(card_ids[index])]
+
+    if placed.all():
+        return pos, placed
+
+    if placed.any():
+        centre = pos[placed].mean(axis=0)
+        extent = float((pos[placed].max(axis=0) - pos[placed].min(axis=0)).max()) or 1.0
+    else:
+        centre, extent = np.zeros(2), 1.0
+
+    deck_sums: Dict[Optional[int], np.ndarray] = {}
+    deck_counts: Dict[Optional[int], int] = {}
+    for index in np.flatnonzero(placed):
+        deck_sums[deck_ids[index]] = deck_sums.get(deck_ids[index], np.zeros(2)) + pos[index]
+        deck_counts[deck_ids[index]] = deck_counts.get(deck_ids[index], 0) + 1
+
+    for index in np.flatnonzero(~placed):
+        deck_id = deck_ids[index]
+        anchor = deck_sums[deck_id] / deck_counts[deck_id] if deck_id in deck_counts else centre
+        # Jitter seeded by card id so provisional and relaxed placements agree between runs
+        rng = random.Random(card_ids[index])
+        pos[index] = anchor + PLACEMENT_JITTER * extent * np.array([rng.uniform(-1, 1), rng.uniform(-1, 1)])
+    return pos, placed
+
+
+def update_layout(
+    db: Session,
+    user_id: int,
+    deck_attraction: Optional[float] = None,
+    tag_attraction: Optional[float] = None,
+    force: bool = False,
+) -> KnowledgeMapLayout:
+    """
+    Bring a user's stored layout up to date with their cards and commit it.
+    Passing attraction values different from the stored ones (or force=True) rebuilds from scratch.
+    """
+    layout = get_layout(db, user_id)
+    if layout is None:
+        layout = KnowledgeMapLayout(user_id=user_id, positions={}, signatures={}, links=[], version=0)
+        db.add(layout)
+
+    deck_attraction = deck_attraction if deck_attraction is not None else (layout.deck_attraction or DEFAULT_DECK_ATTRACTION)
+    tag_attraction = tag_attraction if tag_attraction is not None else (layout.tag_attraction or DEFAULT_TAG_ATTRACTION)
+    settings_changed = layout.deck_attraction != deck_attraction or layout.tag_attraction != tag_attraction
+
+    cards = db.query(Flashcard.id, Flashcard.deck_id).filter(
+        Flashcard.user_id == user_id
+    ).order_by(Flashcard.id).all()
+    card_ids = [card.id for card in cards]
+    deck_ids = [card.deck_id for card in cards]
+    card_tags = card_tag_lists(db, user_id)
+    tag_lists = [card_tags.get(card.id, []) for card in cards]
+    signatures = {str(card.id): card_signature(card.deck_id, tags) for card, tags in zip(cards, tag_lists)}
+
+    stored_positions = layout.positions or {}
+    stored_signatures = layout.signatures or {}
+    unchanged = np.array([
+        key in stored_positions and stored_signatures.get(key) == signature
+        for key, signature in signatures.items()
+    ], dtype=bool)
+    n_changed = int((~unchanged).sum())
+    removed = len(set(stored_positions) - set(signatures))
+
+    incremental = (
+        not force
+        and not settings_changed
+        and unchanged.any()
+        and n_changed <= settings.KNOWLEDGE_MAP_INCREMENTAL_MAX_FRACTION * len(cards)
+    )
+
+    if not cards:
+        positions = np.zeros((0, 2))
+        edges = None
+    elif incremental and n_changed == 0 and removed == 0:
+        # Nothing that affects placement changed (e.g. a re-queued update)
+        positions, edges = None, None
+    else:
+        edges = tag_similarity_edges(tag_lists)
+        if incremental:
+            initial, _ = seed_positions(stored_positions, card_ids, deck_ids, placed=unchanged)
+            positions = layout_positions(
+                deck_ids, edges,
+                deck_attraction=deck_attraction,
+                tag_attraction=tag_attraction,
+                initial_positions=initial,
+                max_iterations=LOCAL_RELAXATION_ITERATIONS,
+                initial_step=np.where(unchanged, SETTLED_STEP, INITIAL_STEP),
+            )
+        else:
+            positions = layout_positions(
+                deck_ids, edges,
+                deck_attraction=deck_attraction,
+                tag_attraction=tag_attraction,
+                seed=LAYOUT_SEED,
+            )
+
+    if positions is not None:
+        layout.positions = {
+            str(card_id): [round(float(x), 6), round(float(y), 6)]
+            for card_id, (x, y) in zip(card_ids, positions.tolist())
+        }
+        layout.signatures = signatures
+        layout.links = top_links(card_ids, edges, per_card=5, threshold=0.05) if edges is not None else []
+        layout.version = (layout.version or 0) + 1
+        layout.built_at = datetime.now(timezone.utc)
+        mode = "incremental" if incremental else "full"
+        logger.info(f"🗺️ Knowledge map {mode} layout for user {user_id}: {len(cards)} cards, {n_changed} changed, {removed} removed")
+
+    layout.deck_attraction = deck_attraction
+    layout.tag_attraction = tag_attraction
+    layout.is_stale = False
+    db.commit()
+    db.refresh(layout)
+    return layout
+
+
+@celery_app.task
+def update_knowledge_map_layout_task(user_id: int, force: bool = False):
+    """
+    Celery task: update a user's stored knowledge map layout if it is stale.
+    Users who have never opened the map have no layout yet; it is built on first view.
+    """
+    table = KnowledgeMapLayout.__table__
+    db = SessionLocal()
+    try:
+        # Take the pending changes and release the queued marker in one statement: changes
+        # committed from here on mark the layout stale again and queue a fresh update
+        claimed = db.execute(
+            table.update()
+            .where(table.c.user_id == user_id, table.c.is_stale.is_(True))
+            .values(is_stale=False, update_queued_at=None)
+        ).rowcount
+        db.execute(table.update().where(table.c.user_id == user_id).values(update_queued_at=None))
+        db.commit()
+        if not claimed and not force:
+            return {"user_id": user_id, "skipped": True}
+        # Loaded (and held) once: a stale flag set by a concurrent commit is not overwritten
+        layout = get_layout(db, user_id)
+        if layout is None:
+            return {"user_id": user_id, "skipped": True}
+        layout = update_layout(db, user_id, force=force)
+        return {"user_id": user_id, "version": layout.version, "cards": len(layout.positions or {})}
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Knowledge map layout update failed for user {user_id}: {e}")
+        # Leave it stale so the next change (or map view) retries
+        db.execute(table.update().where(table.c.user_id == user_id).values(is_stale=True))
+        db.commit()
+        raise
+    finally:
+        db.close()
+
+
+def background_updates_enabled() -> bool:
+    """
+    Whether layout changes are handled by the background task. Not with eager Celery
+    (development), where the task would run inside the committing request; stale layouts
+    are then updated when the map is viewed.
+    """
+    return settings.KNOWLEDGE_MAP_BACKGROUND_UPDATES and not celery_app.conf.task_always_eager
+
+
+def _claim_layout_updates(user_ids: Iterable[int], force: bool) -> List[int]:
+    """
+    Mark users' layouts as having an update queued and return those that did not already
+    have one (a marker older than the lease counts as lost). Users without a layout get none.
+    """
+    ids = sorted(set(user_ids))
+    if not ids:
+        return []
+    now = datetime.now(timezone.utc)
+    table = KnowledgeMapLayout.__table__
+    conditions = [
+        table.c.user_id.in_(ids),
+        or_(
+            table.c.update_queued_at.is_(None),
+            table.c.update_queued_at < now - timedelta(seconds=settings.KNOWLEDGE_MAP_UPDATE_LEASE_SECONDS),
+        ),
+    ]
+    if not force:
+        conditions.append(table.c.is_stale.is_(True))
+    with engine.begin() as conn:
+        return list(conn.execute(
+            table.update().where(*conditions).values(update_queued_at=now).returning(table.c.user_id)
+        ).scalars())
+
+
+def _release_layout_update(user_id: int) -> None:
+    table = KnowledgeMapLayout.__table__
+    with engine.begin() as conn:
+        conn.execute(table.update().where(table.c.user_id == user_id).values(update_queued_at=None))
+
+
+def schedule_layout_updates(user_ids: Iterable[int], force: bool = False) -> None:
+    """
+    Queue layout updates, at most one per user at a time and each delayed by
+    KNOWLEDGE_MAP_UPDATE_DELAY_SECONDS so a burst of commits (e.g. a batched import) is
+    handled by a single update. Failures to enqueue only leave the layout stale.
+    """
+    if not background_updates_enabled():
+        return
+    try:
+        claimed = _claim_layout_updates(user_ids, force)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not queue knowledge map updates: {e}")
+        return
+    for user_id in claimed:
+        try:
+            update_knowledge_map_layout_task.apply_async(
+                (user_id, force), countdown=settings.KNOWLEDGE_MAP_UPDATE_DELAY_SECONDS
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Could not queue knowledge map update for user {user_id}: {e}")
+            _release_layout_update(user_id)
@@ -0,0 +1,49 @@
+"""
+Latest review per flashcard as a single joinable query
+
+Listing cards with their current schedule used to run one "latest review" query per
+card. These helpers attach the latest review's next_review_date to a flashcard query:
+- PostgreSQL: a LATERAL subquery (ORDER BY created_at DESC LIMIT 1 per card, served by
+  the card_reviews.flashcard_id index)
+- other databases (SQLite in development): a grouped MAX(created_at) joined back to
+  card_reviews
+"""
+from typing import Tuple
+from sqlalchemy import and_, func, select, true
+from sqlalchemy.orm import Query, Session
+from app.models import CardReview, Flashcard
+
+
+def with_latest_review(query: Query, db: Session, user_id: int) -> Tuple[Query, object]:
+    """
+    Outer-join each flashcard in `query` to its latest review (by created_at).
+    Returns (query, next_review_date column); the column is NULL for never-reviewed cards.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        latest = (
+            select(CardReview.next_review_date)
+            .where(CardReview.flashcard_id == Flashcard.id, CardReview.user_id == user_id)
+            .order_by(CardReview.created_at.desc(), CardReview.id.desc())
+            .limit(1)
+            .lateral("latest_review")
+        )
+        return query.outerjoin(latest, true()), latest.c.next_review_date
+
+    latest_at = (
+        select(CardReview.flashcard_id, func.max(CardReview.created_at).label("latest_at"))
+        .where(CardReview.user_id == user_id)
+        .group_by(CardReview.flashcard_id)
+        .subquery("latest_at")
+    )
+    latest = (
+        # MAX() only breaks ties between reviews sharing the latest created_at
+        select(CardReview.flashcard_id, func.max(CardReview.next_review_date).label("next_review_date"))
+        .join(latest_at, and_(
+            CardReview.flashcard_id == latest_at.c.flashcard_id,
+            CardReview.created_at == latest_at.c.latest_at
+        ))
+        .where(CardReview.user_id == user_id)
+        .group_by(CardReview.flashcard_id)
+        .subquery("latest_review")
+    )
+    return query.outerjoin(latest, latest.c.flashcard_id == Flashcard.id), latest.c.next_review_date
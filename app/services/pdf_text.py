@@ -0,0 +1,195 @@
+"""
+PDF text extraction for imports
+
+The upload is read into memory once and parsed by pypdf from a BytesIO. iter_pdf_pages
+yields the pages in order as they are extracted, so chunking and card generation start
+before the whole document is read. Documents over PDF_INLINE_PAGES pages are cut into
+ranges of PDF_PAGES_PER_TASK pages, extracted by one module-level ProcessPoolExecutor of
+up to PDF_EXTRACT_PROCESSES workers shared by all imports in the process (pypdf is pure
+Python, so threads would not run in parallel). The document goes to the pool as a temporary
+file, and each pool worker keeps the reader of the last document it was sent.
+Pool workers are spawned rather than forked, since the calling process runs other threads.
+A daemonic process (a Celery prefork child) can't start the pool and extracts in-process.
+Page text is normalized (app/utils/text_cleaning.py) where it is extracted.
+
+Long documents are generated from in chunks (see chunk_pages): each chunk holds whole pages
+up to PDF_CHUNK_TOKENS, and a page too long on its own is split at paragraph, then line,
+boundaries.
+"""
+import io
+import logging
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterable, Iterator, List, Optional, Union
+from fastapi import HTTPException
+from app.utils.config import settings
+from app.utils.text_cleaning import normalize_text
+
+logger = logging.getLogger(__name__)
+
+PDF_INLINE_PAGES = 16  # Smaller documents are extracted in the calling process
+PDF_PAGES_PER_TASK = 8
+CHARS_PER_TOKEN = 4  # Rough GPT tokenizer ratio for English text
+PAGE_SEPARATOR = "\n\n"
+SECTION_BREAKS = (re.compile(r"\n\s*\n"), re.compile(r"\n"), re.compile(r"(?<=[.!?])\s+"))
+
+_worker_reader = None  # (path, PdfReader) of the last document a pool worker extracted from
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _pdf_reader(data: Union[bytes, str]):
+    try:
+        import pypdf
+    except ImportError:
+        raise HTTPException(
+            status_code=500,
+            detail="PDF processing library not installed. Please contact support."
+        )
+    return pypdf.PdfReader(io.BytesIO(data) if isinstance(data, bytes) else data)
+
+
+def _extract_range(path: str, start: int, end: int) -> List[str]:
+    global _worker_reader
+    if _worker_reader is None or _worker_reader[0] != path:
+        _worker_reader = (path, _pdf_reader(path))
+    reader = _worker_reader[1]
+    return [normalize_text(reader.pages[number].extract_text() or "") for number in range(start, end)]
+
+
+def _get_executor(processes: int) -> ProcessPoolExecutor:
+    """The process's extraction pool, started on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def _discard_executor(executor: ProcessPoolExecutor) -> None:
+    """Drop a broken pool so the next document starts a new one"""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _pooled_ranges(data: bytes, page_count: int, processes: int) -> Iterator[List[str]]:
+    """Text of each range of pages, in order, extracted by the process pool"""
+    ranges = [(start, min(start + PDF_PAGES_PER_TASK, page_count)) for start in range(0, page_count, PDF_PAGES_PER_TASK)]
+    # A unique name, so no pool worker mistakes it for an earlier document it still has open
+    with tempfile.NamedTemporaryFile(prefix=f"{uuid.uuid4().hex}-", suffix=".pdf") as document:
+        document.write(data)
+        document.flush()
+        executor = _get_executor(processes)
+        futures = [executor.submit(_extract_range, document.name, start, end) for start, end in ranges]
+        try:
+            for future in futures:
+                yield future.result()
+        except BrokenProcessPool:
+            _discard_executor(executor)
+            raise
+        finally:
+            for future in futures:
+                future.cancel()
+            # Ranges already running must finish before the file is removed
+            wait(futures)
+
+
+def check_pdf_size(size: int) -> None:
+    if size > settings.PDF_IMPORT_MAX_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"This PDF is larger than {settings.PDF_IMPORT_MAX_BYTES // (1024 * 1024)} MB. Please split it into smaller files."
+        )
+
+
+def iter_pdf_pages(data: bytes, on_page: Optional[Callable[[int, int], None]] = None) -> Iterator[str]:
+    """
+    Text of each page of the PDF in `data` (pages without text left out), in page order;
+    on_page(pages_done, page_count) is called after each page. Raises 413/400 for documents
+    over PDF_IMPORT_MAX_BYTES / PDF_IMPORT_MAX_PAGES before extracting anything.
+    """
+    check_pdf_size(len(data))
+    reader = _pdf_reader(data)
+    page_count = len(reader.pages)
+    if page_count > settings.PDF_IMPORT_MAX_PAGES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"This PDF has {page_count} pages, more than the {settings.PDF_IMPORT_MAX_PAGES} pages one import can take. Please split it into smaller files."
+        )
+
+    processes = min(settings.PDF_EXTRACT_PROCESSES, os.cpu_count() or 1)
+    pooled = page_count > PDF_INLINE_PAGES and processes > 1
+    if pooled and multiprocessing.current_process().daemon:
+        # Daemonic processes (a Celery prefork child) can't start a pool
+        logger.info(f"📄 Extracting {page_count} PDF pages in-process: this worker can't start child processes")
+        pooled = False
+
+    if not pooled:
+        ranges: Iterable[List[str]] = ([normalize_text(page.extract_text() or "")] for page in reader.pages)
+    else:
+        ranges = _pooled_ranges(data, page_count, processes)
+
+    pages_done = 0
+    for texts in ranges:
+        for text in texts:
+            pages_done += 1
+            if text.strip():
+                yield text
+            if on_page:
+                on_page(pages_done, page_count)
+
+
+def _split_section(text: str, max_chars: int, level: int = 0) -> List[str]:
+    """Pieces of `text` no longer than max_chars, cut at the coarsest boundary that works"""
+    if len(text) <= max_chars:
+        return [text]
+    if level == len(SECTION_BREAKS):
+        return [text[start:start + max_chars] for start in range(0, len(text), max_chars)]
+
+    pieces: List[str] = []
+    current = ""
+    position = 0
+    for match in list(SECTION_BREAKS[level].finditer(text)) + [None]:
+        end = match.start() if match else len(text)
+        part = text[position:end]
+        position = match.end() if match else len(text)
+        if len(part) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.extend(_split_section(part, max_chars, level + 1))
+        elif current and len(current) + 1 + len(part) > max_chars:
+            pieces.append(current)
+            current = part
+        else:
+            current = f"{current}\n{part}" if current else part
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_pages(pages: Iterable[str], max_tokens: Optional[int] = None) -> Iterator[str]:
+    """Consecutive pages joined into chunks of at most max_tokens (estimated), yielded as each fills up"""
+    max_chars = (max_tokens or settings.PDF_CHUNK_TOKENS) * CHARS_PER_TOKEN
+    current: List[str] = []
+    size = 0
+    for page in pages:
+        if not page.strip():
+            continue
+        for section in _split_section(page.strip(), max_chars):
+            if current and size + len(PAGE_SEPARATOR) + len(section) > max_chars:
+                yield PAGE_SEPARATOR.join(current)
+                current, size = [], 0
+            size += len(section) + (len(PAGE_SEPARATOR) if current else 0)
+            current.append(section)
+    if current:
+        yield PAGE_SEPARATOR.join(current)
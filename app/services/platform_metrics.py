@@ -0,0 +1,153 @@
+"""
+Platform metrics snapshots for the admin panel
+
+The site-wide counters (users, premium, SMS opt-in, active, signups, content and review
+volume) scan whole tables, so instead of running them on every admin request a Celery
+beat task captures them into platform_metrics_snapshots every few minutes. The admin
+dashboard reads the latest snapshot; the first snapshot of each hour is kept as history
+for trends.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import User, Flashcard, CardReview, Deck, ConversationState, PlatformMetricsSnapshot
+from app.utils.celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+METRIC_FIELDS = (
+    "total_users", "premium_users", "sms_opt_in_users", "active_users",
+    "users_with_sms_conversation", "new_users_7d", "new_users_30d",
+    "total_flashcards", "total_reviews", "total_decks",
+    "reviews_last_7d", "reviews_last_30d",
+)
+
+# Non-hourly snapshots are only needed for "latest"; hourly ones are the trend history
+INTRA_HOUR_RETENTION = timedelta(days=1)
+HOURLY_RETENTION = timedelta(days=90)
+# A snapshot older than this is recomputed on read (e.g. the beat task is not running)
+MAX_SNAPSHOT_AGE = timedelta(minutes=30)
+
+
+def compute_platform_metrics(db: Session, now: Optional[datetime] = None) -> Dict[str, int]:
+    """Site-wide counters, one conditional-aggregate query per table"""
+    now = now or datetime.now(timezone.utc)
+    last_7_days = now - timedelta(days=7)
+    last_30_days = now - timedelta(days=30)
+
+    user_stats = db.query(
+        func.count(User.id),
+        func.sum(case((User.is_premium == True, 1), else_=0)),
+        func.sum(case((User.sms_opt_in == True, 1), else_=0)),
+        func.sum(case((User.created_at >= last_7_days, 1), else_=0)),
+        func.sum(case((User.created_at >= last_30_days, 1), else_=0)),
+    ).one()
+    review_stats = db.query(
+        func.count(CardReview.id),
+        func.sum(case((CardReview.review_date >= last_7_days, 1), else_=0)),
+        func.sum(case((CardReview.review_date >= last_30_days, 1), else_=0)),
+        func.count(func.distinct(case((CardReview.review_date >= last_30_days, CardReview.user_id)))),
+    ).filter(CardReview.is_imported == False).one()
+
+    return {
+        "total_users": int(user_stats[0] or 0),
+        "premium_users": int(user_stats[1] or 0),
+        "sms_opt_in_users": int(user_stats[2] or 0),
+        "active_users": int(review_stats[3] or 0),
+        "users_with_sms_conversation": db.query(func.count(func.distinct(ConversationState.user_id))).scalar() or 0,
+        "new_users_7d": int(user_stats[3] or 0),
+        "new_users_30d": int(user_stats[4] or 0),
+        "total_flashcards": db.query(func.count(Flashcard.id)).scalar() or 0,
+        "total_reviews": int(review_stats[0] or 0),
+        "total_decks": db.query(func.count(Deck.id)).scalar() or 0,
+        "reviews_last_7d": int(review_stats[1] or 0),
+        "reviews_last_30d": int(review_stats[2] or 0),
+    }
+
+
+def snapshot_to_dict(snapshot: PlatformMetricsSnapshot) -> Dict[str, Any]:
+    data = {field: getattr(snapshot, field) for field in METRIC_FIELDS}
+    data["captured_at"] = snapshot.captured_at.isoformat() if snapshot.captured_at else None
+    return data
+
+
+def capture_snapshot(db: Session, now: Optional[datetime] = None) -> PlatformMetricsSnapshot:
+    """Compute and store a snapshot, flag it hourly if it's the hour's first, prune old rows"""
+    now = now or datetime.now(timezone.utc)
+    hour_start = now.replace(minute=0, second=0, microsecond=0)
+
+    has_hourly = db.query(PlatformMetricsSnapshot.id).filter(
+        PlatformMetricsSnapshot.is_hourly == True,
+        PlatformMetricsSnapshot.captured_at >= hour_start
+    ).first() is not None
+
+    snapshot = PlatformMetricsSnapshot(
+        captured_at=now,
+        is_hourly=not has_hourly,
+        **compute_platform_metrics(db, now)
+    )
+    db.add(snapshot)
+
+    db.query(PlatformMetricsSnapshot).filter(
+        PlatformMetricsSnapshot.is_hourly == False,
+        PlatformMetricsSnapshot.captured_at < now - INTRA_HOUR_RETENTION
+    ).delete(synchronize_session=False)
+    db.query(PlatformMetricsSnapshot).filter(
+        PlatformMetricsSnapshot.captured_at < now - HOURLY_RETENTION
+    ).delete(synchronize_session=False)
+
+    db.commit()
+    db.refresh(snapshot)
+    return snapshot
+
+
+def latest_snapshot(db: Session) -> Optional[PlatformMetricsSnapshot]:
+    return db.query(PlatformMetricsSnapshot).order_by(
+        PlatformMetricsSnapshot.captured_at.desc(), PlatformMetricsSnapshot.id.desc()
+    ).first()
+
+
+def get_platform_metrics(db: Session, fresh: bool = False) -> Dict[str, Any]:
+    """
+    Latest metrics for the admin dashboard.
+    Reads the newest snapshot; recomputes (and stores) one if fresh=True or the newest is missing/too old.
+    """
+    snapshot = None if fresh else latest_snapshot(db)
+    if snapshot is not None and snapshot.captured_at is not None:
+        captured_at = snapshot.captured_at
+        if captured_at.tzinfo is None:
+            captured_at = captured_at.replace(tzinfo=timezone.utc)
+        if datetime.now(timezone.utc) - captured_at > MAX_SNAPSHOT_AGE:
+            snapshot = None
+    if snapshot is None:
+        snapshot = capture_snapshot(db)
+    return snapshot_to_dict(snapshot)
+
+
+def hourly_history(db: Session, hours: int = 168) -> List[Dict[str, Any]]:
+    """Hourly snapshots for the last `hours` hours, oldest first"""
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    snapshots = db.query(PlatformMetricsSnapshot).filter(
+        PlatformMetricsSnapshot.is_hourly == True,
+        PlatformMetricsSnapshot.captured_at >= since
+    ).order_by(PlatformMetricsSnapshot.captured_at.asc()).all()
+    return [snapshot_to_dict(snapshot) for snapshot in snapshots]
+
+
+@celery_app.task
+def capture_platform_metrics_task():
+    """Celery task: capture a platform metrics snapshot"""
+    db = SessionLocal()
+    try:
+        snapshot = capture_snapshot(db)
+        logger.info(f"📊 Platform metrics snapshot captured ({snapshot.total_users} users, {snapshot.total_reviews} reviews)")
+        return snapshot_to_dict(snapshot)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Platform metrics snapshot failed: {e}")
+        raise
+    finally:
+        db.close()
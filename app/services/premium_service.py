@@ -2,9 +2,9 @@
 Premium service for checking limits and premium status
 """
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy import and_
 from datetime import datetime, timezone, timedelta
-from app.models import User, CardReview, Deck, Flashcard
+from app.models import User, CardReview, Deck
 
 
 def get_sms_reviews_this_month(user_id: int, db: Session) -> int:
@@ -34,9 +34,10 @@ def get_deck_count(user_id: int, db: Session) -> int:
 
 def get_flashcard_count_in_deck(deck_id: int, db: Session) -> int:
     """
-    Get the number of flashcards in a deck
+    Get the number of flashcards in a deck (from the denormalized Deck.card_count)
     """
-    return db.query(Flashcard).filter(Flashcard.deck_id == deck_id).count()
+    # Read from the database: a Deck already in the session may hold a stale count
+    return db.query(Deck.card_count).filter(Deck.id == deck_id).scalar() or 0
 
 
 def check_sms_limit(user: User, db: Session) -> dict:
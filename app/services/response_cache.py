@@ -0,0 +1,150 @@
+"""
+Per-user response cache for read-heavy analytics endpoints (dashboard, mastery)
+
+Entries are keyed on (user_id, endpoint, params, user.data_version). The version is
+bumped whenever the user's reviews, flashcards or decks change (see app/models/events.py),
+so stale entries are never served and never need explicit deletion - they simply age
+out of the LRU (or expire in Redis).
+
+The same key doubles as the ETag, which lets a client revalidation be answered with a
+304 before anything is recomputed.
+"""
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from app.models import User
+from app.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Thread-safe in-process LRU of serialized response bodies"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_local_cache = LRUCache(settings.RESPONSE_CACHE_MAX_ENTRIES)
+_redis_client = None
+_redis_unavailable = False
+
+
+def _get_redis():
+    """Lazily connect to Redis; disable the Redis tier for this process if it is unreachable"""
+    global _redis_client, _redis_unavailable
+    if not settings.RESPONSE_CACHE_USE_REDIS or _redis_unavailable:
+        return None
+    if _redis_client is None:
+        try:
+            import redis
+            _redis_client = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=0.5)
+            _redis_client.ping()
+        except Exception as e:
+            logger.warning(f"Response cache: Redis unavailable, using in-process cache only ({e})")
+            _redis_client = None
+            _redis_unavailable = True
+    return _redis_client
+
+
+def make_cache_key(user: User, endpoint: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """Build the cache key / ETag value for a user's view of an endpoint"""
+    raw = json.dumps(
+        [user.id, endpoint, params or {}, user.data_version or 0],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def _etag_matches(request: Request, key: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Compare weakly: proxies may strip or add the W/ prefix
+    return "*" in candidates or any(tag.removeprefix("W/").strip('"') == key for tag in candidates)
+
+
+def _lookup(key: str) -> Optional[bytes]:
+    body = _local_cache.get(key)
+    if body is not None:
+        return body
+    client = _get_redis()
+    if client is not None:
+        try:
+            body = client.get(f"response_cache:{key}")
+        except Exception as e:
+            logger.warning(f"Response cache: Redis get failed ({e})")
+            body = None
+        if body is not None:
+            _local_cache.set(key, body)
+    return body
+
+
+def _store(key: str, body: bytes) -> None:
+    _local_cache.set(key, body)
+    client = _get_redis()
+    if client is not None:
+        try:
+            client.set(f"response_cache:{key}", body, ex=settings.RESPONSE_CACHE_TTL_SECONDS)
+        except Exception as e:
+            logger.warning(f"Response cache: Redis set failed ({e})")
+
+
+def cached_user_response(
+    request: Request,
+    user: User,
+    endpoint: str,
+    compute: Callable[[], Any],
+    params: Optional[Dict[str, Any]] = None,
+) -> Response:
+    """
+    Serve `compute()` for this user through the response cache.
+    Returns 304 if the client's If-None-Match matches the current version, the cached body
+    if present, and otherwise computes, stores and returns the fresh result.
+    """
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return Response(
+            content=json.dumps(jsonable_encoder(compute())),
+            media_type="application/json",
+        )
+
+    key = make_cache_key(user, endpoint, params)
+    etag = f'W/"{key}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if _etag_matches(request, key):
+        return Response(status_code=304, headers=headers)
+
+    body = _lookup(key)
+    if body is None:
+        body = json.dumps(jsonable_encoder(compute())).encode("utf-8")
+        _store(key, body)
+
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -241,6 +241,7 @@ def get_user_flashcard_stats(user_id: int, db: Session = None):
         week_ago = datetime.utcnow() - timedelta(days=7)
         recent_reviews = db.query(CardReview).filter(
             CardReview.user_id == user_id,
+            CardReview.is_imported == False,
             CardReview.review_date >= week_ago
         ).count()
         
@@ -0,0 +1,136 @@
+"""
+Full-text search over flashcard concept and definition
+
+- PostgreSQL: a weighted tsvector (concept A, definition B) with a GIN expression index
+  (ix_flashcards_search, see app/models/flashcard.py). Queries use the same expression,
+  so matching is an index lookup and ts_rank_cd is only computed for matching cards.
+- SQLite (development): an external-content FTS5 table, flashcards_fts, ranked with bm25.
+
+Both indexes are maintained by the database itself (expression index / triggers), so
+they stay in sync on every create, update, delete and import, including bulk inserts.
+
+Every query term is prefix-matched ("photo synth" finds "photosynthesis"), all terms must
+match, and results come best first in keyset pages on (rank, id). Words are indexed
+unstemmed (Postgres 'simple' config, FTS5 unicode61): a stemmer would also stem the typed
+prefix ("enzy" -> "enzi") and miss "enzyme"; prefix matching covers inflections instead.
+"""
+import logging
+import re
+from typing import List, Optional, Tuple
+from sqlalchemy import Float, cast, column, func, literal_column, select, table, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, joinedload
+from app.models import Deck, Flashcard
+from app.models.flashcard import search_document
+from app.services.tag_store import has_tag
+from app.utils.pagination import encode_cursor, keyset_filter, keyset_order
+
+logger = logging.getLogger(__name__)
+
+MAX_QUERY_TERMS = 12
+
+FTS_TABLE = "flashcards_fts"
+_SQLITE_FTS_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        concept, definition, content='flashcards', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON flashcards BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, concept, definition) VALUES (new.id, new.concept, new.definition);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON flashcards BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, concept, definition) VALUES ('delete', old.id, old.concept, old.definition);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF concept, definition ON flashcards BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, concept, definition) VALUES ('delete', old.id, old.concept, old.definition);
+        INSERT INTO {FTS_TABLE}(rowid, concept, definition) VALUES (new.id, new.concept, new.definition);
+    END""",
+]
+
+
+def ensure_search_index(engine: Engine) -> None:
+    """
+    Create the SQLite FTS5 table and its triggers if missing (indexing existing cards).
+    PostgreSQL's GIN index is created with the table, or by /admin/migrate-search-public.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+        ).first()
+        for ddl in _SQLITE_FTS_DDL:
+            conn.execute(text(ddl))
+        if not exists:
+            conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+            logger.info("🔎 Built SQLite full-text index for flashcards")
+
+
+def query_terms(q: str) -> List[str]:
+    """Word tokens of a user query (punctuation and search operators dropped)"""
+    return re.findall(r"\w+", q.lower())[:MAX_QUERY_TERMS]
+
+
+def _ranked_matches(db: Session, user_id: int, terms: List[str]):
+    """SELECT id, rank for the user's cards matching every term (prefix match)"""
+    if db.get_bind().dialect.name == "postgresql":
+        ts_query = func.to_tsquery(literal_column("'simple'::regconfig"), " & ".join(f"{term}:*" for term in terms))
+        document = search_document(Flashcard.concept, Flashcard.definition)
+        # ts_rank_cd is float4; as double precision it round-trips through the cursor's float
+        # exactly, so the keyset tie comparison doesn't skip cards at a page boundary
+        return select(
+            Flashcard.id.label("id"),
+            cast(func.ts_rank_cd(document, ts_query), Float(53)).label("rank"),
+        ).where(Flashcard.user_id == user_id, document.op("@@")(ts_query))
+
+    fts = table(FTS_TABLE, column("rowid"))
+    fts_column = literal_column(FTS_TABLE)
+    # bm25 is lower-is-better; negate so both dialects rank descending. Concept hits weigh double.
+    return select(
+        Flashcard.id.label("id"),
+        (-func.bm25(fts_column, 2.0, 1.0)).label("rank"),
+    ).join(fts, fts.c.rowid == Flashcard.id).where(
+        Flashcard.user_id == user_id,
+        fts_column.op("MATCH")(" ".join(f'"{term}"*' for term in terms)),
+    )
+
+
+def search_flashcards(
+    db: Session,
+    user_id: int,
+    q: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    deck_id: Optional[int] = None,
+    tags: Optional[List[str]] = None,
+) -> Tuple[List[Tuple[Flashcard, float]], Optional[str]]:
+    """
+    One page of the user's cards matching `q`, best first, optionally within a deck and
+    carrying every tag in `tags`. Returns ([(card, rank)], next_cursor).
+    """
+    terms = query_terms(q)
+    if not terms:
+        return [], None
+
+    matches = _ranked_matches(db, user_id, terms)
+    if deck_id is not None:
+        matches = matches.where(Flashcard.deck_id == deck_id)
+    for tag in tags or []:
+        matches = matches.where(has_tag(user_id, tag))
+    # Rank is computed once in the subquery; the keyset compares against that column
+    ranked = matches.subquery("ranked")
+
+    query = db.query(Flashcard, ranked.c.rank).join(ranked, ranked.c.id == Flashcard.id).options(
+        joinedload(Flashcard.deck).load_only(Deck.name)
+    )
+    condition = keyset_filter(ranked.c.rank, ranked.c.id, cursor, descending=True)
+    if condition is not None:
+        query = query.filter(condition)
+    rows = query.order_by(*keyset_order(ranked.c.rank, ranked.c.id, descending=True)).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        card, rank = rows[-1]
+        next_cursor = encode_cursor(rank, card.id)
+    return [(card, float(rank)) for card, rank in rows], next_cursor
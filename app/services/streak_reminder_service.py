@@ -33,6 +33,7 @@ def check_streak_at_risk(user: User, db: Session) -> Dict[str, Any]:
     reviews_today = db.query(CardReview).filter(
         and_(
             CardReview.user_id == user.id,
+            CardReview.is_imported == False,
             CardReview.review_date >= start_of_today,
             CardReview.review_date <= end_of_today
         )
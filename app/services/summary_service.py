@@ -49,6 +49,7 @@ def get_daily_review_summary(user_id: int, db: Session, date: datetime.date = No
     reviews = db.query(CardReview).filter(
         and_(
             CardReview.user_id == user_id,
+            CardReview.is_imported == False,
             CardReview.review_date >= start_of_day,
             CardReview.review_date <= end_of_day
         )
@@ -102,7 +103,7 @@ def calculate_streak_days(user_id: int, db: Session) -> int:
     today = datetime.now(timezone.utc).date()
     
     # If user has never reviewed anything, streak should be 0
-    total_reviews = db.query(CardReview).filter(CardReview.user_id == user_id).count()
+    total_reviews = db.query(CardReview).filter(CardReview.user_id == user_id, CardReview.is_imported == False).count()
     if total_reviews == 0:
         return 0
     
@@ -117,6 +118,7 @@ def calculate_streak_days(user_id: int, db: Session) -> int:
         reviews = db.query(CardReview).filter(
             and_(
                 CardReview.user_id == user_id,
+                CardReview.is_imported == False,
                 CardReview.review_date >= start_of_day,
                 CardReview.review_date <= end_of_day
             )
@@ -146,7 +148,7 @@ def calculate_potential_streak(user_id: int, db: Session) -> tuple[int, bool]:
     today = datetime.now(timezone.utc).date()
     
     # If user has never reviewed anything, potential streak should be 0 (no streak yet)
-    total_reviews = db.query(CardReview).filter(CardReview.user_id == user_id).count()
+    total_reviews = db.query(CardReview).filter(CardReview.user_id == user_id, CardReview.is_imported == False).count()
     if total_reviews == 0:
         return (0, False)
     start_of_today = datetime.combine(today, datetime.min.time(), tzinfo=timezone.utc)
@@ -156,6 +158,7 @@ def calculate_potential_streak(user_id: int, db: Session) -> tuple[int, bool]:
     reviews_today = db.query(CardReview).filter(
         and_(
             CardReview.user_id == user_id,
+            CardReview.is_imported == False,
             CardReview.review_date >= start_of_today,
             CardReview.review_date <= end_of_today
         )
@@ -180,6 +183,7 @@ def calculate_potential_streak(user_id: int, db: Session) -> tuple[int, bool]:
         reviews = db.query(CardReview).filter(
             and_(
                 CardReview.user_id == user_id,
+                CardReview.is_imported == False,
                 CardReview.review_date >= start_of_day,
                 CardReview.review_date <= end_of_day
             )
@@ -0,0 +1,136 @@
+"""
+Delta sync of a user's flashcards, decks, deck SMS settings and reviews
+
+GET /sync returns everything changed after the client's cursor so a client can keep a
+local cache instead of refetching whole collections:
+- upserts come from range scans on (user_id, updated_at) for flashcards, decks and deck
+  SMS settings, and (user_id, created_at) for reviews, which are never edited; a deck's
+  updated_at moves with its name or image, not its counters, so a delta's deck counts can
+  be older than its flashcards and reviews
+- deletions come from sync_tombstones (written by the session hooks in app/models/events.py)
+
+The cursor is the server time when the response was built. Rows are stamped with their
+transaction's start time and may commit a little later, so each delta re-reads
+SYNC_OVERLAP_SECONDS before the cursor; upserts and tombstones are idempotent, so clients
+simply re-apply them. Tombstones are pruned after SYNC_TOMBSTONE_RETENTION_DAYS; a cursor
+older than that (or no cursor) gets a full snapshot with "full": true, and the client
+should replace its cache.
+"""
+import base64
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import CardReview, Deck, Flashcard, SyncTombstone, UserDeckSmsSettings
+from app.utils.celery_app import celery_app
+from app.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Response key for each entity type, in both the upsert and the "deleted" sections
+SYNC_COLLECTIONS = {
+    "flashcard": "flashcards",
+    "deck": "decks",
+    "deck_sms_settings": "deck_sms_settings",
+    "review": "reviews",
+}
+
+
+def encode_sync_cursor(at: datetime) -> str:
+    raw = json.dumps({"t": at.isoformat()}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_sync_cursor(cursor: str) -> datetime:
+    """Decode a cursor from encode_sync_cursor; raises 400 if it is malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        at = datetime.fromisoformat(json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))["t"])
+        return at if at.tzinfo else at.replace(tzinfo=timezone.utc)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid sync cursor")
+
+
+def changes_since(db: Session, user_id: int, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Everything in the user's account changed after `cursor` (or a full snapshot).
+    Returns the new cursor, whether this is a full snapshot, the changed rows per
+    collection (ORM objects), each changed deck's SMS flag and the deleted ids per collection.
+    """
+    now = datetime.now(timezone.utc)
+    since = decode_sync_cursor(cursor) if cursor else None
+    if since is not None and since < now - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS):
+        since = None  # Tombstones for that window may already be pruned
+    full = since is None
+    if not full:
+        since -= timedelta(seconds=settings.SYNC_OVERLAP_SECONDS)
+
+    def changed(model, column):
+        query = db.query(model).filter(model.user_id == user_id)
+        if not full:
+            query = query.filter(column >= since)
+        return query.order_by(column, model.id).all()
+
+    cards = changed(Flashcard, Flashcard.updated_at)
+    decks = changed(Deck, Deck.updated_at)
+    sms_settings = changed(UserDeckSmsSettings, UserDeckSmsSettings.updated_at)
+    reviews = changed(CardReview, CardReview.created_at)
+
+    # Decks carry their SMS flag; look it up for the changed decks only
+    enabled = dict(
+        db.query(UserDeckSmsSettings.deck_id, UserDeckSmsSettings.sms_enabled).filter(
+            UserDeckSmsSettings.user_id == user_id,
+            UserDeckSmsSettings.deck_id.in_([deck.id for deck in decks])
+        ).all()
+    ) if decks else {}
+
+    deleted = {collection: [] for collection in SYNC_COLLECTIONS.values()}
+    if not full:
+        # An entity can have several tombstones (overlap window, retried deletes): one row each
+        tombstones = db.query(SyncTombstone.entity_type, SyncTombstone.entity_id).filter(
+            SyncTombstone.user_id == user_id,
+            SyncTombstone.entity_type.in_(list(SYNC_COLLECTIONS)),
+            SyncTombstone.deleted_at >= since
+        ).distinct().order_by(SyncTombstone.entity_type, SyncTombstone.entity_id)
+        for entity_type, entity_id in tombstones:
+            deleted[SYNC_COLLECTIONS[entity_type]].append(entity_id)
+
+    return {
+        "cursor": encode_sync_cursor(now),
+        "full": full,
+        "flashcards": cards,
+        "decks": decks,
+        "deck_sms_enabled": enabled,
+        "deck_sms_settings": sms_settings,
+        "reviews": reviews,
+        "deleted": deleted,
+    }
+
+
+def prune_tombstones(db: Session, now: Optional[datetime] = None) -> int:
+    """Delete tombstones older than the retention window; returns how many were removed"""
+    now = now or datetime.now(timezone.utc)
+    removed = db.query(SyncTombstone).filter(
+        SyncTombstone.deleted_at < now - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    ).delete(synchronize_session=False)
+    db.commit()
+    return removed
+
+
+@celery_app.task
+def prune_sync_tombstones_task():
+    """Celery task: drop sync tombstones past the retention window"""
+    db = SessionLocal()
+    try:
+        removed = prune_tombstones(db)
+        logger.info(f"🧹 Pruned {removed} sync tombstones")
+        return removed
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Sync tombstone pruning failed: {e}")
+        raise
+    finally:
+        db.close()
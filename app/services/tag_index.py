@@ -0,0 +1,133 @@
+"""
+Inverted tag index over a user's flashcards
+
+Maps each tag to the (positional) indices of the cards carrying it, so card similarity
+(the knowledge map's edges) scores only pairs that share at least one tag (most pairs
+share none). Tag filters and per-tag aggregates run in SQL over the normalized tag tables
+(app/services/tag_store.py).
+"""
+from typing import Dict, Iterable, Sequence, Tuple
+import numpy as np
+
+# Similarity is scored in blocks of source cards covering at most this many (source, target) cells
+CELL_BLOCK = 2_000_000
+# A block whose candidate pairs fill more than 1/DENSE_PAIR_RATIO of its cells (very common
+# tags) is scored as a dense matrix instead of by sorting its pairs
+DENSE_PAIR_RATIO = 8
+
+
+class TagIndex:
+    """Inverted index from tag to card positions, plus the card -> tags incidence"""
+
+    def __init__(self, tag_lists: Sequence[Iterable[str]]):
+        self.n_cards = len(tag_lists)
+        self.tag_ids: Dict[str, int] = {}
+        card_rows, tag_cols = [], []
+        for i, tags in enumerate(tag_lists):
+            for tag in dict.fromkeys(tags):  # de-duplicate, keep order
+                card_rows.append(i)
+                tag_cols.append(self.tag_ids.setdefault(tag, len(self.tag_ids)))
+        self.tags = list(self.tag_ids)
+
+        card_rows = np.array(card_rows, dtype=np.int64)
+        tag_cols = np.array(tag_cols, dtype=np.int64)
+        n_tags = len(self.tags)
+
+        # card -> tags (CSR; rows are already in card order)
+        self.card_tag_ptr = np.zeros(self.n_cards + 1, dtype=np.int64)
+        np.cumsum(np.bincount(card_rows, minlength=self.n_cards), out=self.card_tag_ptr[1:])
+        self.card_tags = tag_cols
+        self.card_sizes = np.diff(self.card_tag_ptr)
+
+        # tag -> cards (CSR posting lists, each sorted by card position)
+        order = np.lexsort((card_rows, tag_cols))
+        self.posting_ptr = np.zeros(n_tags + 1, dtype=np.int64)
+        np.cumsum(np.bincount(tag_cols, minlength=n_tags), out=self.posting_ptr[1:])
+        self.postings = card_rows[order]
+        self.posting_sizes = np.diff(self.posting_ptr)
+
+    def _expand(self, cards: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """All (card, other card sharing a tag) candidate pairs for the given cards, with repeats"""
+        starts, stops = self.card_tag_ptr[cards], self.card_tag_ptr[cards + 1]
+        entry_counts = stops - starts
+        entries = np.repeat(starts - np.cumsum(entry_counts) + entry_counts, entry_counts) + np.arange(entry_counts.sum())
+        entry_cards = np.repeat(cards, entry_counts)
+        entry_tags = self.card_tags[entries]
+
+        lengths = self.posting_sizes[entry_tags]
+        first = self.posting_ptr[entry_tags]
+        offsets = np.repeat(first - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        return np.repeat(entry_cards, lengths), self.postings[offsets]
+
+    def similarity_edges(self, top_k: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Jaccard similarity between cards that share at least one tag, keeping each card's
+        top_k most similar other cards. Returns (source, target, similarity) arrays ordered
+        by source, then descending similarity.
+        """
+        empty = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0))
+        n = self.n_cards
+        if n < 2 or not self.tags:
+            return empty
+
+        rows_per_block = max(1, CELL_BLOCK // n)
+        sources, targets, sims = [], [], []
+        for start in range(0, n, rows_per_block):
+            cards = np.arange(start, min(start + rows_per_block, n))
+            cards = cards[self.card_sizes[cards] > 0]
+            if not len(cards):
+                continue
+            source, target = self._expand(cards)
+            # Each shared tag yields the pair once, so repeat counts are intersection sizes
+            keys = (source - start) * n + target
+            cells = (int(cards[-1]) - start + 1) * n
+            if len(keys) * DENSE_PAIR_RATIO >= cells:
+                block = self._dense_top_k(start, cells // n, np.bincount(keys, minlength=cells), top_k)
+            else:
+                block = self._sparse_top_k(start, *np.unique(keys, return_counts=True), top_k)
+            sources.append(block[0])
+            targets.append(block[1])
+            sims.append(block[2])
+
+        if not sources:
+            return empty
+        return np.concatenate(sources), np.concatenate(targets), np.concatenate(sims)
+
+    def _sparse_top_k(self, start: int, pair_keys: np.ndarray, shared: np.ndarray, top_k: int):
+        """Top_k per source from the distinct candidate pairs (few pairs share a tag)"""
+        n = self.n_cards
+        source, target = pair_keys // n + start, pair_keys % n
+        keep = source != target
+        source, target, shared = source[keep], target[keep], shared[keep]
+        sim = shared / (self.card_sizes[source] + self.card_sizes[target] - shared)
+
+        # Pairs arrive sorted by (source, target); a stable sort on source + (1 - sim) / 2
+        # orders each source's run by descending similarity, ties by target
+        order = np.argsort(source + (1.0 - sim) / 2, kind="stable")
+        source, target, sim = source[order], target[order], sim[order]
+        run_start = np.flatnonzero(np.r_[True, source[1:] != source[:-1]])
+        rank = np.arange(len(source)) - np.repeat(run_start, np.diff(np.r_[run_start, len(source)]))
+        top = rank < top_k
+        return source[top], target[top], sim[top].astype(np.float64)
+
+    def _dense_top_k(self, start: int, rows: int, counts: np.ndarray, top_k: int):
+        """Top_k per source from a rows x n intersection matrix (very common tags)"""
+        n = self.n_cards
+        sizes = self.card_sizes.astype(np.float32)
+        sim = counts.reshape(rows, n).astype(np.float32)
+        union = sizes[start:start + rows, None] + sizes[None, :]
+        union -= sim
+        np.maximum(union, 1.0, out=union)  # pairs sharing nothing have sim 0 either way
+        sim /= union
+        sim[np.arange(rows), np.arange(start, start + rows)] = 0.0
+
+        k = min(top_k, n - 1)
+        top = np.argpartition(-sim, k - 1, axis=1)[:, :k]
+        top_sim = np.take_along_axis(sim, top, axis=1)
+        order = np.argsort(-top_sim, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_sim = np.take_along_axis(top_sim, order, axis=1)
+
+        keep = top_sim > 0
+        block_sources = np.broadcast_to(np.arange(start, start + rows)[:, None], top.shape)
+        return block_sources[keep], top[keep], top_sim[keep].astype(np.float64)
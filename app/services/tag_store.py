@@ -0,0 +1,98 @@
+"""
+Queries over the normalized tag tables
+
+tags / flashcard_tags are kept in step with Flashcard.tags by the session hooks in
+app/models/events.py. Tag filters, tag deletion and tag analytics go through these joins
+(indexed, exact matches) instead of LIKE scans over the comma-separated strings.
+"""
+import logging
+from typing import Dict, List, Optional
+from sqlalchemy import Float, and_, case, cast, exists, func, select
+from sqlalchemy.orm import Session
+from app.models import CardReview, Flashcard, FlashcardTag, Tag
+from app.models.events import sync_flashcard_tags
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = 2000
+
+
+def normalize_tag(tag: str) -> str:
+    return tag.strip().lower()
+
+
+def parse_tags(tags: Optional[str]) -> List[str]:
+    """Normalized, de-duplicated tags of a flashcard's comma-separated tags string"""
+    return list(dict.fromkeys(normalize_tag(tag) for tag in tags.split(',') if tag.strip())) if tags else []
+
+
+def has_tag(user_id: int, tag: str):
+    """SQL condition: the flashcard carries `tag` (exact, case-insensitive)"""
+    return exists().where(
+        FlashcardTag.flashcard_id == Flashcard.id,
+        FlashcardTag.tag_id == Tag.id,
+        Tag.user_id == user_id,
+        Tag.name == normalize_tag(tag),
+    )
+
+
+def get_tag(db: Session, user_id: int, tag: str) -> Optional[Tag]:
+    return db.query(Tag).filter(Tag.user_id == user_id, Tag.name == normalize_tag(tag)).first()
+
+
+def card_tag_lists(db: Session, user_id: int) -> Dict[int, List[str]]:
+    """flashcard id -> its tags in card order, for every tagged card of the user"""
+    rows = db.query(FlashcardTag.flashcard_id, Tag.name).join(
+        Tag, Tag.id == FlashcardTag.tag_id
+    ).filter(Tag.user_id == user_id).order_by(FlashcardTag.flashcard_id, FlashcardTag.position).all()
+    tags: Dict[int, List[str]] = {}
+    for flashcard_id, name in rows:
+        tags.setdefault(flashcard_id, []).append(name)
+    return tags
+
+
+def weakest_tags(db: Session, user_id: int, since=None, min_reviews: int = 5, limit: int = 10) -> List[dict]:
+    """
+    Tags with the lowest review accuracy (at least min_reviews reviews since `since`).
+    Each review counts once for every tag on its card.
+    """
+    conditions = [CardReview.user_id == user_id, CardReview.is_imported == False]
+    if since is not None:
+        conditions.append(CardReview.review_date >= since)
+    card_stats = select(
+        CardReview.flashcard_id,
+        func.count(CardReview.id).label("total"),
+        func.sum(case((CardReview.was_correct == True, 1), else_=0)).label("correct"),
+    ).where(and_(*conditions)).group_by(CardReview.flashcard_id).subquery()
+
+    total = func.sum(card_stats.c.total)
+    accuracy = cast(func.sum(card_stats.c.correct), Float) / total
+    rows = db.query(Tag.name, total.label("total"), accuracy.label("accuracy")).join(
+        FlashcardTag, FlashcardTag.tag_id == Tag.id
+    ).join(
+        card_stats, card_stats.c.flashcard_id == FlashcardTag.flashcard_id
+    ).filter(Tag.user_id == user_id).group_by(Tag.id, Tag.name).having(
+        total >= min_reviews
+    ).order_by(accuracy, Tag.name).limit(limit).all()
+
+    return [
+        {"tag": row.name, "accuracy": round((row.accuracy or 0) * 100, 1), "review_count": int(row.total)}
+        for row in rows
+    ]
+
+
+def backfill_flashcard_tags(db: Session) -> int:
+    """Rebuild flashcard_tags from every card's tags string, in id-ordered batches; returns cards processed"""
+    processed, last_id = 0, 0
+    while True:
+        cards = db.query(Flashcard.id, Flashcard.user_id, Flashcard.tags).filter(
+            Flashcard.id > last_id
+        ).order_by(Flashcard.id).limit(BACKFILL_BATCH_SIZE).all()
+        if not cards:
+            break
+        sync_flashcard_tags(db, [(card.id, card.user_id, card.tags) for card in cards])
+        db.commit()
+        processed += len(cards)
+        last_id = cards[-1].id
+    logger.info(f"🏷️ Backfilled tags for {processed} flashcards")
+    return processed
@@ -13,6 +13,7 @@ celery_app = Celery(
 )
 
 celery_app.autodiscover_tasks(["app.services"])
+celery_app.autodiscover_tasks(["app.services.knowledge_map_store", "app.services.platform_metrics", "app.services.deck_counters", "app.services.sync", "app.services.import_jobs"], related_name=None)
 
 # Configure Celery to run tasks synchronously in development
 if os.getenv('ENVIRONMENT', 'development') == 'development':
@@ -31,4 +32,20 @@ celery_app.conf.beat_schedule = {
         'task': 'app.services.scheduler_service.cleanup_conversation_states_task',
         'schedule': crontab(minute=0, hour='*/2'),  # Clean up every 2 hours
     },
+    'capture-platform-metrics': {
+        'task': 'app.services.platform_metrics.capture_platform_metrics_task',
+        'schedule': crontab(minute='*/5'),  # Admin panel stats snapshot every 5 minutes
+    },
+    'reconcile-deck-counters': {
+        'task': 'app.services.deck_counters.reconcile_deck_counters_task',
+        'schedule': crontab(minute='*/30'),  # Repair counter drift and refresh due counts
+    },
+    'prune-sync-tombstones': {
+        'task': 'app.services.sync.prune_sync_tombstones_task',
+        'schedule': crontab(minute=15, hour=4),  # Daily; deletions older than the retention window
+    },
+    'prune-import-jobs': {
+        'task': 'app.services.import_jobs.prune_import_jobs_task',
+        'schedule': crontab(minute=45),  # Hourly; uploads kept for retries, then old jobs
+    },
 }
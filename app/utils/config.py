@@ -35,6 +35,40 @@ class Settings(BaseSettings):
     # Redis
     REDIS_URL: str = "redis://localhost:6379/0"
     
+    # Response cache (dashboard/mastery analytics)
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_MAX_ENTRIES: int = 2048  # In-process LRU size per worker
+    RESPONSE_CACHE_USE_REDIS: bool = False  # Share cached responses across workers via REDIS_URL
+    RESPONSE_CACHE_TTL_SECONDS: int = 86400  # Redis expiry; entries are also invalidated by data_version
+    
+    # Knowledge map layouts
+    KNOWLEDGE_MAP_BACKGROUND_UPDATES: bool = True  # Queue a layout update after cards/tags change
+    KNOWLEDGE_MAP_INCREMENTAL_MAX_FRACTION: float = 0.2  # Above this share of changed cards, re-run the full layout
+    KNOWLEDGE_MAP_UPDATE_DELAY_SECONDS: int = 30  # Queued updates wait this long, so a burst of commits shares one
+    KNOWLEDGE_MAP_UPDATE_LEASE_SECONDS: int = 900  # A queued update not started within this is assumed lost and re-queued
+    
+    # Delta sync (GET /sync)
+    SYNC_TOMBSTONE_RETENTION_DAYS: int = 30  # Older cursors get a full resync
+    SYNC_OVERLAP_SECONDS: int = 120  # Re-send changes this close to the cursor (transactions still in flight)
+    
+    # Imports
+    ANKI_IMPORT_MAX_CARDS: int = 100  # Cards one Anki import (.apkg/.colpkg or text export) may create
+    ANKI_IMPORT_MAX_BYTES: int = 200 * 1024 * 1024  # Upload size, media included (only the collection is kept)
+    IMPORT_UPLOAD_DIR: str = os.path.join(os.path.expanduser("~"), ".import-uploads")  # Local working copies; uploads are stored in the database
+    IMPORT_JOB_LEASE_SECONDS: int = 600  # A running job with no progress for this long may be claimed again
+    IMPORT_UPLOAD_RETENTION_HOURS: int = 24  # Uploads of failed jobs are kept this long for retries
+    IMPORT_JOB_RETENTION_DAYS: int = 30
+    IMPORT_CACHE_ENABLED: bool = True  # Reuse extracted text and generated cards of identical uploads
+    IMPORT_CACHE_MAX_MB: int = 256  # Least recently used entries are evicted above this
+    PDF_CHUNK_TOKENS: int = 12000  # Estimated tokens of PDF text per GPT request
+    PDF_CHUNK_CONCURRENCY: int = 4  # GPT requests one PDF import runs at once
+    PDF_IMPORT_MAX_BYTES: int = 50 * 1024 * 1024
+    PDF_IMPORT_MAX_PAGES: int = 1000
+    PDF_EXTRACT_PROCESSES: int = 4  # Worker processes one PDF import extracts pages with
+    
+    # Near-duplicate detection (imports, GET /flashcards/duplicates)
+    DEDUP_SIMILARITY_THRESHOLD: float = 0.8  # Estimated Jaccard similarity of card text shingles
+    
     # App Settings
     SECRET_KEY: str = "your-secret-key-here"  # Change this in production!
     ADMIN_SECRET_KEY: Optional[str] = None  # Secret key for admin endpoints (for Railway cron, etc.)
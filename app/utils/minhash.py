@@ -0,0 +1,126 @@
+"""
+MinHash signatures and LSH band buckets for near-duplicate flashcard detection
+
+A card's text (concept + definition, lowercased, punctuation dropped) is split into
+overlapping character shingles; its MinHash signature is the minimum of NUM_PERMUTATIONS
+multiply-shift hashes over those shingles. The share of equal signature positions
+estimates the Jaccard similarity of two cards' shingle sets.
+
+Signatures are cut into LSH_BANDS bands of LSH_ROWS rows and each band is hashed to a
+bucket. Cards that share any bucket are candidates (probability 1 - (1 - J^rows)^bands:
+0.95 at J=0.8, >0.999 at J=0.9, 0.06 at J=0.5); candidates are confirmed by comparing
+signatures. Finding duplicates is therefore a few indexed bucket lookups instead of a
+comparison against every card.
+
+Hash parameters come from a fixed seed: signatures are stored, so they must never change.
+"""
+import re
+from typing import Sequence, Tuple
+import numpy as np
+
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+SHINGLE_SIZE = 4
+
+_rng = np.random.RandomState(20240611)
+# h(x) = (a*x + b mod 2^64) >> 32 with odd a: uint64 arithmetic wraps, so no modulo is needed
+_A = (_rng.randint(0, 1 << 63, size=NUM_PERMUTATIONS, dtype=np.uint64) << np.uint64(1) | np.uint64(1))[:, None]
+_B = _rng.randint(0, 1 << 63, size=NUM_PERMUTATIONS, dtype=np.uint64)[:, None] << np.uint64(1)
+_SHIFT = np.uint64(32)
+
+_FNV_OFFSET = np.uint64(0xCBF29CE484222325)
+_FNV_PRIME = np.uint64(0x100000001B3)
+
+_BATCH_SHINGLES = 16_384  # Shingles permuted per numpy pass (~16 MB matrix)
+
+
+def _words(text: str) -> str:
+    return " ".join(re.findall(r"\w+", (text or "").lower()))
+
+
+def normalize_text(concept: str, definition: str) -> str:
+    """Lowercased words of both sides; \x1f keeps shingles from spanning the two"""
+    return f"{_words(concept)}\x1f{_words(definition)}"
+
+
+def _shingle_hashes(texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    32-bit hashes of every SHINGLE_SIZE-character window of each text, concatenated, and the
+    offset of each text's first shingle. Computed on code points in one vectorized pass.
+    """
+    texts = [text.ljust(SHINGLE_SIZE, "\0") for text in texts]  # Short texts are one shingle
+    codes = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+    window_count = len(codes) - SHINGLE_SIZE + 1
+    hashes = np.zeros(window_count, dtype=np.uint64)
+    for position in range(SHINGLE_SIZE):
+        hashes = (hashes ^ codes[position:position + window_count]) * _FNV_PRIME
+    # Keep only windows that start and end inside one text
+    ends = np.repeat(np.cumsum(lengths), lengths)[:window_count]
+    hashes = hashes[np.arange(window_count) + SHINGLE_SIZE <= ends]
+    offsets = np.concatenate(([0], np.cumsum(lengths - SHINGLE_SIZE + 1)[:-1]))
+    return hashes >> _SHIFT, offsets
+
+
+def minhash_signatures(cards: Sequence[Tuple[str, str]]) -> np.ndarray:
+    """(len(cards), NUM_PERMUTATIONS) uint32 signatures of (concept, definition) pairs"""
+    signatures = np.empty((len(cards), NUM_PERMUTATIONS), dtype=np.uint32)
+    texts = [normalize_text(concept, definition) for concept, definition in cards]
+    start = 0
+    while start < len(texts):
+        # Permute a run of cards' shingles in one pass (bounded matrix), then min per card
+        end, total = start, 0
+        while end < len(texts) and total < _BATCH_SHINGLES:
+            total += max(len(texts[end]) - SHINGLE_SIZE + 1, 1)
+            end += 1
+        hashes, offsets = _shingle_hashes(texts[start:end])
+        permuted = (_A * hashes[None, :] + _B) >> _SHIFT
+        signatures[start:end] = np.minimum.reduceat(permuted, offsets, axis=1).T
+        start = end
+    return signatures
+
+
+def lsh_buckets(signatures: np.ndarray) -> np.ndarray:
+    """(n, LSH_BANDS) int64 bucket keys; the band number is mixed in, so keys are unique across bands"""
+    rows = signatures.reshape(len(signatures), LSH_BANDS, LSH_ROWS).astype(np.uint64)
+    keys = np.broadcast_to(np.arange(LSH_BANDS, dtype=np.uint64) ^ _FNV_OFFSET, rows.shape[:2]).copy()
+    for row in range(LSH_ROWS):
+        keys = (keys ^ rows[:, :, row]) * _FNV_PRIME
+    return keys.view(np.int64)
+
+
+def similarities(signature: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """Estimated Jaccard similarity of one signature to each row of `others`"""
+    return (others == signature).mean(axis=-1)
+
+
+def pair_similarities(signatures: np.ndarray, pairs: np.ndarray, chunk: int = 65_536) -> np.ndarray:
+    """Estimated similarity of each (i, j) row pair"""
+    scores = np.empty(len(pairs), dtype=np.float64)
+    for start in range(0, len(pairs), chunk):
+        first, second = pairs[start:start + chunk].T
+        scores[start:start + chunk] = (signatures[first] == signatures[second]).mean(axis=-1)
+    return scores
+
+
+def similar_pairs(signatures: np.ndarray, threshold: float, block: int = 64) -> np.ndarray:
+    """(k, 2) index pairs i < j of rows whose estimated similarity is >= threshold"""
+    needed = int(np.ceil(threshold * signatures.shape[1]))
+    pairs = []
+    for start in range(0, len(signatures) - 1, block):
+        rows = signatures[start:start + block]
+        equal = (rows[:, None, :] == signatures[None, start + 1:, :]).sum(axis=-1)  # Only j > start
+        first, second = np.nonzero(equal >= needed)
+        second += start + 1
+        keep = second > first + start
+        pairs.append(np.stack([first[keep] + start, second[keep]], axis=1))
+    return np.concatenate(pairs) if pairs else np.empty((0, 2), dtype=np.int64)
+
+
+def signature_bytes(signature: np.ndarray) -> bytes:
+    return signature.astype("<u4").tobytes()
+
+
+def signature_from_bytes(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype="<u4").astype(np.uint32)
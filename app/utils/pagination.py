@@ -0,0 +1,134 @@
+"""
+Keyset (cursor) pagination helpers
+
+A page is ordered by (sort key, id) and the cursor is the last row's (sort key, id),
+so fetching the next page is an indexed range scan instead of an OFFSET that gets
+slower the deeper you go. Cursors are opaque url-safe base64 JSON.
+
+List endpoints that return a bare JSON array keep that shape and send the next page's
+cursor in the X-Next-Cursor response header (absent on the last page).
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import String, and_, or_, type_coerce
+from sqlalchemy.orm import Query
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort_value: Any, row_id: int) -> str:
+    if isinstance(sort_value, datetime):
+        sort_value = {"dt": sort_value.isoformat()}
+    raw = json.dumps([sort_value, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, int]:
+    """Decode a cursor from encode_cursor; raises 400 if it is malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if isinstance(sort_value, dict) and "dt" in sort_value:
+            sort_value = datetime.fromisoformat(sort_value["dt"])
+        return sort_value, int(row_id)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def _sqlite_datetime(sort_column, value: datetime):
+    """
+    SQLite stores datetimes as text: CURRENT_TIMESTAMP defaults have no fractional part,
+    while bound datetimes always get one, so compare as text in the stored format.
+    """
+    text_value = value.strftime("%Y-%m-%d %H:%M:%S") + (f".{value.microsecond:06d}" if value.microsecond else "")
+    return type_coerce(sort_column, String), text_value
+
+
+def keyset_filter(sort_column, id_column, cursor: Optional[str], descending: bool, dialect: Optional[str] = None):
+    """WHERE clause selecting rows strictly after the cursor in (sort_column, id_column) order"""
+    if not cursor:
+        return None
+    sort_value, row_id = decode_cursor(cursor)
+    if dialect == "sqlite" and isinstance(sort_value, datetime):
+        sort_column, sort_value = _sqlite_datetime(sort_column, sort_value)
+    if descending:
+        return or_(sort_column < sort_value, and_(sort_column == sort_value, id_column < row_id))
+    return or_(sort_column > sort_value, and_(sort_column == sort_value, id_column > row_id))
+
+
+def keyset_order(sort_column, id_column, descending: bool):
+    """ORDER BY matching keyset_filter"""
+    if descending:
+        return sort_column.desc(), id_column.desc()
+    return sort_column.asc(), id_column.asc()
+
+
+def fetch_page(
+    query: Query,
+    sort_column,
+    id_column,
+    cursor: Optional[str],
+    limit: Optional[int],
+    descending: bool = True,
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    One keyset page of ORM rows from `query`, ordered by (sort_column, id_column).
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    limit=None returns every remaining row (the explicit unpaginated mode).
+    """
+    dialect = query.session.get_bind().dialect.name
+    condition = keyset_filter(sort_column, id_column, cursor, descending, dialect)
+    if condition is not None:
+        query = query.filter(condition)
+    query = query.order_by(*keyset_order(sort_column, id_column, descending))
+    if limit is None:
+        return query.all(), None
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str]) -> Optional[List[str]]:
+    """
+    Parse a comma-separated `fields=` parameter against the allowed names.
+    Returns None when absent (serialize everything); "id" is always included.
+    """
+    if not fields:
+        return None
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = sorted(set(requested) - set(allowed))
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}"
+        )
+    return list(dict.fromkeys(["id"] + requested))
+
+
+def select_fields(
+    rows: Iterable[Any],
+    fields: Sequence[str],
+    converters: Optional[Dict[str, Callable[[Any], Any]]] = None,
+) -> List[Dict[str, Any]]:
+    """Serialize only `fields` of each row; converters override how a field is read"""
+    converters = converters or {}
+    return [
+        {name: converters[name](row) if name in converters else getattr(row, name) for name in fields}
+        for row in rows
+    ]
+
+
+def page_response(items: List[Any], next_cursor: Optional[str]) -> JSONResponse:
+    """JSON array response with the next cursor header (used when bypassing response_model)"""
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return JSONResponse(content=jsonable_encoder(items), headers=headers)
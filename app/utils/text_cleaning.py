@@ -0,0 +1,112 @@
+"""
+Text cleaning shared by the importers (Anki packages and text exports, PDFs, pasted cards)
+
+Big imports run these on every field of every note, so they stay cheap:
+- all patterns are compiled once, here;
+- strip_html drops tags and comments and decodes entities in one regex pass (decoded
+  entities are never re-read as markup, so "&lt;b&gt;" stays the text "<b>"), and
+  returns text without '<' or '&' untouched;
+- cloze extraction walks the matches once and joins the pieces, instead of re-slicing
+  the whole string for each cloze.
+"""
+import html
+import re
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
+
+# A comment, or a tag: '<' then a letter, '/', '!' or '?' up to the first '>' outside quotes
+# (other '<' are text, as for HTMLParser); or a character reference, as html.unescape reads them
+_MARKUP = re.compile(
+    r"(?P<tag><!--.*?-->|<[a-zA-Z/!?](?:\"[^\"]*\"|'[^']*'|[^'\">])*>)"
+    r"|(?P<entity>&(?:#[0-9]+;?|#[xX][0-9a-fA-F]+;?|[^\t\n\f <&#;]{1,32};?))",
+    re.DOTALL,
+)
+# <span class="cloze" data-cloze="answer">[...]</span> (Anki's "Cards in Plain Text" exports)
+_HTML_CLOZE = re.compile(
+    r"<span\s+class=[\"']cloze[\"'][^>]*data-cloze=[\"']([^\"']+)[\"'][^>]*>\[\.\.\.\]</span>",
+    re.IGNORECASE,
+)
+# {{c1::answer}} or {{c1::answer::hint}}
+_CLOZE = re.compile(r"\{\{c\d+::([^}]*?)(?:::[^}]*)?\}\}")
+_LINE_BREAK = re.compile(r" *\n[ \n]*")
+_SPACES = re.compile(r"[ \t\u00a0\u2000-\u200a\u202f\u3000]+")  # Including no-break and typographic spaces
+# Control characters (but tab and newline) and byte order marks are dropped; CR ends a line
+_CONTROL = {code: None for code in (*range(0x00, 0x09), 0x0b, 0x0c, *range(0x0e, 0x20), 0x7f, 0xfeff)}
+_CONTROL[0x0d] = "\n"
+
+_decode_entity = lru_cache(maxsize=4096)(html.unescape)
+
+
+def _replace_markup(match: re.Match) -> str:
+    entity = match.group("entity")
+    return _decode_entity(entity) if entity else ""
+
+
+def strip_html(html_text: str) -> str:
+    """Text of an HTML fragment: tags and comments dropped, entities decoded, ends stripped"""
+    if not html_text:
+        return html_text
+    if "<" not in html_text and "&" not in html_text:
+        return html_text.strip()
+    return _MARKUP.sub(_replace_markup, html_text).strip()
+
+
+def collapse_whitespace(text: str) -> str:
+    return " ".join(text.split())
+
+
+def normalize_text(text: str) -> str:
+    """
+    Plain text (PDF pages, pasted cards) with control characters removed, runs of spaces
+    collapsed, lines right-trimmed and at most one blank line in a row
+    """
+    if not text:
+        return text
+    text = _SPACES.sub(" ", text.replace("\r\n", "\n").translate(_CONTROL))
+    return _LINE_BREAK.sub(lambda match: "\n\n" if match.group().count("\n") > 1 else "\n", text).strip()
+
+
+def _replace_clozes(text: str, pattern: re.Pattern, answer: Callable[[re.Match], str]) -> Optional[Tuple[str, List[str]]]:
+    """(text with each cloze replaced by '...', non-empty answers in order), or None without clozes"""
+    pieces = []
+    answers = []
+    position = 0
+    for match in pattern.finditer(text):
+        pieces.append(text[position:match.start()])
+        pieces.append("...")
+        position = match.end()
+        cloze_answer = collapse_whitespace(answer(match))
+        if cloze_answer:
+            answers.append(cloze_answer)
+    if not pieces:
+        return None
+    pieces.append(text[position:])
+    return "".join(pieces), answers
+
+
+def parse_cloze_deletion(text: str) -> Optional[Tuple[str, str]]:
+    """
+    (front, back) of a cloze note: each {{c1::answer}} / {{c1::answer::hint}}, or HTML
+    <span class="cloze" data-cloze="answer">[...]</span>, becomes '...' on the front and the
+    answers, comma-separated, the back. None if the text has no (non-empty) clozes.
+    """
+    if not text or not text.strip():
+        return None
+
+    # HTML clozes first (plain text card exports); their answers are attribute-escaped
+    html_cloze = "<" in text and _replace_clozes(text, _HTML_CLOZE, lambda match: html.unescape(match.group(1)))
+    if html_cloze:
+        front, answers = html_cloze
+        front = collapse_whitespace(strip_html(front))
+        back = collapse_whitespace(strip_html(", ".join(answers)))
+    else:
+        cloze = "{{c" in text and _replace_clozes(text, _CLOZE, lambda match: match.group(1))
+        if not cloze:
+            return None
+        front, answers = cloze
+        front = collapse_whitespace(front)
+        back = ", ".join(answers)
+
+    if not answers or not front or not back:
+        return None
+    return front, back
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Benchmark the Anki .apkg importer
+
+Builds synthetic .apkg packages (basic, cloze and HTML notes with tags, plus media files)
+and imports each into a throwaway SQLite database, timing upload streaming, collection
+extraction and the batched parse/dedup/insert. Each deck is then re-imported into itself
+with --changed notes edited, timing the incremental re-sync. --legacy also times the previous
+approach (whole upload in memory, extractall, one ORM add per card) for comparison.
+
+Usage: python benchmark_anki_import.py [--sizes 1000,10000,50000] [--media-mb 20] [--changed 50] [--legacy]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sqlite3
+import tempfile
+import time
+import zipfile
+
+WORK_DIR = tempfile.mkdtemp(prefix="anki-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORK_DIR, 'bench.db')}"
+os.environ["ANKI_IMPORT_MAX_CARDS"] = str(10 ** 9)
+
+from fastapi import UploadFile  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.models import Flashcard, User  # noqa: E402
+from app.services.anki_package import (  # noqa: E402
+    extract_collection, import_collection, iter_note_batches, parse_note, save_upload
+)
+from app.services.dedup import DuplicatePolicy  # noqa: E402
+from app.services.search import ensure_search_index  # noqa: E402
+
+WORDS = [
+    "cell", "membrane", "protein", "enzyme", "energy", "atom", "bond", "reaction", "force", "mass",
+    "river", "empire", "treaty", "war", "king", "capital", "market", "price", "demand", "supply",
+    "verb", "noun", "tense", "mood", "case", "prime", "vector", "matrix", "limit", "integral",
+]
+
+
+def make_package(path: str, n_notes: int, media_mb: int, seed: int = 0, changed: int = 0) -> None:
+    """An .apkg of n_notes notes; `changed` of them (spread evenly) carry an edit and a later mod"""
+    rnd = random.Random(seed)
+    collection = os.path.join(WORK_DIR, "collection.anki21")
+    if os.path.exists(collection):
+        os.remove(collection)
+    conn = sqlite3.connect(collection)
+    conn.execute(
+        "CREATE TABLE notes (id INTEGER PRIMARY KEY, guid TEXT, mid INTEGER, mod INTEGER, usn INTEGER, "
+        "tags TEXT, flds TEXT, sfld TEXT, csum INTEGER, flags INTEGER, data TEXT)"
+    )
+    conn.execute("CREATE TABLE col (decks TEXT)")
+    conn.execute("INSERT INTO col VALUES (?)", (json.dumps({"1": {"name": f"Synthetic {n_notes}"}}),))
+    edit_every = n_notes // changed if changed else 0
+
+    def note(i):
+        words = " ".join(rnd.choices(WORDS, k=rnd.randint(4, 12)))
+        kind = i % 3
+        if kind == 0:
+            fields = [f"Q{i}: {words}?", f"<b>{rnd.choice(WORDS)}</b> &amp; {rnd.choice(WORDS)} {i}"]
+        elif kind == 1:
+            fields = [f"{words} {{{{c1::{rnd.choice(WORDS)} {i}}}}} and more", ""]
+        else:
+            fields = [f"<div>{words} #{i}</div>", f"<ul><li>{rnd.choice(WORDS)}</li></ul>"]
+        tags = " ".join(rnd.sample(WORDS, rnd.randint(0, 3)))
+        mod = 1
+        if edit_every and i % edit_every == 0 and i // edit_every < changed:
+            fields[1] += " (edited)"
+            mod = 2
+        return (i + 1, f"g{i}", 1, mod, 0, f" {tags} ", "\x1f".join(fields), fields[0], 0, 0, "")
+
+    conn.executemany("INSERT INTO notes VALUES (?,?,?,?,?,?,?,?,?,?,?)", (note(i) for i in range(n_notes)))
+    conn.commit()
+    conn.close()
+
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as package:
+        package.write(collection, "collection.anki21")
+        media = {}
+        for index in range(media_mb):
+            package.writestr(str(index), os.urandom(1024 * 1024), compress_type=zipfile.ZIP_STORED)
+            media[str(index)] = f"image{index}.jpg"
+        package.writestr("media", json.dumps(media))
+
+
+def max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def new_user(db, label: str) -> int:
+    user = User(email=f"{label}-{time.time_ns()}@bench.local", name="Bench")
+    db.add(user)
+    db.commit()
+    return user.id
+
+
+def run_streaming(package_path: str, n_notes: int, resync_path: str = None) -> None:
+    db = SessionLocal()
+    try:
+        user_id = new_user(db, "stream")
+        with tempfile.TemporaryDirectory(dir=WORK_DIR) as temp_dir, open(package_path, "rb") as upload:
+            start = time.perf_counter()
+            copy_path = os.path.join(temp_dir, "package.zip")
+            asyncio.run(save_upload(UploadFile(file=upload, filename="bench.apkg"), copy_path))
+            upload_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            collection_path = extract_collection(copy_path, temp_dir)
+            extract_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            result = import_collection(db, collection_path, user_id, None, "bench", DuplicatePolicy.skip)
+            db.commit()
+            import_time = time.perf_counter() - start
+        total = upload_time + extract_time + import_time
+        print(
+            f"{n_notes:>7} notes | streaming | upload {upload_time * 1000:7.1f} ms | extract {extract_time * 1000:7.1f} ms | "
+            f"import {import_time:6.2f} s | total {total:6.2f} s | {result['created_count']} cards, "
+            f"{result['duplicate_count']} duplicates | {n_notes / total:8.0f} notes/s | peak RSS {max_rss_mb():.0f} MB"
+        )
+        if resync_path:
+            with tempfile.TemporaryDirectory(dir=WORK_DIR) as temp_dir:
+                start = time.perf_counter()
+                collection_path = extract_collection(resync_path, temp_dir)
+                result = import_collection(db, collection_path, user_id, result["deck_id"], "bench", DuplicatePolicy.skip)
+                db.commit()
+                total = time.perf_counter() - start
+            print(
+                f"{n_notes:>7} notes | re-sync   | total {total:6.2f} s | {result['created_count']} created, "
+                f"{result['updated_count']} updated, {result['unchanged_count']} unchanged"
+            )
+    finally:
+        db.close()
+
+
+def run_legacy(package_path: str, n_notes: int) -> None:
+    """The previous importer's strategy, for comparison"""
+    db = SessionLocal()
+    try:
+        user_id = new_user(db, "legacy")
+        with tempfile.TemporaryDirectory(dir=WORK_DIR) as temp_dir:
+            start = time.perf_counter()
+            with open(package_path, "rb") as upload:
+                content = upload.read()
+            copy_path = os.path.join(temp_dir, "package.zip")
+            with open(copy_path, "wb") as out:
+                out.write(content)
+            with zipfile.ZipFile(copy_path) as package:
+                package.extractall(temp_dir)
+            conn = sqlite3.connect(os.path.join(temp_dir, "collection.anki21"))
+            notes = [row for batch in iter_note_batches(conn) for row in batch]
+            for row in notes:
+                card = parse_note(*row[:4])
+                if card:
+                    db.add(Flashcard(concept=card[0], definition=card[1], tags=card[2], user_id=user_id))
+            db.commit()
+            conn.close()
+            total = time.perf_counter() - start
+        print(f"{n_notes:>7} notes | legacy    | total {total:6.2f} s | {n_notes / total:8.0f} notes/s | peak RSS {max_rss_mb():.0f} MB")
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    parser.add_argument("--media-mb", type=int, default=20)
+    parser.add_argument("--changed", type=int, default=50, help="notes edited before the re-sync")
+    parser.add_argument("--legacy", action="store_true", help="also time the previous importer's approach")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    ensure_search_index(engine)
+
+    print(f"🧪 Anki import benchmark (SQLite, {args.media_mb} MB media per package)")
+    for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        package_path = os.path.join(WORK_DIR, f"synthetic-{size}.apkg")
+        make_package(package_path, size, args.media_mb)
+        resync_path = os.path.join(WORK_DIR, f"synthetic-{size}-changed.apkg")
+        make_package(resync_path, size, 0, changed=args.changed)
+        print(f"   package: {os.path.getsize(package_path) / 1024 / 1024:.1f} MB")
+        run_streaming(package_path, size, resync_path)
+        if args.legacy:
+            run_legacy(package_path, size)
+
+
+if __name__ == "__main__":
+    main()
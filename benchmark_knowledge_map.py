@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Benchmark the knowledge map layout (tag similarity + force-directed placement)
+
+Generates synthetic collections (cards spread over a few decks, 1-3 tags each from a
+shared vocabulary) and times each stage at 500, 2k and 10k cards.
+
+Usage: python benchmark_knowledge_map.py [--sizes 500,2000,10000] [--tags 200] [--decks 8]
+"""
+
+import argparse
+import random
+import time
+
+from app.services.knowledge_map import (
+    tag_similarity_edges, layout_positions, normalize_positions, top_links
+)
+
+
+def make_collection(n_cards: int, n_tags: int, n_decks: int, seed: int = 0):
+    rnd = random.Random(seed)
+    vocabulary = [f"tag{i}" for i in range(n_tags)]
+    deck_ids = [rnd.randint(1, n_decks) if rnd.random() < 0.9 else None for _ in range(n_cards)]
+    tag_lists = [rnd.sample(vocabulary, rnd.randint(1, 3)) for _ in range(n_cards)]
+    return list(range(1, n_cards + 1)), deck_ids, tag_lists
+
+
+def run(n_cards: int, n_tags: int, n_decks: int):
+    ids, deck_ids, tag_lists = make_collection(n_cards, n_tags, n_decks)
+
+    start = time.perf_counter()
+    edges = tag_similarity_edges(tag_lists)
+    similarity_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    positions = normalize_positions(layout_positions(deck_ids, edges))
+    layout_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    links = top_links(ids, edges)
+    links_time = time.perf_counter() - start
+
+    total = similarity_time + layout_time + links_time
+    print(
+        f"{n_cards:>7} cards | similarity {similarity_time * 1000:8.1f} ms | "
+        f"layout {layout_time * 1000:8.1f} ms | links {links_time * 1000:7.1f} ms | "
+        f"total {total:6.2f} s | {len(links)} links | range x [{positions[:, 0].min():.1f}, {positions[:, 0].max():.1f}]"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="500,2000,10000")
+    parser.add_argument("--tags", type=int, default=200)
+    parser.add_argument("--decks", type=int, default=8)
+    args = parser.parse_args()
+
+    print("🧪 Knowledge map layout benchmark")
+    for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        run(size, args.tags, args.decks)
+
+
+if __name__ == "__main__":
+    main()
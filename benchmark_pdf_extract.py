@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark PDF text extraction for imports
+
+Builds synthetic text PDFs (default 10, 100 and 500 pages of ~40 lines each) and times
+iter_pdf_pages from memory, in-process and with the process pool, including how soon the
+first chunk for GPT is ready (chunk_pages). --legacy also times the previous approach
+(upload copied to a NamedTemporaryFile, every page extracted in order, text joined) for
+comparison.
+
+Usage: python benchmark_pdf_extract.py [--pages 10,100,500] [--processes 4] [--legacy]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from app.services import pdf_text
+from app.services.pdf_text import chunk_pages, iter_pdf_pages
+from app.utils.config import settings
+
+WORDS = [
+    "cell", "membrane", "protein", "enzyme", "energy", "atom", "bond", "reaction", "force", "mass",
+    "river", "empire", "treaty", "war", "king", "capital", "market", "price", "demand", "supply",
+    "verb", "noun", "tense", "mood", "case", "prime", "vector", "matrix", "limit", "integral",
+]
+LINES_PER_PAGE = 40
+
+
+def make_pdf(n_pages: int, seed: int = 0) -> bytes:
+    """A minimal PDF of n_pages pages of Helvetica text"""
+    rnd = random.Random(seed)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages, filled in below
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for number in range(n_pages):
+        lines = [f"Page {number + 1}. " + " ".join(rnd.choices(WORDS, k=12)) + "." for _ in range(LINES_PER_PAGE)]
+        stream = "BT /F1 10 Tf 12 TL 50 780 Td " + " ".join(f"({line}) '" for line in lines) + " ET"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream.encode()))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % len(objects)
+        )
+        page_ids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{i} 0 R" for i in page_ids).encode(), n_pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def run_streaming(data: bytes, n_pages: int, processes: int) -> None:
+    settings.PDF_EXTRACT_PROCESSES = processes
+    processes = min(processes, os.cpu_count() or 1)
+    mode = "in-process" if processes <= 1 or n_pages <= pdf_text.PDF_INLINE_PAGES else f"{processes} procs"
+    start = time.perf_counter()
+    first_chunk = None
+    chunk_count = 0
+    for _ in chunk_pages(iter_pdf_pages(data)):
+        chunk_count += 1
+        if first_chunk is None:
+            first_chunk = time.perf_counter() - start
+    total = time.perf_counter() - start
+    print(
+        f"{n_pages:>5} pages | {mode:<10} | first chunk {first_chunk:6.2f} s | total {total:6.2f} s | "
+        f"{chunk_count} chunks | {n_pages / total:6.0f} pages/s"
+    )
+
+
+def run_legacy(data: bytes, n_pages: int) -> None:
+    """The previous extraction's strategy, for comparison"""
+    import pypdf
+
+    start = time.perf_counter()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
+        temp_file.write(data)
+        temp_path = temp_file.name
+    try:
+        with open(temp_path, "rb") as pdf_file:
+            text = "\n\n".join(page.extract_text() or "" for page in pypdf.PdfReader(pdf_file).pages)
+    finally:
+        os.unlink(temp_path)
+    total = time.perf_counter() - start
+    print(f"{n_pages:>5} pages | legacy     | first chunk {total:6.2f} s | total {total:6.2f} s | {len(text)} chars | {n_pages / total:6.0f} pages/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default="10,100,500")
+    parser.add_argument("--processes", type=int, default=settings.PDF_EXTRACT_PROCESSES)
+    parser.add_argument("--legacy", action="store_true", help="also time the previous extraction approach")
+    args = parser.parse_args()
+
+    print(f"🧪 PDF extraction benchmark ({os.cpu_count()} CPUs, chunks of {settings.PDF_CHUNK_TOKENS} tokens)")
+    for size in [int(s) for s in args.pages.split(",") if s.strip()]:
+        data = make_pdf(size)
+        print(f"   document: {len(data) / 1024 / 1024:.1f} MB")
+        if args.legacy:
+            run_legacy(data, size)
+        run_streaming(data, size, 1)
+        run_streaming(data, size, args.processes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Benchmark the import text cleaning (app/utils/text_cleaning.py)
+
+Parses a corpus of notes built from field shapes Anki's editor and shared decks actually
+produce (nested divs, <br>s, inline styles, entities, images, sound tags, MathJax, ruby,
+tables, {{c1::...}} and HTML clozes, plain text) through parse_note, and times strip_html
+and parse_cloze_deletion on their own. --legacy also times the previous implementation
+(an HTMLParser instance per field, patterns compiled per call, clozes cut out by re-slicing)
+for comparison.
+
+Usage: python benchmark_text_cleaning.py [--notes 100000] [--repeat 3] [--legacy]
+"""
+
+import argparse
+import html
+import random
+import re
+import time
+from html.parser import HTMLParser
+
+from app.services import anki_package
+from app.services.anki_package import parse_note
+from app.utils.text_cleaning import parse_cloze_deletion, strip_html
+
+FRONTS = [
+    "What is the function of the {word}?",
+    "<div>Define <b>{word}</b></div>",
+    "<div><span style=\"font-family: Arial; font-size: 14px;\">{word}</span>&nbsp;</div><div><br></div>",
+    "The {{{{c1::{word}}}}} is the {{{{c2::powerhouse::organelle}}}} of the cell",
+    "{{{{c1::{word}}}}} was signed in {{{{c2::1648}}}}",
+    "<img src=\"paste-{n}.jpg\"><br>Identify the {word}",
+    "[sound:rec_{n}.mp3] {word}",
+    "Solve \\(x^2 + {n}x = 0\\)",
+    "<ruby>漢字<rt>かんじ</rt></ruby> ({word})",
+    "A <span class=\"cloze\" data-cloze=\"{word}&#x20;{n}\">[...]</span> binds &lt;substrate&gt;",
+    "{word} &amp; {word2}: which is larger?",
+    "<ul><li>{word}</li><li>{word2}</li></ul>",
+    "{word}",
+]
+BACKS = [
+    "<div>It converts <i>{word}</i> into {word2}.</div>",
+    "{word2}",
+    "<table><tr><td>{word}</td><td>{n}</td></tr><tr><td>{word2}</td><td>{n}</td></tr></table>",
+    "<div>{word}</div><div><br></div><div>See also: <a href=\"https://example.org/{n}\">{word2}</a></div>",
+    "<!-- source: textbook p. {n} --><b>{word}</b> &gt; {word2}",
+    "&quot;{word}&quot; — {word2} ({n}&nbsp;mg)",
+    "",
+]
+WORDS = [
+    "mitochondrion", "ribosome", "Treaty of Westphalia", "photosynthesis", "Krebs cycle", "enzyme",
+    "demand curve", "subjunctive", "eigenvalue", "integral", "capital", "Tokyo", "ATP", "neuron",
+]
+
+
+class LegacyHTMLStripper(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.reset()
+        self.strict = False
+        self.convert_charrefs = True
+        self.text = []
+
+    def handle_data(self, data):
+        self.text.append(data)
+
+    def get_text(self):
+        return ''.join(self.text)
+
+
+def legacy_strip_html(html_text):
+    if not html_text:
+        return html_text
+    stripper = LegacyHTMLStripper()
+    stripper.feed(html.unescape(html_text))
+    stripper.close()
+    return stripper.get_text().strip()
+
+
+def legacy_parse_cloze_deletion(text):
+    if not text or not text.strip():
+        return None
+    html_cloze_pattern = r'<span\s+class=["\']cloze["\'][^>]*data-cloze=["\']([^"\']+)["\'][^>]*>\[\.\.\.\]</span>'
+    html_matches = list(re.finditer(html_cloze_pattern, text, re.IGNORECASE))
+    pattern_matches = html_matches or list(re.finditer(r'\{\{c\d+::(?:[^:]+::)?([^}]+)\}\}', text))
+    if not pattern_matches:
+        return None
+    cloze_texts = []
+    front_text = text
+    for match in reversed(pattern_matches):
+        cloze_text = ' '.join((html.unescape(match.group(1)) if html_matches else match.group(1)).split())
+        if cloze_text:
+            cloze_texts.append(cloze_text)
+        front_text = front_text[:match.start()] + "..." + front_text[match.end():]
+    if not cloze_texts:
+        return None
+    back_text = ", ".join(cloze_texts)
+    if html_matches:
+        front_text, back_text = legacy_strip_html(front_text), legacy_strip_html(back_text)
+    front_text, back_text = ' '.join(front_text.split()), ' '.join(back_text.split())
+    if not front_text or not back_text:
+        return None
+    return front_text, back_text
+
+
+def make_corpus(n_notes: int, seed: int = 0):
+    """(id, flds, tags, sfld) note rows"""
+    rnd = random.Random(seed)
+    notes = []
+    for i in range(n_notes):
+        values = {"word": rnd.choice(WORDS), "word2": rnd.choice(WORDS), "n": i}
+        front = rnd.choice(FRONTS).format(**values)
+        back = rnd.choice(BACKS).format(**values)
+        notes.append((i + 1, f"{front}\x1f{back}", " ".join(rnd.sample(["bio", "hist", "math", "lang"], 2)), front))
+    return notes
+
+
+def best_time(run, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run(label: str, notes, fields, clozes, strip, cloze, repeat: int) -> None:
+    anki_package.strip_html, anki_package.parse_cloze_deletion = strip, cloze
+    notes_time = best_time(lambda: [parse_note(*note) for note in notes], repeat)
+    strip_time = best_time(lambda: [strip(field) for field in fields], repeat)
+    cloze_time = best_time(lambda: [cloze(text) for text in clozes], repeat)
+    print(
+        f"{label:<8} | parse_note {len(notes) / notes_time:9.0f} notes/s | strip_html {len(fields) / strip_time:9.0f} fields/s | "
+        f"parse_cloze_deletion {len(clozes) / cloze_time:9.0f} calls/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--notes", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--legacy", action="store_true", help="also time the previous implementation")
+    args = parser.parse_args()
+
+    notes = make_corpus(args.notes)
+    fields = [field for _, flds, _, _ in notes for field in flds.split("\x1f")]
+    clozes = [strip_html(flds.split("\x1f")[0]) for _, flds, _, _ in notes]
+
+    print(f"🧪 Text cleaning benchmark ({len(notes)} notes, {len(fields)} fields, best of {args.repeat})")
+    run("current", notes, fields, clozes, strip_html, parse_cloze_deletion, args.repeat)
+    if args.legacy:
+        run("legacy", notes, fields, clozes, legacy_strip_html, legacy_parse_cloze_deletion, args.repeat)
+        anki_package.strip_html, anki_package.parse_cloze_deletion = strip_html, parse_cloze_deletion
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { useAuth } from '../contexts/AuthContext';
 import { buildApiUrl } from '../config';
 import axios from 'axios';
+import { describeImportProgress, waitForImport } from '../utils/importJobs';
 
 interface AnkiImportProps {
   onSuccess?: () => void;
@@ -16,10 +17,12 @@ const AnkiImport: React.FC<AnkiImportProps> = ({ onSuccess }) => {
   const { token } = useAuth();
   const [file, setFile] = useState<File | null>(null);
   const [deckId, setDeckId] = useState<number | null>(null);
+  const [removeMissing, setRemoveMissing] = useState(false);
   const [decks, setDecks] = useState<Deck[]>([]);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [success, setSuccess] = useState<string | null>(null);
+  const [progress, setProgress] = useState<string | null>(null);
 
   useEffect(() => {
     const fetchDecks = async () => {
@@ -46,7 +49,8 @@ const AnkiImport: React.FC<AnkiImportProps> = ({ onSuccess }) => {
       if (selectedFile.name.endsWith('.txt')) {
         // Read file to count lines (rough estimate of card count)
         const text = await selectedFile.text();
-        const lineCount = text.split('\n').filter(line => line.trim().length > 0).length;
+        // Anki 2.1.55+ exports start with '#separator:tab'-style header lines
+        const lineCount = text.split('\n').filter(line => line.trim().length > 0 && !/^#[a-z ]+:/.test(line)).length;
         
         if (lineCount > 100) {
           setError(`This file appears to contain more than 100 cards (estimated ${lineCount} lines). Please limit your import to 100 cards or fewer.`);
@@ -74,14 +78,12 @@ const AnkiImport: React.FC<AnkiImportProps> = ({ onSuccess }) => {
     try {
       const formData = new FormData();
       formData.append('file', file);
-      if (deckId) {
-        formData.append('deck_id', deckId.toString());
-      }
 
       const response = await axios.post(
         buildApiUrl('/anki/import'),
         formData,
         {
+          params: deckId ? { deck_id: deckId, remove_missing: removeMissing } : {},
           headers: {
             'Authorization': `Bearer ${token}`,
             'Content-Type': 'multipart/form-data',
@@ -89,7 +91,12 @@ const AnkiImport: React.FC<AnkiImportProps> = ({ onSuccess }) => {
         }
       );
 
-      setSuccess(`Successfully imported ${response.data.created_count} flashcards${deckId ? '' : ` into new deck "${response.data.deck_name}"`}`);
+      const result = await waitForImport(response.data, token, (job) => setProgress(describeImportProgress(job)));
+      const synced = [
+        result.updated_count ? `${result.updated_count} updated` : '',
+        result.removed_count ? `${result.removed_count} removed` : '',
+      ].filter(Boolean).join(', ');
+      setSuccess(`Successfully imported ${result.created_count} flashcards${deckId ? '' : ` into new deck "${result.deck_name}"`}${synced ? `, ${synced}` : ''}${result.duplicate_count ? ` (${result.duplicate_count} duplicates skipped)` : ''}`);
       setFile(null);
       if (onSuccess) {
         onSuccess();
@@ -98,6 +105,7 @@ const AnkiImport: React.FC<AnkiImportProps> = ({ onSuccess }) => {
       setError(err.response?.data?.detail || 'Failed to import Anki deck. Please try again.');
     } finally {
       setLoading(false);
+      setProgress(null);
     }
   };
 
@@ -162,6 +170,16 @@ const AnkiImport: React.FC<AnkiImportProps> = ({ onSuccess }) => {
               </option>
             ))}
           </select>
+          {deckId && !file?.name.endsWith('.txt') && (
+            <label className="flex items-center gap-2 mt-2 text-xs text-gray-600 dark:text-gray-400">
+              <input
+                type="checkbox"
+                checked={removeMissing}
+                onChange={(e) => setRemoveMissing(e.target.checked)}
+              />
+              Re-importing this deck: remove cards whose notes were deleted in Anki
+            </label>
+          )}
         </div>
 
         <button
@@ -169,7 +187,7 @@ const AnkiImport: React.FC<AnkiImportProps> = ({ onSuccess }) => {
           disabled={loading || !file}
           className="w-full px-4 py-2 bg-accent text-white rounded hover:bg-accent/90 disabled:opacity-50 disabled:cursor-not-allowed transition-colors duration-200 text-sm"
         >
-          {loading ? 'Processing... this could take a couple minutes' : 'Import Deck'}
+          {loading ? (progress || 'Processing... this could take a couple minutes') : 'Import Deck'}
         </button>
       </div>
     </div>
@@ -7,6 +7,7 @@ import 'katex/dist/katex.min.css';
 import { useAuth } from '../contexts/AuthContext';
 import { buildApiUrl } from '../config';
 import TagSelector from './TagSelector';
+import { waitForImport } from '../utils/importJobs';
 
 interface Deck {
   id: number;
@@ -147,13 +148,14 @@ const NewFlashcardModal: React.FC<NewFlashcardModalProps> = ({
         { headers: { 'Authorization': `Bearer ${token}` } }
       );
 
-      if (response.data.success) {
+      const result = await waitForImport(response.data, token);
+      if (result.success) {
         // After batch creation, pass the deck ID if one was selected
         const deckId = selectedDeckIds.length > 0 ? selectedDeckIds[0] : null;
         onSuccess(deckId);
         onClose();
       } else {
-        setError(`Created ${response.data.created_count} cards, but some errors occurred.`);
+        setError(`Created ${result.created_count} cards, but some errors occurred.`);
       }
     } catch (err: any) {
       console.error('Error creating flashcards:', err);
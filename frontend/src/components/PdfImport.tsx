@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { useAuth } from '../contexts/AuthContext';
 import { buildApiUrl } from '../config';
 import axios from 'axios';
+import { describeImportProgress, waitForImport } from '../utils/importJobs';
 
 interface PdfImportProps {
   onSuccess?: () => void;
@@ -21,6 +22,7 @@ const PdfImport: React.FC<PdfImportProps> = ({ onSuccess }) => {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [success, setSuccess] = useState<string | null>(null);
+  const [progress, setProgress] = useState<string | null>(null);
 
   useEffect(() => {
     const fetchDecks = async () => {
@@ -81,7 +83,8 @@ const PdfImport: React.FC<PdfImportProps> = ({ onSuccess }) => {
         }
       );
 
-      setSuccess(`Successfully created ${response.data.created_count} flashcards${deckId ? '' : ` in new deck "${response.data.deck_name}"`}`);
+      const result = await waitForImport(response.data, token, (job) => setProgress(describeImportProgress(job)));
+      setSuccess(`Successfully created ${result.created_count} flashcards${deckId ? '' : ` in new deck "${result.deck_name}"`}${result.duplicate_count ? ` (${result.duplicate_count} duplicates skipped)` : ''}`);
       setFile(null);
       setInstructions('');
       if (onSuccess) {
@@ -91,6 +94,7 @@ const PdfImport: React.FC<PdfImportProps> = ({ onSuccess }) => {
       setError(err.response?.data?.detail || 'Failed to import PDF. Please try again.');
     } finally {
       setLoading(false);
+      setProgress(null);
     }
   };
 
@@ -190,7 +194,7 @@ const PdfImport: React.FC<PdfImportProps> = ({ onSuccess }) => {
           disabled={loading || !file || !isPremium}
           className="w-full px-4 py-2 bg-primary-500 text-white rounded hover:bg-primary-600 disabled:opacity-50 disabled:cursor-not-allowed transition-colors duration-200 text-sm"
         >
-          {loading ? 'Processing... this could take a couple minutes' : 'Create Flashcards'}
+          {loading ? (progress || 'Processing... this could take a couple minutes') : 'Create Flashcards'}
         </button>
       </div>
     </div>
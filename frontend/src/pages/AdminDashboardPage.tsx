@@ -52,6 +52,8 @@ const AdminDashboardPage: React.FC = () => {
   const [filterSms, setFilterSms] = useState<boolean | null>(null);
   const [updatingUsers, setUpdatingUsers] = useState<Set<number>>(new Set());
   const [deletingUsers, setDeletingUsers] = useState<Set<number>>(new Set());
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     if (!token || !user) {
@@ -64,21 +66,36 @@ const AdminDashboardPage: React.FC = () => {
       setLoading(false);
       return;
     }
+  }, [token, user, navigate]);
 
-    fetchDashboardData();
-  }, [token, user, navigate]); // eslint-disable-line react-hooks/exhaustive-deps
+  // Search and filters run server-side; refetch the first page when they change
+  useEffect(() => {
+    if (!token || !user?.is_admin) return;
+    const timeout = setTimeout(() => fetchDashboardData(), 300);
+    return () => clearTimeout(timeout);
+  }, [token, user, searchTerm, filterPremium, filterSms]); // eslint-disable-line react-hooks/exhaustive-deps
 
-  const fetchDashboardData = async () => {
+  const fetchDashboardData = async (cursor: string | null = null) => {
     try {
+      const params: Record<string, string | number | boolean> = { limit: 50 };
+      if (cursor) params.cursor = cursor;
+      if (searchTerm.trim()) params.search = searchTerm.trim();
+      if (filterPremium !== null) params.is_premium = filterPremium;
+      if (filterSms !== null) params.sms_opt_in = filterSms;
+
       const response = await axios.get(buildApiUrl('/admin/dashboard'), {
         headers: {
           'Authorization': `Bearer ${token}`,
         },
+        params,
       });
 
       if (response.data.success) {
-        setStats(response.data.stats);
-        setUsers(response.data.users);
+        if (response.data.stats) {
+          setStats(response.data.stats);
+        }
+        setUsers(prev => cursor ? [...prev, ...response.data.users] : response.data.users);
+        setNextCursor(response.data.pagination?.next_cursor ?? null);
       } else {
         setError('Failed to load dashboard data');
       }
@@ -195,16 +212,12 @@ const AdminDashboardPage: React.FC = () => {
     }
   };
 
-  const filteredUsers = users.filter(user => {
-    const matchesSearch = 
-      user.email.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      (user.name && user.name.toLowerCase().includes(searchTerm.toLowerCase()));
-    
-    const matchesPremium = filterPremium === null || user.is_premium === filterPremium;
-    const matchesSms = filterSms === null || user.sms_opt_in === filterSms;
-    
-    return matchesSearch && matchesPremium && matchesSms;
-  });
+  const handleLoadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    await fetchDashboardData(nextCursor);
+    setLoadingMore(false);
+  };
 
   if (loading) {
     return (
@@ -293,7 +306,7 @@ const AdminDashboardPage: React.FC = () => {
 
         {/* User List */}
         <div className="bg-white dark:bg-darksurface rounded-lg border border-gray-200 dark:border-gray-800 p-6">
-          <h2 className="text-xl font-light text-gray-900 dark:text-darktext mb-6">Users ({filteredUsers.length})</h2>
+          <h2 className="text-xl font-light text-gray-900 dark:text-darktext mb-6">Users ({users.length}{nextCursor ? '+' : ''})</h2>
 
           {/* Filters */}
           <div className="mb-4 flex flex-wrap gap-4">
@@ -344,7 +357,7 @@ const AdminDashboardPage: React.FC = () => {
                 </tr>
               </thead>
               <tbody>
-                {filteredUsers.map((user) => (
+                {users.map((user) => (
                   <tr key={user.id} className="border-b border-gray-100 dark:border-gray-800 hover:bg-gray-50 dark:hover:bg-gray-800/50">
                     <td className="py-3 px-4 text-gray-900 dark:text-darktext">
                       {user.email}
@@ -411,11 +424,23 @@ const AdminDashboardPage: React.FC = () => {
             </table>
           </div>
 
-          {filteredUsers.length === 0 && (
+          {users.length === 0 && (
             <div className="text-center py-8 text-gray-500 dark:text-gray-400">
               No users found matching your filters.
             </div>
           )}
+
+          {nextCursor && (
+            <div className="text-center pt-6">
+              <button
+                onClick={handleLoadMore}
+                disabled={loadingMore}
+                className="px-4 py-2 border border-gray-300 dark:border-gray-600 rounded-md text-gray-700 dark:text-gray-300 hover:bg-gray-50 dark:hover:bg-gray-800 disabled:opacity-50"
+              >
+                {loadingMore ? 'Loading...' : 'Load more'}
+              </button>
+            </div>
+          )}
         </div>
       </div>
     </div>
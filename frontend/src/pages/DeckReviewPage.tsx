@@ -3,6 +3,7 @@ import { useParams } from 'react-router-dom';
 import { useAuth } from '../contexts/AuthContext';
 import axios from 'axios';
 import { buildApiUrl } from '../config';
+import { fetchAllPages } from '../utils/pagination';
 import SmsSetupBanner from '../components/SmsSetupBanner';
 
 interface Flashcard {
@@ -28,13 +29,11 @@ const DeckReviewPage: React.FC = () => {
 
     const fetchFlashcards = async () => {
       try {
-        const response = await axios.get(buildApiUrl(`/flashcards/decks/${deck_id}/all-flashcards`), {
-          headers: {
-            'Authorization': `Bearer ${token}`
-          }
+        const deckCards = await fetchAllPages<Flashcard>(buildApiUrl(`/flashcards/decks/${deck_id}/all-flashcards`), token, {
+          fields: 'concept,definition,tags'
         });
-        setFlashcards(response.data);
-        if (response.data.length > 0) {
+        setFlashcards(deckCards);
+        if (deckCards.length > 0) {
           setCurrentIndex(0);
         } else {
           setError('No flashcards in this deck.');
@@ -6,6 +6,7 @@ import remarkMath from 'remark-math';
 import rehypeKatex from 'rehype-katex';
 import 'katex/dist/katex.min.css';
 import { buildApiUrl } from '../config';
+import { fetchAllPages } from '../utils/pagination';
 import SmsSetupBanner from '../components/SmsSetupBanner';
 
 interface Flashcard {
@@ -32,13 +33,11 @@ const ManualReviewPage: React.FC = () => {
 
     const fetchFlashcards = async () => {
       try {
-        const response = await axios.get(buildApiUrl('/flashcards/due'), {
-          headers: {
-            'Authorization': `Bearer ${token}`
-          }
+        const dueCards = await fetchAllPages<Flashcard>(buildApiUrl('/flashcards/due'), token, {
+          fields: 'concept,definition,tags,deck_name'
         });
-        setFlashcards(response.data);
-        if (response.data.length > 0) {
+        setFlashcards(dueCards);
+        if (dueCards.length > 0) {
           setCurrentIndex(0);
         } else {
           setError('No flashcards due for review.');
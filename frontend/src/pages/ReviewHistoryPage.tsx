@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useAuth } from '../contexts/AuthContext';
-import axios from 'axios';
 import { buildApiUrl } from '../config';
+import { fetchPage } from '../utils/pagination';
 import ReactMarkdown from 'react-markdown';
 import remarkMath from 'remark-math';
 import rehypeKatex from 'rehype-katex';
@@ -24,10 +24,14 @@ interface Review {
   };
 }
 
+const REVIEWS_PAGE_SIZE = 50;
+
 const ReviewHistoryPage: React.FC = () => {
   const [reviews, setReviews] = useState<Review[]>([]);
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState('');
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const { token } = useAuth();
 
   useEffect(() => {
@@ -35,12 +39,9 @@ const ReviewHistoryPage: React.FC = () => {
 
     const fetchReviews = async () => {
       try {
-        const response = await axios.get(buildApiUrl('/reviews/'), {
-          headers: {
-            'Authorization': `Bearer ${token}`
-          }
-        });
-        setReviews(response.data);
+        const page = await fetchPage<Review>(buildApiUrl('/reviews/'), token, { limit: REVIEWS_PAGE_SIZE });
+        setReviews(page.items);
+        setNextCursor(page.nextCursor);
       } catch (err) {
         console.error('Failed to fetch reviews:', err);
         setError('Failed to load review history. Please try again.');
@@ -52,6 +53,20 @@ const ReviewHistoryPage: React.FC = () => {
     fetchReviews();
   }, [token]);
 
+  const handleLoadMore = async () => {
+    if (!token || !nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const page = await fetchPage<Review>(buildApiUrl('/reviews/'), token, { limit: REVIEWS_PAGE_SIZE }, nextCursor);
+      setReviews(prev => [...prev, ...page.items]);
+      setNextCursor(page.nextCursor);
+    } catch (err) {
+      console.error('Failed to load more reviews:', err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const normalizeTags = (tags: string | string[] | undefined): string[] =>
     Array.isArray(tags)
       ? tags
@@ -142,6 +157,18 @@ const ReviewHistoryPage: React.FC = () => {
           </div>
         ))}
       </div>
+
+      {nextCursor && (
+        <div className="text-center pt-6">
+          <button
+            onClick={handleLoadMore}
+            disabled={loadingMore}
+            className="px-4 py-2 border border-gray-300 dark:border-gray-600 rounded-md text-gray-700 dark:text-gray-300 hover:bg-gray-50 dark:hover:bg-gray-800 disabled:opacity-50"
+          >
+            {loadingMore ? 'Loading...' : 'Load more'}
+          </button>
+        </div>
+      )}
     </div>
   );
 };
@@ -0,0 +1,59 @@
+import axios from 'axios';
+import { buildApiUrl } from '../config';
+
+// Import endpoints (/anki/import, /pdf/import, /flashcards/batch-create) run in the background
+// and return a job; GET /imports/{id} reports its progress until it finishes
+export interface ImportJob {
+  id: number;
+  kind: string;
+  status: 'queued' | 'running' | 'succeeded' | 'failed' | 'cancelled';
+  stage: string;
+  progress: { done: number; total: number | null };
+  errors: string[];
+  created_card_ids: number[];
+  result: any;
+}
+
+const POLL_INTERVAL_MS = 1500;
+const FINISHED_STATUSES = ['succeeded', 'failed', 'cancelled'];
+
+// Shaped like an axios error, so callers' `err.response?.data?.detail` handling covers failed jobs too
+export class ImportJobError extends Error {
+  response: { data: { detail: string } };
+
+  constructor(detail: string) {
+    super(detail);
+    this.response = { data: { detail } };
+  }
+}
+
+export function describeImportProgress(job: ImportJob): string {
+  const stage = job.stage.charAt(0).toUpperCase() + job.stage.slice(1);
+  const { done, total } = job.progress;
+  return total ? `${stage}... ${done}/${total}` : `${stage}...`;
+}
+
+// Polls the job until it finishes; resolves with its result or throws ImportJobError
+export async function waitForImport(
+  job: ImportJob,
+  token: string,
+  onProgress?: (job: ImportJob) => void
+): Promise<any> {
+  while (!FINISHED_STATUSES.includes(job.status)) {
+    if (onProgress) {
+      onProgress(job);
+    }
+    await new Promise((resolve) => setTimeout(resolve, POLL_INTERVAL_MS));
+    const response = await axios.get(buildApiUrl(`/imports/${job.id}`), {
+      headers: { 'Authorization': `Bearer ${token}` },
+    });
+    job = response.data;
+  }
+  if (job.status === 'cancelled') {
+    throw new ImportJobError('Import cancelled.');
+  }
+  if (job.status === 'failed') {
+    throw new ImportJobError(job.errors[job.errors.length - 1] || 'Import failed. Please try again.');
+  }
+  return job.result;
+}
@@ -0,0 +1,41 @@
+import axios from 'axios';
+
+// List endpoints return one page as a JSON array; the next page's cursor is in this header
+export const NEXT_CURSOR_HEADER = 'x-next-cursor';
+
+export interface Page<T> {
+  items: T[];
+  nextCursor: string | null;
+}
+
+export async function fetchPage<T>(
+  url: string,
+  token: string,
+  params: Record<string, string | number> = {},
+  cursor?: string | null
+): Promise<Page<T>> {
+  const response = await axios.get(url, {
+    headers: { 'Authorization': `Bearer ${token}` },
+    params: cursor ? { ...params, cursor } : params,
+  });
+  return {
+    items: response.data,
+    nextCursor: response.headers[NEXT_CURSOR_HEADER] || null,
+  };
+}
+
+// Follows cursors until the last page; for views that need the whole list (e.g. a review session)
+export async function fetchAllPages<T>(
+  url: string,
+  token: string,
+  params: Record<string, string | number> = {}
+): Promise<T[]> {
+  const items: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const page: Page<T> = await fetchPage<T>(url, token, { limit: 200, ...params }, cursor);
+    items.push(...page.items);
+    cursor = page.nextCursor;
+  } while (cursor);
+  return items;
+}
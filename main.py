@@ -20,6 +20,9 @@ from app.routes.subscription import router as subscription_router
 from app.routes.dashboard import router as dashboard_router
 from app.routes.anki_import import router as anki_import_router
 from app.routes.pdf_import import router as pdf_import_router
+from app.routes.sync import router as sync_router
+from app.routes.export import router as export_router
+from app.routes.imports import router as imports_router
 
 # Safe database setup - only create tables if they don't exist
 try:
@@ -27,6 +30,8 @@ try:
     from app.models import Base
     # Only create tables if they don't exist - don't drop existing data
     Base.metadata.create_all(bind=engine)
+    from app.services.search import ensure_search_index
+    ensure_search_index(engine)
     print("Database tables created/verified successfully")
 except Exception as e:
     print(f"Database setup error: {e}")
@@ -60,6 +65,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # Keyset pagination cursor on list endpoints
 )
 
 app.include_router(flashcards.router, prefix="/flashcards", tags=["Flashcards"])
@@ -81,3 +87,6 @@ app.include_router(subscription_router, prefix="/subscription", tags=["Subscript
 app.include_router(dashboard_router, prefix="/dashboard", tags=["Dashboard"])
 app.include_router(anki_import_router, prefix="/anki", tags=["Anki Import"])
 app.include_router(pdf_import_router, prefix="/pdf", tags=["PDF Import"])
+app.include_router(sync_router, prefix="/sync", tags=["Sync"])
+app.include_router(export_router, prefix="/export", tags=["Export"])
+app.include_router(imports_router, prefix="/imports", tags=["Imports"])
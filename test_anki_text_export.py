@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test Anki plain-text export parsing (app/services/anki_text.py) on small sample exports
+"""
+
+import io
+import os
+import sys
+
+# Add the repository root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# "Notes in Plain Text" export with headers (Anki 2.1.55+)
+NOTES_EXPORT = (
+    "#separator:tab\n"
+    "#html:true\n"
+    "#tags:exported\n"
+    "#guid column:1\n"
+    "#notetype column:2\n"
+    "#deck column:3\n"
+    "#tags column:6\n"
+    "a1\tBasic\tGeo\tCapital of <b>France</b>\tParis&nbsp;\tgeo europe\n"
+    "a2\tCloze\tBio\t{{c1::Mitochondria}} is the {{c2::powerhouse}} of the cell\t\tbio\n"
+    "a3\tBasic\tMisc\t\"Multi\nline \"\"quoted\"\" front\"\t\"Answer, with\ttab\"\t\n"
+    "a4\tBasic\tGeo\tTokyo - capital of Japan\t\t\n"
+)
+
+# Headerless export whose first row looks like a header line
+WORD_ROW_EXPORT = (
+    "#word:meaning\tA row of data, not a header\n"
+    "Second question\tSecond answer\n"
+)
+
+# Headers Anki writes but the parser doesn't use, followed by a "#..." data row
+SKIPPED_HEADERS_EXPORT = (
+    "#separator:semicolon\n"
+    "#html:false\n"
+    "#columns:Front;Back\n"
+    "#notetype:Basic\n"
+    "#deck:Vocabulary\n"
+    "#hashtag:meaning;A hashtag\n"
+    "<b>bold</b>;kept as text\n"
+)
+
+
+def parse(text):
+    from app.services.anki_text import parse_export
+    return parse_export(io.StringIO(text, newline=""))
+
+
+def test_anki_text_export():
+    """Test headers, quoted fields, tag columns, clozes and '#' data rows"""
+
+    print("🧪 Testing Anki text export parsing...")
+
+    print("\n📝 Test 1: Notes export with headers")
+    parsed = parse(NOTES_EXPORT)
+    for card in parsed.cards:
+        print(f"   Card: {card}")
+    print(f"   Rows for GPT: {parsed.llm_rows}")
+    assert parsed.row_count == 4
+    assert parsed.cards[0] == ("Capital of France", "Paris", "exported, geo, europe")
+
+    print("\n📝 Test 2: Cloze row")
+    assert parsed.cards[1] == ("... is the ... of the cell", "Mitochondria, powerhouse", "exported, bio")
+
+    print("\n📝 Test 3: Quoted newlines, doubled quotes and tabs")
+    assert parsed.cards[2] == ('Multi\nline "quoted" front', "Answer, with\ttab", "exported")
+
+    print("\n📝 Test 4: Single-column row goes to GPT, guid/notetype/deck columns left out")
+    assert len(parsed.cards) == 3
+    assert parsed.llm_rows == ["a4\tBasic\tGeo\tTokyo - capital of Japan\t\t"]
+
+    print("\n📝 Test 5: Data row starting with '#word:'")
+    parsed = parse(WORD_ROW_EXPORT)
+    for card in parsed.cards:
+        print(f"   Card: {card}")
+    assert parsed.cards == [
+        ("#word:meaning", "A row of data, not a header", None),
+        ("Second question", "Second answer", None),
+    ]
+
+    print("\n📝 Test 6: Unused headers, then a '#' data row")
+    parsed = parse(SKIPPED_HEADERS_EXPORT)
+    for card in parsed.cards:
+        print(f"   Card: {card}")
+    assert parsed.cards == [
+        ("#hashtag:meaning", "A hashtag", None),
+        ("<b>bold</b>", "kept as text", None),
+    ]
+
+    print("\n✅ Anki text export tests completed!")
+
+
+if __name__ == "__main__":
+    test_anki_text_export()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Test the Anki scheduling import (app/services/anki_scheduling.py) on a tiny in-memory collection:
+read_note_schedules' SM-2 state, and the CardReviews seed_reviews writes from it
+"""
+
+import os
+import sqlite3
+import sys
+from datetime import datetime, timezone
+
+# Add the repository root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+DAY = 86400
+NOW = datetime(2026, 1, 15, 12, 0, tzinfo=timezone.utc)
+NOW_SECONDS = int(NOW.timestamp())
+CREATED = NOW_SECONDS - 400 * DAY  # col.crt: the collection is 400 days old
+TODAY = (NOW_SECONDS - CREATED) // DAY
+
+
+def make_collection():
+    """A collection with one note per scheduling case; each note's second card is its less reviewed reverse"""
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE col (id INTEGER PRIMARY KEY, crt INTEGER)")
+    conn.execute(
+        "CREATE TABLE cards (id INTEGER PRIMARY KEY, nid INTEGER, type INTEGER, due INTEGER, "
+        "odue INTEGER, odid INTEGER, ivl INTEGER, factor INTEGER, reps INTEGER, lapses INTEGER)"
+    )
+    conn.execute("CREATE TABLE revlog (id INTEGER PRIMARY KEY, cid INTEGER, ease INTEGER)")
+    conn.execute("INSERT INTO col VALUES (1, ?)", (CREATED,))
+
+    # (card id, note id, type, due, odue, odid, ivl, factor, reps, lapses)
+    cards = [
+        # Review card due in 10 days; its reverse (fewer reps) must not be picked
+        (101, 1, 2, TODAY + 10, 0, 0, 30, 2300, 8, 1),
+        (102, 1, 2, TODAY + 90, 0, 0, 200, 2500, 2, 0),
+        # Learning card: due is a timestamp, no ease factor yet
+        (201, 2, 1, NOW_SECONDS + 600, 0, 0, 0, 0, 1, 0),
+        # Review card in a filtered deck: due is a queue position, odue the real due day
+        (301, 3, 2, 7, TODAY + 4, 9, 12, 2500, 5, 0),
+        # Overdue card with more lapses than the floors allow
+        (401, 4, 2, TODAY - 3, 0, 0, 4, 1200, 3, 3),
+        # New card: never answered, left unscheduled
+        (501, 5, 0, 17, 0, 0, 0, 0, 0, 0),
+    ]
+    conn.executemany("INSERT INTO cards VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", cards)
+
+    # revlog ids are epoch milliseconds; the overdue card's last answer was "Again"
+    conn.executemany("INSERT INTO revlog VALUES (?, ?, ?)", [
+        ((NOW_SECONDS - 40 * DAY) * 1000, 101, 3),
+        ((NOW_SECONDS - 20 * DAY) * 1000, 101, 4),
+        ((NOW_SECONDS - 5 * DAY) * 1000, 401, 3),
+        ((NOW_SECONDS - 4 * DAY) * 1000, 401, 1),
+    ])
+    return conn
+
+
+def test_anki_scheduling():
+    """Test the SM-2 state read from review, learning and filtered-deck cards"""
+
+    print("🧪 Testing Anki scheduling import...")
+
+    from app.services.anki_scheduling import read_note_schedules
+
+    schedules = read_note_schedules(make_collection(), now=NOW)
+    positions = schedules.positions([1, 2, 3, 4, 5]).tolist()
+
+    def schedule(note_id):
+        index = positions[note_id - 1]
+        return {
+            "repetition_count": int(schedules.repetition_count[index]),
+            "ease_factor": float(schedules.ease_factor[index]),
+            "interval_days": int(schedules.interval_days[index]),
+            "next_review": float(schedules.next_review[index]),
+            "last_review": float(schedules.last_review[index]),
+            "was_correct": bool(schedules.was_correct[index]),
+        }
+
+    print("\n📝 Test 1: Review card (most reviewed card of its note)")
+    result = schedule(1)
+    print(f"   Result: {result}")
+    assert result["repetition_count"] == 7  # reps - lapses
+    assert result["ease_factor"] == 2.3
+    assert result["interval_days"] == 30  # Not the reverse card's 200
+    assert result["next_review"] == CREATED + (TODAY + 10) * DAY
+    assert result["last_review"] == NOW_SECONDS - 20 * DAY
+    assert result["was_correct"]
+
+    print("\n📝 Test 2: Learning card")
+    result = schedule(2)
+    print(f"   Result: {result}")
+    assert result["repetition_count"] == 0
+    assert result["ease_factor"] == 2.5
+    assert result["interval_days"] == 0
+    assert result["next_review"] == NOW_SECONDS + 600
+    assert result["last_review"] == NOW_SECONDS  # No revlog: next - ivl, capped at now
+    assert not result["was_correct"]
+
+    print("\n📝 Test 3: Filtered deck card (odue/odid)")
+    result = schedule(3)
+    print(f"   Result: {result}")
+    assert result["repetition_count"] == 5
+    assert result["ease_factor"] == 2.5
+    assert result["interval_days"] == 12
+    assert result["next_review"] == CREATED + (TODAY + 4) * DAY
+
+    print("\n📝 Test 4: Overdue card, last answered Again")
+    result = schedule(4)
+    print(f"   Result: {result}")
+    assert result["repetition_count"] == 1  # reps - lapses is 0; review cards keep at least 1
+    assert result["ease_factor"] == 1.3  # factor 1200 is below the SM-2 minimum
+    assert result["next_review"] == CREATED + (TODAY - 3) * DAY
+    assert result["last_review"] == NOW_SECONDS - 4 * DAY
+    assert not result["was_correct"]
+
+    print("\n📝 Test 5: New card")
+    print(f"   Position: {positions[4]}")
+    assert positions[4] == -1
+    assert sorted(schedules.note_ids.tolist()) == [1, 2, 3, 4]
+
+    print("\n📝 Test 6: Seeded reviews")
+    seeded = seed_schedules(schedules)
+    for note_id, review in sorted(seeded.items()):
+        print(f"   Note {note_id}: rep={review.repetition_count}, ease={review.ease_factor:.2f}, "
+              f"interval={review.interval_days} days, next={review.next_review_date}")
+    assert sorted(seeded) == [1, 2, 3, 4]  # The new note's card gets no review
+    for note_id, review in seeded.items():
+        expected = schedule(note_id)
+        assert review.repetition_count == expected["repetition_count"]
+        assert review.ease_factor == expected["ease_factor"]
+        assert review.interval_days == expected["interval_days"]
+        assert review.next_review_date.replace(tzinfo=timezone.utc).timestamp() == expected["next_review"]
+        assert review.was_correct == expected["was_correct"]
+
+    print("\n📝 Test 7: Seeded reviews serialize as ReviewOut (GET /reviews/, /sync)")
+    from app.schemas.review import ReviewOut
+    for note_id, review in sorted(seeded.items()):
+        out = ReviewOut.model_validate(review)
+        print(f"   Note {note_id}: response={out.user_response!r}, confidence={out.confidence_score}, "
+              f"feedback={out.llm_feedback!r}, imported={out.is_imported}")
+        assert out.is_imported
+        assert out.confidence_score == (1.0 if out.was_correct else 0.0)
+
+    print("\n✅ Anki scheduling tests completed!")
+
+
+def seed_schedules(schedules):
+    """CardReviews seed_reviews writes for one imported card per note (notes 1-5), by note id, in an in-memory database"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.models import Base, CardReview, Deck, Flashcard, User
+    from app.services.anki_scheduling import seed_reviews
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        user = User(email="anki@example.com", name="Anki")
+        db.add(user)
+        db.flush()
+        deck = Deck(name="Anki Import", user_id=user.id)
+        db.add(deck)
+        db.flush()
+        cards = [Flashcard(user_id=user.id, deck_id=deck.id, concept=f"Question {note_id}", definition="Answer") for note_id in range(1, 6)]
+        db.add_all(cards)
+        db.flush()
+
+        card_notes = {card.id: note_id for card, note_id in zip(cards, range(1, 6))}
+        count = seed_reviews(db, user.id, list(card_notes), list(card_notes.values()), schedules)
+        db.commit()
+        assert count == 4
+        return {card_notes[review.flashcard_id]: review for review in db.query(CardReview).all()}
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    test_anki_scheduling()